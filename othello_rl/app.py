@@ -7,7 +7,7 @@ from tkinter import filedialog
 from logging import getLogger
 from typing import Optional
 from othello_rl.othello.agent import Agent, PlayerAgent, QLearningAgent, RandomAgent, MinMaxAgent
-from othello_rl.othello.features import Featuresv1, Featuresv2
+from othello_rl.othello.features import Featuresv1, Featuresv2, Featuresv3
 from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
 from othello_rl.othello.positional_evaluation import PositionalEvaluation4x4v1,PositionalEvaluation4x4v2, PositionalEvaluation8x8v2, PositionalEvaluation8x8v1
 from othello_rl.file import parse_ql_json
@@ -16,7 +16,7 @@ logger = getLogger(__name__)
 
 AGENT_KEY = {'Player': PlayerAgent, 'Random': RandomAgent, 'MinMax': MinMaxAgent, 'Q-Learning': QLearningAgent}
 POSEVAL_KEY = {'8x8 v1': PositionalEvaluation8x8v1, '8x8 v2': PositionalEvaluation8x8v2, '4x4 v1': PositionalEvaluation4x4v1, '4x4 v2': PositionalEvaluation4x4v2}
-FEATURES_KEY = {'v1': Featuresv1, 'v2': Featuresv2}
+FEATURES_KEY = {'v1': Featuresv1, 'v2': Featuresv2, 'v3': Featuresv3}
 
 class OthelloApp(tk.Frame):
   """
@@ -307,6 +307,8 @@ class OthelloBoardGUI(tk.Canvas):
     """
     self.agent = [agent1, agent2]
     self.board_size = board_size
+    agent1.reset()
+    agent2.reset()
 
     # オセロ盤の線
     self.delete('all')
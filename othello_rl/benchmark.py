@@ -0,0 +1,328 @@
+"""
+性能のベンチマーク
+
+Notes
+-----
+seedと局面を固定して以下を計測し、結果をJSONで書き出す
+- 盤面の操作: perft, reverse/undo, 合法手生成
+- MinMaxAgentの探索: 深さ毎の1手あたりの時間
+- Q Learning: learn_one_gameのgames/s(単一プロセス, learn_mp)
+- Q値のテーブルの書き出しと読み込み: save_data, parse_ql_json
+
+python -m othello_rl.benchmark --output result.json --baseline baseline.json
+で、ベースラインと比較して許容範囲以上遅くなったものがあれば終了コード1で終了する
+許容範囲はthresholdと、ベースラインと今回の計測値のばらつきの和の大きい方とする
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from logging import getLogger
+from typing import Callable
+import numpy as np
+from othello_rl.file import parse_ql_json
+from othello_rl.manager.multi_precess import learn_mp
+from othello_rl.manager.othello import OthelloQLearningManager
+from othello_rl.othello.agent import MinMaxAgent, RandomAgent
+from othello_rl.othello.board import OthelloBoard8x8
+from othello_rl.othello.features import Featuresv1
+from othello_rl.othello.perft import perft
+from othello_rl.othello.positional_evaluation import PositionalEvaluation8x8v2
+from othello_rl.othello.reward import Rewardv1
+from othello_rl.qlearning.qlearning import QLearning
+
+logger = getLogger(__name__)
+SEED = 0
+
+def make_positions(n: int, ply: int, seed: int = SEED) -> list[OthelloBoard8x8]:
+  """
+  seedを固定したランダムな対局から局面を作成する
+
+  Parameters
+  ----------
+  n : int
+    局面の数
+  ply : int
+    初期盤面からの着手数
+  seed : int, default SEED
+    乱数列のseed
+
+  Returns
+  -------
+  positions : list[OthelloBoard8x8]
+    局面のリスト, 手番のプレイヤーに合法手がある
+  """
+  agent = RandomAgent(seed)
+  retval = []
+  while len(retval) < n:
+    othello = OthelloBoard8x8(0)
+    while othello.count < ply:
+      agent.step(othello)
+      next_state = othello.get_next_state()
+      if next_state == 2:
+        break
+      elif next_state == 0:
+        othello.change_player()
+    if othello.get_next_state() != 2 and len(othello.get_candidate_list()) > 0:
+      position = OthelloBoard8x8(othello.now_turn)
+      position.set_board(othello.board[0], othello.board[1])
+      retval.append(position)
+
+  return retval
+
+def bench_perft() -> tuple[float, str]:
+  othello = OthelloBoard8x8(0)
+  start = time.perf_counter()
+  nodes = perft(othello, 6)
+  return nodes/(time.perf_counter()-start), 'nodes/s'
+
+def bench_reverse_undo() -> tuple[float, str]:
+  positions = make_positions(50, 20)
+  count = 0
+  start = time.perf_counter()
+  for othello in positions:
+    for _ in range(20):
+      for x, y in othello.get_candidate_list():
+        othello.reverse(x, y, False)
+        othello.undo()
+        count += 1
+  return count/(time.perf_counter()-start), 'moves/s'
+
+def bench_legal_board() -> tuple[float, str]:
+  positions = make_positions(200, 20)
+  boards = [(othello.board[0], othello.board[1]) for othello in positions]
+  othello = OthelloBoard8x8(0)
+  start = time.perf_counter()
+  for _ in range(50):
+    for board_0, board_1 in boards:
+      othello.position_cache.clear()
+      othello.set_board(board_0, board_1)
+      othello.get_legal_board(0)
+      othello.get_legal_board(1)
+  return 2*50*len(boards)/(time.perf_counter()-start), 'boards/s'
+
+def make_bench_search(deepth: int, n: int) -> Callable[[], tuple[float, str]]:
+  def bench_search() -> tuple[float, str]:
+    positions = make_positions(n, 20)
+    start = time.perf_counter()
+    for othello in positions:
+      MinMaxAgent(deepth, PositionalEvaluation8x8v2()).step(othello)
+    return len(positions)/(time.perf_counter()-start), 'searches/s'
+  return bench_search
+
+def make_manager(board_size: int) -> OthelloQLearningManager:
+  return OthelloQLearningManager(board_size, Featuresv1(), RandomAgent(), QLearning(0.1, 0.9, {}), Rewardv1(), 'e', [0.1], seed=SEED)
+
+def make_bench_learn(board_size: int, count: int) -> Callable[[], tuple[float, str]]:
+  def bench_learn() -> tuple[float, str]:
+    manager = make_manager(board_size)
+    start = time.perf_counter()
+    manager.learn(count, True, seed=SEED)
+    return count/(time.perf_counter()-start), 'games/s'
+  return bench_learn
+
+def bench_learn_mp() -> tuple[float, str]:
+  manager = make_manager(4)
+  count = 400
+  with tempfile.TemporaryDirectory() as d, contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    learn_mp(2, count, manager, d+'/', 'q.json', False, 2, seed=SEED)
+    elapsed = time.perf_counter()-start
+  return count/elapsed, 'games/s'
+
+def make_bench_save_load(size: int) -> tuple[Callable[[], tuple[float, str]], Callable[[], tuple[float, str]]]:
+  rng = np.random.default_rng(SEED)
+  keys = zip(rng.integers(0, 2**40, size).tolist(), rng.integers(0, 64, size).tolist())
+  data = dict(zip(keys, rng.random(size).tolist()))
+
+  def bench_save() -> tuple[float, str]:
+    manager = make_manager(8)
+    manager.ql.data = data
+    with tempfile.TemporaryDirectory() as d:
+      start = time.perf_counter()
+      manager.save_data(os.path.join(d, 'q.json'), True)
+      return time.perf_counter()-start, 's'
+
+  def bench_load() -> tuple[float, str]:
+    manager = make_manager(8)
+    manager.ql.data = data
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'q.json')
+      manager.save_data(path, True)
+      start = time.perf_counter()
+      parse_ql_json(path)
+      return time.perf_counter()-start, 's'
+
+  return bench_save, bench_load
+
+def get_benchmarks() -> dict[str, Callable[[], tuple[float, str]]]:
+  """
+  ベンチマークの一覧を返す
+
+  Returns
+  -------
+  benchmarks : dict[str, Callable[[], tuple[float, str]]]
+    名前を(計測値, 単位)を返す関数に写す辞書
+    単位が's'のものは小さいほど、それ以外は大きいほど良い
+  """
+  retval = {
+    'board.perft6': bench_perft,
+    'board.reverse_undo': bench_reverse_undo,
+    'board.legal_board': bench_legal_board,
+  }
+  # 1回の計測が短すぎるとばらつきが大きいので、浅い探索ほど局面を増やす
+  for deepth, n in [(1, 400), (2, 100), (3, 30), (4, 10)]:
+    retval['search.minmax{}'.format(deepth)] = make_bench_search(deepth, n)
+  retval['learn.4x4'] = make_bench_learn(4, 1000)
+  retval['learn.8x8'] = make_bench_learn(8, 100)
+  retval['learn.mp2_4x4'] = bench_learn_mp
+  for size in [1000, 10000, 100000]:
+    bench_save, bench_load = make_bench_save_load(size)
+    retval['qtable.save{}'.format(size)] = bench_save
+    retval['qtable.load{}'.format(size)] = bench_load
+
+  return retval
+
+def is_selected(name: str, names: list[str]) -> bool:
+  """
+  ベンチマークが選択されているかを返す
+
+  Parameters
+  ----------
+  name : str
+    ベンチマークの名前
+  names : list[str]
+    選択する名前またはグループ('board'等の'.'より前の部分)
+
+  Returns
+  -------
+  selected : bool
+    nameがnamesのいずれかと一致するか、いずれかのグループに属するか
+  """
+  return any(name == n or name.startswith(n.rstrip('.')+'.') for n in names)
+
+def get_spread(samples: list[float], unit: str) -> float:
+  """
+  計測値のばらつきを返す
+
+  Parameters
+  ----------
+  samples : list[float]
+    繰り返して得た計測値
+  unit : str
+    単位, 's'であれば小さいほど良い
+
+  Returns
+  -------
+  spread : float
+    最も良い値と中央値の差の中央値に対する割合
+    結果には最も良い値を用いるので、極端に悪い回があっても大きくならない
+  """
+  median = float(np.median(samples))
+  if median <= 0:
+    return 0.0
+  best = min(samples) if unit == 's' else max(samples)
+  return abs(best-median)/median
+
+def run(names: list[str] = None, repeat: int = 5) -> dict:
+  """
+  ベンチマークを実行する
+
+  Parameters
+  ----------
+  names : list[str], default None
+    実行するベンチマークの名前またはグループ, Noneであれば全て
+  repeat : int, default 5
+    繰り返す回数, 最も良い値を結果とする
+
+  Returns
+  -------
+  result : dict
+    {'meta': 実行環境, 'results': {名前: {'value', 'unit', 'samples'}}}
+  """
+  results = {}
+  for name, func in get_benchmarks().items():
+    if names and not is_selected(name, names):
+      continue
+    values = []
+    for _ in range(repeat):
+      value, unit = func()
+      values.append(value)
+    value = min(values) if unit == 's' else max(values)
+    results[name] = {'value': value, 'unit': unit, 'samples': values}
+    logger.info('{}: {:.4g} {}'.format(name, value, unit))
+
+  meta = {'time': time.time(), 'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'seed': SEED, 'repeat': repeat}
+  return {'meta': meta, 'results': results}
+
+def compare(result: dict, baseline: dict, threshold: float = 0.1) -> list[tuple[str, float, float, bool]]:
+  """
+  ベースラインと比較する
+
+  Parameters
+  ----------
+  result : dict
+    runの結果
+  baseline : dict
+    ベースラインとなるrunの結果
+  threshold : float, default 0.1
+    性能の低下とみなす最小の割合
+
+  Returns
+  -------
+  comparison : list[tuple[str, float, float, bool]]
+    (名前, ベースラインに対する速さの比, 許容する低下の割合, 性能が低下したか)のリスト
+
+  Notes
+  -----
+  許容する低下の割合は、thresholdと、ベースラインと今回のそれぞれの計測値のばらつきの和の大きい方とする
+  samplesを持たない結果のばらつきは0とみなす
+  """
+  retval = []
+  for name, r in result['results'].items():
+    if name not in baseline['results']:
+      continue
+    b = baseline['results'][name]
+    if r['unit'] == 's':
+      speedup = b['value']/r['value'] if r['value'] > 0 else float('inf')
+    else:
+      speedup = r['value']/b['value'] if b['value'] > 0 else float('inf')
+    tolerance = max(threshold, get_spread(b.get('samples', [b['value']]), b['unit'])+get_spread(r.get('samples', [r['value']]), r['unit']))
+    retval.append((name, speedup, tolerance, speedup < 1-tolerance))
+
+  return retval
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='benchmark suite for othello_rl')
+  parser.add_argument('names', nargs='*', help='names or groups (e.g. board, search.minmax1) of benchmarks to run')
+  parser.add_argument('--output', default=None, help='path to write results (json)')
+  parser.add_argument('--baseline', default=None, help='path of baseline results (json)')
+  parser.add_argument('--threshold', type=float, default=0.1, help='minimum allowed slowdown ratio')
+  parser.add_argument('--repeat', type=int, default=5, help='number of repetitions')
+  args = parser.parse_args()
+
+  result = run(args.names, args.repeat)
+  for name, r in result['results'].items():
+    print('{:<24} {:>14.4g} {}'.format(name, r['value'], r['unit']))
+  if args.output is not None:
+    with open(args.output, 'w') as f:
+      json.dump(result, f, indent=2)
+
+  if args.baseline is not None:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressed = False
+    print()
+    for name, speedup, tolerance, is_regression in compare(result, baseline, args.threshold):
+      print('{:<24} {:>8.3f}x (>= {:.3f}x) {}'.format(name, speedup, 1-tolerance, 'REGRESSION' if is_regression else ''))
+      regressed |= is_regression
+    if regressed:
+      sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -11,7 +11,8 @@ bm8: bit matrix 8x8
 bm4: bit matrix 4x4
 """
 
-
+# int.bit_countはPython3.10以降でのみ利用できる
+HAS_BIT_COUNT = hasattr(int, 'bit_count')
 
 def delta_swap(bits: int, mask: int, delta) -> int:
   """
@@ -201,4 +202,21 @@ def pop_count(bits: int) -> int:
   num : int
     bits内の1の数
   """
-  return bin(bits).count('1')
\ No newline at end of file
+  if HAS_BIT_COUNT:
+    return bits.bit_count()
+  return bin(bits).count('1')
+
+def identity_bm(bits: int) -> int:
+  """
+  bit matrixをそのまま返す
+
+  Parameters
+  ----------
+  bits : int
+    対象となるbit matrix
+  """
+  return bits
+
+# bit matrixの8通りの対称変換(二面体群D4)
+DIHEDRAL_BM8 = (identity_bm, flip_vertical_bm8, flip_horizontal_bm8, flip_diagonal_bm8, flip_anti_diagonal_bm8, rotate_180_bm8, rotate_90_clockwise_bm8, rotate_90_anti_clockwise_bm8)
+DIHEDRAL_BM4 = (identity_bm, flip_vertical_bm4, flip_horizontal_bm4, flip_diagonal_bm4, flip_anti_diagonal_bm4, rotate_180_bm4, rotate_90_clockwise_bm4, rotate_90_anti_clockwise_bm4)
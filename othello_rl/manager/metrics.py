@@ -0,0 +1,335 @@
+"""
+学習の進捗の計測
+
+Notes
+-----
+learn_one_gameが返す1ゲーム毎の統計をまとめ、区間毎に以下の値を求めてJSONLまたはCSVに追記する
+- games/s, plies/s, Q値の更新回数/s
+- Q値のテーブルのサイズ
+- メモリ使用量とGCの回数: 呼び出し元のプロセスに、各ワーカーが直近のゲームの終了時に報告した値と
+  snapshotのpidsに指定したプロセス(learn_mpのManagerのプロセス等)の値を加えた、全プロセスの合計
+- GCの時間: gc.callbacksで計測できる呼び出し元のプロセスのみの値(parent_gc_time)
+- ワーカー毎の稼働率(ゲームを行っていた時間/区間の時間)
+- チェックポイントの書き出しにかかった時間
+- 直近のゲームの勝率
+
+http_portを指定すると、最新の値をJSONで返すHTTPサーバーをスレッドで起動する
+GCの計測とHTTPサーバーはcloseで終了する, with文で用いるとブロックを抜けた時にcloseする
+"""
+import collections
+import csv
+import gc
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from typing import Callable
+from othello_rl.qlearning.qlearning import QLearning
+
+logger = getLogger(__name__)
+FIELDS = ['time', 'elapsed', 'games', 'plies', 'updates', 'games_per_s', 'plies_per_s', 'updates_per_s', 'table_size', 'memory_rss', 'parent_memory_rss', 'gc_collections', 'parent_gc_time', 'worker_utilization', 'worker_num', 'checkpoint_time', 'win_rate', 'draw_rate', 'lose_rate']
+
+def get_memory_rss(pid: int = None) -> int:
+  """
+  プロセスのメモリ使用量(RSS)を返す
+
+  Parameters
+  ----------
+  pid : int, default None
+    対象のプロセスのID, Noneであれば現在のプロセス
+
+  Returns
+  -------
+  rss : int
+    メモリ使用量(byte), 取得できなければ-1
+  """
+  try:
+    with open('/proc/{}/statm'.format('self' if pid is None else pid)) as f:
+      return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+  except (OSError, ValueError, IndexError):
+    pass
+  if pid is not None and pid != os.getpid():
+    return -1
+  try:
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+  except ImportError:
+    return -1
+
+def _make_gc_callback(state: list) -> Callable[[str, dict], None]:
+  """
+  GCの時間をstateに足すgc.callbacks用の関数を作成する
+
+  Parameters
+  ----------
+  state : list
+    [GCの時間の合計, 実行中のGCの開始時刻]
+
+  Returns
+  -------
+  callback : Callable[[str, dict], None]
+    gc.callbacksに追加する関数
+  """
+  def callback(phase: str, info: dict) -> None:
+    if phase == 'start':
+      state[1] = time.perf_counter()
+    elif state[1] is not None:
+      state[0] += time.perf_counter()-state[1]
+      state[1] = None
+
+  return callback
+
+
+class TrainingMetrics:
+  """
+  学習の進捗を計測するクラス
+
+  Attributes
+  ----------
+  path : str or None
+    計測結果を追記するファイルの場所, 拡張子が.csvであればCSV, それ以外はJSONL
+  max_bytes : int
+    ファイルの最大サイズ, 超えた場合は.1を付けた名前に移して新しいファイルに書き込む
+  window : int
+    勝率を求める直近のゲーム数
+  latest : dict
+    最新の計測結果
+  history : list[dict]
+    全ての計測結果
+  port : int or None
+    HTTPサーバーのポート, 起動していなければNone
+  """
+  def __init__(self, path: str = None, max_bytes: int = 16*1024*1024, window: int = 1000, http_port: int = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    path : str, default None
+      計測結果を追記するファイルの場所, Noneであれば書き出さない
+    max_bytes : int, default 16MiB
+      ファイルの最大サイズ
+    window : int, default 1000
+      勝率を求める直近のゲーム数
+    http_port : int, default None
+      計測結果を返すHTTPサーバーのポート, Noneであれば起動しない
+    """
+    self.path = path
+    self.max_bytes = max_bytes
+    self.window = window
+    self.latest = {}
+    self.history = []
+
+    self.__lock = threading.Lock()
+    self.__results = collections.deque(maxlen=window)
+    self.__totals = {'games': 0, 'plies': 0, 'updates': 0}
+    self.__interval = {'games': 0, 'plies': 0, 'updates': 0}
+    self.__busy = {}
+    # pid -> (直近のメモリ使用量, 直近のGCの回数)
+    self.__processes = {}
+    self.__checkpoint_time = 0.0
+    # [区間のGCの時間, 実行中のGCの開始時刻]
+    # gc.callbacksがselfを参照し続けないように、コールバックはこのリストのみを参照する
+    self.__gc_state = [0.0, None]
+    self.__gc_callback = _make_gc_callback(self.__gc_state)
+    self.__start_time = time.time()
+    self.__interval_start = self.__start_time
+    gc.callbacks.append(self.__gc_callback)
+
+    self.__server = None
+    self.port = None
+    if http_port is not None:
+      self.serve(http_port)
+
+  def add_game(self, stats: dict) -> None:
+    """
+    1ゲーム分の統計を追加するメソッド
+
+    Parameters
+    ----------
+    stats : dict
+      OthelloQLearningManager.learn_one_gameの返り値
+      memory_rss, gc_collectionsを含む場合は、そのプロセスの直近の値として保持する
+    """
+    for counter in [self.__totals, self.__interval]:
+      counter['games'] += 1
+      counter['plies'] += stats['plies']
+      counter['updates'] += stats['updates']
+    pid = stats['pid']
+    self.__busy[pid] = self.__busy.get(pid, 0.0) + stats['time']
+    self.__results.append(stats['result'])
+    if 'memory_rss' in stats:
+      self.__processes[pid] = (stats['memory_rss'], stats.get('gc_collections', 0))
+
+  def add_games(self, stats_list: list[dict]) -> None:
+    """
+    複数ゲーム分の統計を追加するメソッド
+
+    Parameters
+    ----------
+    stats_list : list[dict]
+      OthelloQLearningManager.learn_one_gameの返り値のリスト
+    """
+    for stats in stats_list:
+      self.add_game(stats)
+
+  def add_checkpoint(self, duration: float) -> None:
+    """
+    チェックポイントの書き出しにかかった時間を追加するメソッド
+
+    Parameters
+    ----------
+    duration : float
+      かかった時間(s)
+    """
+    self.__checkpoint_time += duration
+
+  def snapshot(self, ql: QLearning = None, worker_num: int = 1, pids: list[int] = None) -> dict:
+    """
+    前回のsnapshotからの区間の計測結果を求め、書き出すメソッド
+
+    Parameters
+    ----------
+    ql : QLearning, default None
+      テーブルのサイズを求めるQ-Learning用のクラス
+    worker_num : int, default 1
+      ゲームを行うプロセス数
+    pids : list[int], default None
+      メモリ使用量を加える、ゲームを行わないプロセス(learn_mpのManagerのプロセス等)のID
+
+    Returns
+    -------
+    metrics : dict
+      計測結果
+    """
+    now = time.time()
+    span = max(now-self.__interval_start, 1e-9)
+    results = list(self.__results)
+    n = max(len(results), 1)
+    own_pid = os.getpid()
+    parent_memory_rss = get_memory_rss()
+    memory_rss = parent_memory_rss
+    gc_collections = sum(stat['collections'] for stat in gc.get_stats())
+    for pid, (rss, collections) in self.__processes.items():
+      if pid != own_pid:
+        memory_rss += max(rss, 0)
+        gc_collections += collections
+    for pid in pids or []:
+      memory_rss += max(get_memory_rss(pid), 0)
+    retval = {
+      'time': now,
+      'elapsed': now-self.__start_time,
+      'games': self.__totals['games'],
+      'plies': self.__totals['plies'],
+      'updates': self.__totals['updates'],
+      'games_per_s': self.__interval['games']/span,
+      'plies_per_s': self.__interval['plies']/span,
+      'updates_per_s': self.__interval['updates']/span,
+      'table_size': len(ql) if ql is not None else -1,
+      'memory_rss': memory_rss,
+      'parent_memory_rss': parent_memory_rss,
+      'gc_collections': gc_collections,
+      'parent_gc_time': self.__gc_state[0],
+      'worker_utilization': sum(self.__busy.values())/(span*worker_num),
+      'worker_num': len(self.__busy),
+      'checkpoint_time': self.__checkpoint_time,
+      'win_rate': results.count(1)/n,
+      'draw_rate': results.count(0)/n,
+      'lose_rate': results.count(-1)/n,
+    }
+
+    self.__interval = {key: 0 for key in self.__interval}
+    self.__busy = {}
+    self.__processes = {}
+    self.__checkpoint_time = 0.0
+    self.__gc_state[0] = 0.0
+    self.__interval_start = now
+
+    with self.__lock:
+      self.latest = retval
+    self.history.append(retval)
+    if self.path is not None:
+      self.__write(retval)
+
+    return retval
+
+  def __write(self, metrics: dict) -> None:
+    """
+    計測結果をファイルに追記するメソッド
+
+    Parameters
+    ----------
+    metrics : dict
+      計測結果
+    """
+    if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+      os.replace(self.path, self.path+'.1')
+
+    is_csv = self.path.endswith('.csv')
+    write_header = is_csv and not os.path.exists(self.path)
+    with open(self.path, 'a', newline='') as f:
+      if is_csv:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if write_header:
+          writer.writeheader()
+        writer.writerow(metrics)
+      else:
+        f.write(json.dumps(metrics)+'\n')
+
+  def serve(self, port: int, host: str = '127.0.0.1') -> None:
+    """
+    最新の計測結果をJSONで返すHTTPサーバーを起動するメソッド
+
+    Parameters
+    ----------
+    port : int
+      ポート, 0であれば空いているポートを用いる
+    host : str, default '127.0.0.1'
+      ホスト
+    """
+    metrics = self
+    lock = self.__lock
+
+    class Handler(BaseHTTPRequestHandler):
+      def do_GET(self) -> None:
+        with lock:
+          body = json.dumps(metrics.latest).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+    self.__server = ThreadingHTTPServer((host, port), Handler)
+    self.port = self.__server.server_address[1]
+    threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+    logger.info('metrics server: http://{}:{}/'.format(host, self.port))
+
+  def close(self) -> None:
+    """
+    HTTPサーバーを停止し、GCの計測を終了するメソッド
+    """
+    if self.__server is not None:
+      self.__server.shutdown()
+      self.__server.server_close()
+      self.__server = None
+      self.port = None
+    if self.__gc_callback in gc.callbacks:
+      gc.callbacks.remove(self.__gc_callback)
+
+  def __enter__(self) -> 'TrainingMetrics':
+    return self
+
+  def __exit__(self, *args) -> None:
+    self.close()
+
+  def __del__(self) -> None:
+    # __init__の途中で失敗した場合は属性が無い
+    callback = getattr(self, '_TrainingMetrics__gc_callback', None)
+    if callback is not None and callback in gc.callbacks:
+      gc.callbacks.remove(callback)
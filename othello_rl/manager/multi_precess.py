@@ -1,11 +1,29 @@
-from multiprocessing import Manager, Pool
+from multiprocessing import Pool
+from multiprocessing.managers import SyncManager
 from logging import getLogger
+import os
 import time
+from othello_rl.manager.metrics import TrainingMetrics
 from othello_rl.manager.othello import OthelloQLearningManager
+from othello_rl.profiler import init_worker
+from othello_rl.rng import SeedLike, to_seed_sequence
 
 logger = getLogger(__name__)
 
-def learn_mp(pool_size: int, count: int, ql_manager: OthelloQLearningManager, save_dir: str, save_file_name: str, save_regularly: bool = False, save_interval: int = 0):
+
+class _TableManager(SyncManager):
+  """
+  Q値のテーブルを保持するManager
+
+  Notes
+  -----
+  getpidはManagerのプロセスでos.getpidを呼び、int()で値を取り出せるproxyを返す
+  """
+
+_TableManager.register('getpid', os.getpid, exposed=('__int__',))
+
+
+def learn_mp(pool_size: int, count: int, ql_manager: OthelloQLearningManager, save_dir: str, save_file_name: str, save_regularly: bool = False, save_interval: int = 0, seed: SeedLike = None, metrics: TrainingMetrics = None):
   """
   Poolを用いて、学習を行う
 
@@ -24,19 +42,42 @@ def learn_mp(pool_size: int, count: int, ql_manager: OthelloQLearningManager, sa
     定期的に学習結果を書き出すか否か
   save_interval : int, default 0
     学習結果を書き出す間隔
+  seed : None or int or SeedSequence, default None
+    各ゲームのseedを生成する元のseed
+  metrics : manager.metrics.TrainingMetrics, default None
+    学習の進捗を計測するクラス, save_interval毎に計測結果を書き出す
+
+  Notes
+  -----
+  各ゲームにはseedから生成した独立な乱数列を割り当てるため、
+  どのプロセスがどのゲームを担当しても同じゲームが重複して行われることはない
+
+  ql_managerのreplay_bufferはプロセス間で共有されず、Poolの各タスクが複製を用いて破棄する
   """
   startTime = time.time()
-  with Manager() as manager:
+  if ql_manager.replay_buffer is not None:
+    logger.warning('replay_buffer isn\'t shared between processes, each task replays only its own games')
+  seed_sequence = to_seed_sequence(seed)
+  with _TableManager() as manager:
+    manager_pid = int(manager.getpid())
     ql_manager.ql.data = manager.dict()
     ql_manager.learning_results = manager.list()
     for i in range(save_interval):
-      with Pool(pool_size) as pool:  
+      with Pool(pool_size, initializer=init_worker) as pool:
         l =[True, False]*(count//save_interval//2)
-        pool.map(ql_manager.learn_one_game, l)
+        stats_list = pool.starmap(ql_manager.learn_one_game, zip(l, seed_sequence.spawn(len(l))))
       print('count: {:05}, time: {:.4f}'.format(count//save_interval*(i+1), time.time()-startTime))
 
       if save_regularly:
+        checkpoint_start = time.time()
         ql_manager.save_data(save_dir+str(i)+save_file_name, True)
+        if metrics is not None:
+          metrics.add_checkpoint(time.time()-checkpoint_start)
+
+      if metrics is not None:
+        metrics.add_games(stats_list)
+        # Q値のテーブルを保持するManagerのプロセスもメモリ使用量に含める
+        metrics.snapshot(ql_manager.ql, pool_size, [manager_pid])
 
     ql_manager.ql.data = dict(ql_manager.ql.data)
     ql_manager.learning_results = list(ql_manager.learning_results)
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+記録された棋譜からのQLearning
+
+Notes
+-----
+棋譜を再生して現在のFeatures, Rewardで(状態, 行動, 報酬)の列を作り直し、
+OthelloQLearningManager.learn_one_gameと同じく終局側から順にQLearning.updateを行う
+Poolを用いる場合は、再生と特徴量の計算のみを各プロセスで行い、Q値の更新は呼び出し元のプロセスで行う
+"""
+import functools
+import time
+from logging import getLogger
+from multiprocessing import Pool
+from othello_rl.othello.features import Features
+from othello_rl.othello.reward import Reward
+from othello_rl.profiler import init_worker
+from othello_rl.qlearning.qlearning import QLearning
+from othello_rl.record import GameRecord, GameRecordReader, get_record_paths, replay_game
+
+logger = getLogger(__name__)
+
+def make_trajectories(features: Features, reward: Reward, ql_num_list: list[int], board_size: int, records: list[GameRecord]) -> list[list[list]]:
+  """
+  棋譜から学習に用いる(状態, 行動, 報酬)の列を作成する
+
+  Parameters
+  ----------
+  features : Features
+    盤面の特徴量選択方法
+  reward : Reward
+    報酬選択方法
+  ql_num_list : list[int]
+    学習するプレイヤーのリスト
+  board_size : int
+    盤のサイズ
+  records : list[GameRecord]
+    棋譜のリスト
+
+  Returns
+  -------
+  trajectories : list[list[list]]
+    各対局, 各プレイヤーの[s, a, r]のリスト
+  """
+  retval = []
+  for record in records:
+    for ql_num in ql_num_list:
+      trajectory = []
+      action = None
+      othello = None
+      for othello, x, y in replay_game(record, board_size):
+        # 直前の自分の着手の報酬は、その着手の直後の盤面で求める
+        if action is not None:
+          action[2] = reward.get(othello, ql_num)
+          action = None
+        if othello.now_turn == ql_num:
+          action = [features.get_index(othello), features.get_action(othello, x, y), 0]
+          trajectory.append(action)
+
+      if len(trajectory) > 0:
+        trajectory[-1][2] = reward.get(othello, ql_num)
+        retval.append(trajectory)
+
+  return retval
+
+
+class OfflineQLearningTrainer:
+  """
+  記録された棋譜からQLearningを行うクラス
+
+  Attributes
+  ----------
+  features : othello.features.Features
+    盤面の特徴量選択方法
+  ql : qlearning.qlearning.QLearning
+    Q-Learning用のクラス
+  reward : othello.reward.Reward
+    報酬選択方法
+  ql_num_list : list[int]
+    学習するプレイヤーのリスト
+  lam : float or None
+    TD(λ)でのλ, Noneであれば終局側から1手ずつ更新する
+  update_count : int
+    これまでに行ったQ値の更新回数
+  """
+  def __init__(self, features: Features, ql: QLearning, reward: Reward, ql_num: int = None, lam: float = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    features : othello.features.Features
+      盤面の特徴量選択方法
+    ql : qlearning.qlearning.QLearning
+      Q-Learning用のクラス
+    reward : othello.reward.Reward
+      報酬選択方法
+    ql_num : int, default None
+      学習するプレイヤー, Noneであれば両方のプレイヤーの着手から学習する
+    lam : float, default None
+      TD(λ)でのλ, Noneであれば終局側から1手ずつ更新する
+    """
+    self.features = features
+    self.ql = ql
+    self.reward = reward
+    self.ql_num_list = [0, 1] if ql_num is None else [ql_num]
+    self.lam = lam
+    self.update_count = 0
+
+  def learn_trajectories(self, trajectories: list[list[list]]) -> None:
+    """
+    (状態, 行動, 報酬)の列から学習を行う
+
+    Parameters
+    ----------
+    trajectories : list[list[list]]
+      make_trajectoriesで作成した列
+    """
+    for trajectory in trajectories:
+      if self.lam is None:
+        before_q = 0
+        for s, a, r in trajectory[::-1]:
+          before_q = self.ql.update(s, a, r, before_q)
+      else:
+        s, a, r = zip(*trajectory)
+        self.ql.update_trajectory(s, a, r, self.lam)
+      self.update_count += len(trajectory)
+
+  def learn_records(self, records: list[GameRecord], board_size: int) -> None:
+    """
+    棋譜のリストから学習を行う
+
+    Parameters
+    ----------
+    records : list[GameRecord]
+      棋譜のリスト
+    board_size : int
+      盤のサイズ
+    """
+    self.learn_trajectories(make_trajectories(self.features, self.reward, self.ql_num_list, board_size, records))
+
+  def learn_file(self, path: str, chunk_size: int = 1000, pool_size: int = 1) -> None:
+    """
+    棋譜ファイルから学習を行う
+
+    Parameters
+    ----------
+    path : str
+      GameRecorderに指定した棋譜ファイルの場所, 子プロセスが書き込んだファイルも読み込む
+    chunk_size : int, default 1000
+      一度に読み込む対局数
+    pool_size : int, default 1
+      棋譜の再生に用いるプロセス数, 1であればPoolを用いない
+    """
+    start_time = time.time()
+    game_num = 0
+    for record_path in get_record_paths(path):
+      reader = GameRecordReader(record_path)
+      func = functools.partial(make_trajectories, self.features, self.reward, self.ql_num_list, reader.board_size)
+      if pool_size > 1:
+        with Pool(pool_size, initializer=init_worker) as pool:
+          for trajectories in pool.imap(func, reader.iter_chunks(chunk_size)):
+            self.learn_trajectories(trajectories)
+      else:
+        for records in reader.iter_chunks(chunk_size):
+          self.learn_trajectories(func(records))
+      game_num += len(reader)
+
+    logger.info('games: {}, updates: {}, time: {:.4f}'.format(game_num, self.update_count, time.time()-start_time))
@@ -1,8 +1,15 @@
-import random
+import gc
 import json
 import math
+import os
+import time
 from logging import getLogger
+from othello_rl.manager.metrics import get_memory_rss
+from othello_rl.profiler import profile
 from othello_rl.qlearning.qlearning import QLearning
+from othello_rl.qlearning.replay_buffer import ReplayBuffer
+from othello_rl.record import GameRecorder
+from othello_rl.rng import RandomStream, SeedLike, spawn_seeds, to_seed_sequence
 from othello_rl.error import CannotReverseError
 from othello_rl.othello.board import OthelloBoard4x4, OthelloBoard8x8
 from othello_rl.othello.features import Features
@@ -11,6 +18,8 @@ from othello_rl.othello.reward import Reward
 import matplotlib.pyplot as plt
 
 logger = getLogger(__name__)
+# learn_one_gameがメモリ使用量とGCの回数を返す間隔(s)
+REPORT_INTERVAL = 1.0
 
 class OthelloQLearningManager:
   """
@@ -33,9 +42,19 @@ class OthelloQLearningManager:
     報酬選択方法
   game : othello.board.OthelloBoard
     扱っているゲーム
+  rng : rng.RandomStream
+    行動選択に用いる乱数列
+  recorder : record.GameRecorder or None
+    対局の棋譜を記録するクラス
+  replay_buffer : qlearning.replay_buffer.ReplayBuffer or None
+    経験再生用のバッファ
+  replay_batch_size : int
+    1ゲーム毎に経験再生で再学習する遷移の数
+  lam : float or None
+    TD(λ)でのλ, Noneであれば終局側から1手ずつ更新する
   """
 
-  def __init__(self, board_size: int, features: Features, opp_agent: Agent, ql: QLearning, reward: Reward, policy_type: str, policy_option: list[float]) -> None:
+  def __init__(self, board_size: int, features: Features, opp_agent: Agent, ql: QLearning, reward: Reward, policy_type: str, policy_option: list[float], seed: SeedLike = None, recorder: GameRecorder = None, replay_buffer: ReplayBuffer = None, replay_batch_size: int = 32, lam: float = None) -> None:
     """
     コンストラクタ
 
@@ -55,6 +74,16 @@ class OthelloQLearningManager:
       手法の種類
     policy_option : list[float]
       手法の定数等
+    seed : None or int or SeedSequence, default None
+      行動選択に用いる乱数列のseed
+    recorder : record.GameRecorder, default None
+      対局の棋譜を記録するクラス, Noneであれば記録しない
+    replay_buffer : qlearning.replay_buffer.ReplayBuffer, default None
+      経験再生用のバッファ, Noneであれば経験再生を行わない
+    replay_batch_size : int, default 32
+      1ゲーム毎に経験再生で再学習する遷移の数
+    lam : float, default None
+      TD(λ)でのλ, Noneであれば終局側から1手ずつ更新する
     """
     self.board_size = board_size
     self.features = features
@@ -66,9 +95,29 @@ class OthelloQLearningManager:
       self.epsilon = policy_option[0]
     elif self.policy_type == 'b':
       self.temperature = policy_option[0]
+    self.rng = RandomStream(seed)
+    self.recorder = recorder
+    self.replay_buffer = replay_buffer
+    self.replay_batch_size = replay_batch_size
+    self.lam = lam
 
     self.learning_results = []
+    self.__last_report_time = None
 
+  def set_seed(self, seed: SeedLike) -> None:
+    """
+    行動選択と相手のagentの乱数列を初期化する
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence
+      乱数列のseed, ここから自身用と相手のagent用の2つの乱数列を生成する
+    """
+    self_seed, agent_seed = to_seed_sequence(seed).spawn(2)
+    self.rng.seed(self_seed)
+    self.agent.set_seed(agent_seed)
+
+  @profile
   def __step_epsilon_greedy(self) -> tuple[int, int, float]:
     """
     ε-Greedy法に基づいて、オセロを一手進める
@@ -83,21 +132,22 @@ class OthelloQLearningManager:
       Q値, Q(s, a)
     """
     candidate_list = self.game.get_candidate_list()
+    s = self.features.get_index(self.game)
     q_list = []
-    tmp = []
+    a_list = []
     for x, y in candidate_list:
-      tmp.append([self.features.get_index(self.game), x*8+y])
-      q_list.append(self.ql.get(tmp[-1][0], tmp[-1][1]))
+      a_list.append(self.features.get_action(self.game, x, y))
+      q_list.append(self.ql.get(s, a_list[-1]))
     
-    if random.random() > self.epsilon:
-      q = max(q_list)
+    if self.rng.random() > self.epsilon:
+      idx = q_list.index(max(q_list))
     else:
-      q = random.choice(q_list)
-    idx = q_list.index(q)
+      idx = self.rng.randrange(len(q_list))
     self.game.reverse(candidate_list[idx][0], candidate_list[idx][1], False)
 
-    return tmp[idx][0], tmp[idx][1], q_list[idx]
+    return s, a_list[idx], q_list[idx]
 
+  @profile
   def __step_boltzmann(self) -> tuple[int, int, float]:
     """
     Boltzmann手法に基づいて、オセロを一手進める
@@ -112,21 +162,21 @@ class OthelloQLearningManager:
       Q値, Q(s, a)
     """
     candidate_list = self.game.get_candidate_list()
+    s = self.features.get_index(self.game)
     q_list = []
-    tmp = []
+    a_list = []
     for x, y in candidate_list:
-      tmp.append([self.features.get_index(self.game), x*8+y])
-      q_list.append(self.ql.get(tmp[-1][0], tmp[-1][1]))
+      a_list.append(self.features.get_action(self.game, x, y))
+      q_list.append(self.ql.get(s, a_list[-1]))
     
-    p = [math.exp(x/self.temperature) for x in q_list]
-    p_sum = sum(p)
-    p = [x/p_sum for x in p]
-    idx = p.index(max(p))
+    q_max = max(q_list)
+    p = [math.exp((x-q_max)/self.temperature) for x in q_list]
+    idx = self.rng.choice_weighted(p)
     self.game.reverse(candidate_list[idx][0], candidate_list[idx][1], False)
 
-    return tmp[idx][0], tmp[idx][1], q_list[idx]
+    return s, a_list[idx], q_list[idx]
 
-  def learn_one_game(self, do_from_opponent: bool = True) -> None:
+  def learn_one_game(self, do_from_opponent: bool = True, seed: SeedLike = None) -> dict:
     """
     1ゲーム分の学習を行う
 
@@ -134,11 +184,28 @@ class OthelloQLearningManager:
     ----------
     do_from_opponent : bool, dafault True
       相手のagentからゲームを開始するか否か
+    seed : None or int or SeedSequence, default None
+      このゲームで用いる乱数列のseed, Noneであれば現在の乱数列をそのまま用いる
+
+    Returns
+    -------
+    stats : dict
+      ゲームの統計, manager.metrics.TrainingMetricsで集計する
+      - pid: 学習を行ったプロセスのID
+      - result: 1(win), 0(draw), -1(lose)
+      - plies: 着手数
+      - updates: Q値の更新回数
+      - time: かかった時間(s)
+      - memory_rss, gc_collections: このプロセスのメモリ使用量とGCの回数, 最初のゲームとREPORT_INTERVAL秒毎のゲームのみ
     """
+    start_time = time.perf_counter()
+    if seed is not None:
+      self.set_seed(seed)
     if self.board_size == 4:
       self.game = OthelloBoard4x4(0)
     elif self.board_size == 8:
       self.game = OthelloBoard8x8(0)
+    self.agent.reset()
     opp_turn = do_from_opponent
     action_data = []
     reward_sum = 0
@@ -178,6 +245,8 @@ class OthelloQLearningManager:
     else:
       reward = self.reward.get(self.game, 0)
     action_data[-1][-1] = reward
+    if self.recorder is not None:
+      self.recorder.record(self.game)
 
     if reward > 0:
       r = 1
@@ -188,13 +257,47 @@ class OthelloQLearningManager:
     self.learning_results.append([r, reward_sum/self_count]) # [result, reward_ave]
     
     # learning
-    before_q = 0
-    for s, a, q_old, reward in action_data[::-1]:
-      before_q = self.ql.update(s, a, reward, before_q, q_old)
+    if self.lam is None:
+      before_q = 0
+      for s, a, q_old, reward in action_data[::-1]:
+        before_q = self.ql.update(s, a, reward, before_q, q_old)
+    else:
+      s, a, _, reward = zip(*action_data)
+      self.ql.update_trajectory(s, a, reward, self.lam)
 
-  def learn(self, count: int, do_from_opponent: bool) -> None:
-    for _ in range(count):
-      self.learn_one_game(do_from_opponent)
+    updates = len(action_data)
+    if self.replay_buffer is not None:
+      self.replay_buffer.add_trajectory(action_data)
+      updates += len(self.replay_buffer.replay(self.ql, self.replay_batch_size))
+
+    end_time = time.perf_counter()
+    stats = {'pid': os.getpid(), 'result': r, 'plies': self.game.count, 'updates': updates, 'time': end_time-start_time}
+    if self.__last_report_time is None or end_time-self.__last_report_time > REPORT_INTERVAL:
+      self.__last_report_time = end_time
+      stats['memory_rss'] = get_memory_rss()
+      stats['gc_collections'] = sum(stat['collections'] for stat in gc.get_stats())
+
+    return stats
+
+  def learn(self, count: int, do_from_opponent: bool, seed: SeedLike = None) -> None:
+    """
+    count回分の学習を行う
+
+    Parameters
+    ----------
+    count : int
+      学習回数
+    do_from_opponent : bool
+      相手のagentからゲームを開始するか否か
+    seed : None or int or SeedSequence, default None
+      各ゲームのseedを生成する元のseed, Noneであれば現在の乱数列をそのまま用いる
+    """
+    if seed is None:
+      for _ in range(count):
+        self.learn_one_game(do_from_opponent)
+    else:
+      for game_seed in spawn_seeds(seed, count):
+        self.learn_one_game(do_from_opponent, game_seed)
 
   def save_data(self, path: str, use_json: bool = False) -> None:
     """
@@ -0,0 +1,514 @@
+"""
+agent同士の対局による評価
+
+Notes
+-----
+任意のAgentの組み合わせでリーグ戦(round robin)またはガントレット戦を行い、
+Bradley-Terryモデルで推定したEloレーティングと信頼区間を求める
+
+各対局はseedから生成したランダムな序盤(opening_plies手)から始め、
+同じ序盤で先手と後手を入れ替えた2局を1組として行うので、序盤と手番の有利不利は打ち消される
+
+Poolを用いる場合、agentはinitializerで各プロセスに一度だけ渡し、
+対局毎にはagentの名前と序盤の着手のみを渡す
+
+sprtを指定すると、組み合わせ毎にbatch_size組ずつ対局を行い、SPRTで結論が出た組み合わせはそれ以上対局しない
+"""
+import itertools
+import math
+from logging import getLogger
+from multiprocessing import Pool
+import numpy as np
+from othello_rl.error import ArgsError, OthelloRLError
+from othello_rl.othello.agent import Agent
+from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
+from othello_rl.profiler import init_worker
+from othello_rl.rng import RandomStream, SeedLike, to_seed_sequence
+
+logger = getLogger(__name__)
+ELO_SCALE = 400/math.log(10)
+# 1回のタスクで行う序盤の数, プロセス数によらず同じseedから同じ対局結果になるように固定する
+CHUNK_SIZE = 8
+
+# Poolの各プロセスで保持する(盤のサイズ, agentの辞書)
+_worker_state = None
+
+def make_othello(board_size: int, first_player: int = 0) -> OthelloBoard:
+  """
+  初期盤面を作成する
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ, 4 or 8
+  first_player : int, default 0
+    先手のプレイヤー
+
+  Returns
+  -------
+  othello : OthelloBoard
+    初期盤面
+  """
+  if board_size == 8:
+    return OthelloBoard8x8(first_player)
+  elif board_size == 4:
+    return OthelloBoard4x4(first_player)
+  raise ArgsError('board_size({}) must be 4 or 8'.format(board_size))
+
+def make_opening(board_size: int, plies: int, seed: SeedLike = None) -> list[tuple[int, int]]:
+  """
+  ランダムな序盤の着手を作成する
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ
+  plies : int
+    着手数
+  seed : None or int or SeedSequence, default None
+    乱数列のseed
+
+  Returns
+  -------
+  opening : list[tuple[int, int]]
+    player0から始めた着手(x, y)のリスト, 終局しない序盤のみを返す
+  """
+  rng = RandomStream(seed)
+  while True:
+    othello = make_othello(board_size)
+    opening = []
+    for _ in range(plies):
+      x, y = rng.choice(othello.get_candidate_list())
+      othello.reverse(x, y, False)
+      opening.append((x, y))
+      next_state = othello.get_next_state()
+      if next_state == 2:
+        break
+      elif next_state == 0:
+        othello.change_player()
+    else:
+      return opening
+
+def play_game(board_size: int, agent1: Agent, agent2: Agent, opening: list[tuple[int, int]] = (), do_from_agent1: bool = True) -> int:
+  """
+  序盤の着手を行った局面からオセロを1ゲーム行う
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ
+  agent1 : Agent
+    agent1
+  agent2 : Agent
+    agent2
+  opening : list[tuple[int, int]], default ()
+    make_openingで作成した序盤の着手
+  do_from_agent1 : bool, default True
+    agent1が先手か否か
+
+  Returns
+  -------
+  result : int
+    0: agent1, 1: agent2, 2: draw
+  """
+  othello = make_othello(board_size)
+  for x, y in opening:
+    othello.reverse(x, y, False)
+    if othello.get_next_state() == 0:
+      othello.change_player()
+
+  # player0が先手なので、agent1が後手の場合はagent1をplayer1にする
+  agent = [agent1, agent2] if do_from_agent1 else [agent2, agent1]
+  agent1.reset()
+  agent2.reset()
+  while True:
+    agent[othello.now_turn].step(othello)
+
+    next_state = othello.get_next_state()
+    if next_state == 0:
+      othello.change_player()
+    elif next_state == 2:
+      result = othello.get_result()
+      if result == -1:
+        raise OthelloRLError('game finished without result')
+      if result == 2 or do_from_agent1:
+        return result
+      return 1-result
+
+def _init_worker(board_size: int, agents: dict[str, Agent]) -> None:
+  global _worker_state
+  _worker_state = (board_size, agents)
+  init_worker()
+
+def _play_games(name1: str, name2: str, openings: list[list[tuple[int, int]]], seed: np.random.SeedSequence) -> list[int]:
+  """
+  序盤毎に先手と後手を入れ替えて2局ずつ対局する
+
+  Returns
+  -------
+  result : list[int]
+    [name1の勝ち数, name2の勝ち数, 引き分けの数]
+  """
+  board_size, agents = _worker_state
+  agent1 = agents[name1]
+  agent2 = agents[name2]
+  retval = [0, 0, 0]
+  for opening, game_seed in zip(openings, seed.spawn(len(openings))):
+    for do_from_agent1 in [True, False]:
+      seed1, seed2 = game_seed.spawn(2)
+      agent1.set_seed(seed1)
+      agent2.set_seed(seed2)
+      retval[play_game(board_size, agent1, agent2, opening, do_from_agent1)] += 1
+
+  return retval
+
+def get_elo_ratings(names: list[str], results: dict[tuple[str, str], list[int]], prior: float = 1.0) -> dict[str, tuple[float, float]]:
+  """
+  対局結果からBradley-TerryモデルでEloレーティングを推定する
+
+  Parameters
+  ----------
+  names : list[str]
+    agentの名前のリスト
+  results : dict[tuple[str, str], list[int]]
+    (name1, name2)を[name1の勝ち数, name2の勝ち数, 引き分けの数]に写す辞書
+  prior : float, default 1.0
+    対局した組み合わせ毎に加える仮想的な引き分けの数, 全勝や全敗でも有限の値にするため
+
+  Returns
+  -------
+  ratings : dict[str, tuple[float, float]]
+    名前を(レーティング, 95%信頼区間の幅)に写す辞書, レーティングの平均は0
+
+  Notes
+  -----
+  引き分けは0.5勝0.5敗として扱い、MMアルゴリズムで最尤推定を行う
+  信頼区間は対数尤度のヘッセ行列の擬似逆行列から求める
+  """
+  n = len(names)
+  idx = {name: i for i, name in enumerate(names)}
+  wins = np.zeros((n, n))
+  games = np.zeros((n, n))
+  for (name1, name2), (win, lose, draw) in results.items():
+    i, j = idx[name1], idx[name2]
+    total = win+lose+draw+prior
+    wins[i, j] += win+(draw+prior)/2
+    wins[j, i] += lose+(draw+prior)/2
+    games[i, j] += total
+    games[j, i] += total
+
+  gamma = np.ones(n)
+  for _ in range(1000):
+    denom = (games/(gamma[:, None]+gamma[None, :])).sum(axis=1)
+    new_gamma = np.where(denom > 0, wins.sum(axis=1)/np.where(denom > 0, denom, 1), 1.0)
+    new_gamma /= np.exp(np.log(new_gamma).mean())
+    if np.abs(new_gamma-gamma).max() < 1e-10:
+      gamma = new_gamma
+      break
+    gamma = new_gamma
+
+  theta = np.log(gamma)
+  p = gamma[:, None]/(gamma[:, None]+gamma[None, :])
+  w = games*p*p.T
+  info = np.diag(w.sum(axis=1))-w
+  cov = np.linalg.pinv(info)
+  se = np.sqrt(np.maximum(np.diag(cov), 0))
+
+  return {name: (theta[i]*ELO_SCALE, 1.96*se[i]*ELO_SCALE) for name, i in idx.items()}
+
+
+class SPRT:
+  """
+  勝ち, 負け, 引き分けの数に対する逐次確率比検定
+
+  Attributes
+  ----------
+  elo0 : float
+    帰無仮説H0でのEloの差
+  elo1 : float
+    対立仮説H1でのEloの差
+  alpha : float
+    第1種の過誤の確率
+  beta : float
+    第2種の過誤の確率
+  lower : float
+    H0を採択する対数尤度比の境界
+  upper : float
+    H1を採択する対数尤度比の境界
+  win : int
+    勝ち数
+  lose : int
+    負け数
+  draw : int
+    引き分けの数
+  pseudo_count : float
+    対数尤度比を求める時に勝ち, 負け, 引き分けのそれぞれに加える仮想的な対局数
+
+  Notes
+  -----
+  スコア(勝ち1, 引き分け0.5, 負け0)の正規近似による一般化SPRTを用いる
+  全勝や全敗ではスコアの分散が0となり対数尤度比が求まらないので、pseudo_countを加えて分散を正にする
+  """
+  def __init__(self, elo0: float = 0.0, elo1: float = 50.0, alpha: float = 0.05, beta: float = 0.05, pseudo_count: float = 0.5) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    elo0 : float, default 0.0
+      帰無仮説H0でのEloの差
+    elo1 : float, default 50.0
+      対立仮説H1でのEloの差, elo0より大きい
+    alpha : float, default 0.05
+      第1種の過誤の確率
+    beta : float, default 0.05
+      第2種の過誤の確率
+    pseudo_count : float, default 0.5
+      勝ち, 負け, 引き分けのそれぞれに加える仮想的な対局数, 正の値
+    """
+    if elo0 >= elo1:
+      raise ArgsError('elo0({}) must be less than elo1({})'.format(elo0, elo1))
+    if pseudo_count <= 0:
+      raise ArgsError('pseudo_count({}) must be positive'.format(pseudo_count))
+    self.elo0 = elo0
+    self.elo1 = elo1
+    self.alpha = alpha
+    self.beta = beta
+    self.lower = math.log(beta/(1-alpha))
+    self.upper = math.log((1-beta)/alpha)
+    self.win = 0
+    self.lose = 0
+    self.draw = 0
+    self.pseudo_count = pseudo_count
+
+  def add(self, win: int, lose: int, draw: int) -> None:
+    """
+    対局結果を追加するメソッド
+
+    Parameters
+    ----------
+    win : int
+      勝ち数
+    lose : int
+      負け数
+    draw : int
+      引き分けの数
+    """
+    self.win += win
+    self.lose += lose
+    self.draw += draw
+
+  def get_llr(self) -> float:
+    """
+    対数尤度比を求めるメソッド
+
+    Returns
+    -------
+    llr : float
+      H1とH0の対数尤度比, 対局がない場合は0
+    """
+    if self.win+self.lose+self.draw == 0:
+      return 0.0
+    win = self.win+self.pseudo_count
+    lose = self.lose+self.pseudo_count
+    draw = self.draw+self.pseudo_count
+    n = win+lose+draw
+    score = (win+draw/2)/n
+    var = (win*(1-score)**2+draw*(0.5-score)**2+lose*score**2)/n
+    s0 = 1/(1+10**(-self.elo0/400))
+    s1 = 1/(1+10**(-self.elo1/400))
+    return n*(s1-s0)*(2*score-s0-s1)/(2*var)
+
+  def get_status(self) -> int:
+    """
+    検定の状態を返すメソッド
+
+    Returns
+    -------
+    status : int
+      0: H0を採択, 1: H1を採択, -1: 未確定
+    """
+    llr = self.get_llr()
+    if llr <= self.lower:
+      return 0
+    elif llr >= self.upper:
+      return 1
+    return -1
+
+
+class Tournament:
+  """
+  agent同士の対局を行うクラス
+
+  Attributes
+  ----------
+  board_size : int
+    盤のサイズ
+  agents : dict[str, Agent]
+    名前をagentに写す辞書
+  opening_plies : int
+    ランダムに選ぶ序盤の着手数
+  pool_size : int
+    対局に用いるプロセス数
+  results : dict[tuple[str, str], list[int]]
+    (name1, name2)を[name1の勝ち数, name2の勝ち数, 引き分けの数]に写す辞書
+  sprt : dict[tuple[str, str], SPRT]
+    組み合わせ毎のSPRT
+  """
+  def __init__(self, board_size: int, agents: dict[str, Agent], opening_plies: int = 4, pool_size: int = 1, seed: SeedLike = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    board_size : int
+      盤のサイズ
+    agents : dict[str, Agent]
+      名前をagentに写す辞書
+    opening_plies : int, default 4
+      ランダムに選ぶ序盤の着手数
+    pool_size : int, default 1
+      対局に用いるプロセス数, 1であればPoolを用いない
+    seed : None or int or SeedSequence, default None
+      序盤とagentの乱数列を生成する元のseed
+    """
+    self.board_size = board_size
+    self.agents = agents
+    self.opening_plies = opening_plies
+    self.pool_size = pool_size
+    self.results = {}
+    self.sprt = {}
+    self.__seed_sequence = to_seed_sequence(seed)
+
+  def get_round_robin_pairs(self) -> list[tuple[str, str]]:
+    """
+    リーグ戦の組み合わせを返すメソッド
+
+    Returns
+    -------
+    pairs : list[tuple[str, str]]
+      全てのagentの組み合わせ
+    """
+    return list(itertools.combinations(self.agents, 2))
+
+  def get_gauntlet_pairs(self, name: str) -> list[tuple[str, str]]:
+    """
+    ガントレット戦の組み合わせを返すメソッド
+
+    Parameters
+    ----------
+    name : str
+      他の全てのagentと対局するagentの名前
+
+    Returns
+    -------
+    pairs : list[tuple[str, str]]
+      (name, 他のagentの名前)のリスト
+    """
+    return [(name, other) for other in self.agents if other != name]
+
+  def run(self, pairs: list[tuple[str, str]], game_num: int, batch_size: int = 50, sprt: dict = None) -> dict[tuple[str, str], list[int]]:
+    """
+    対局を行うメソッド
+
+    Parameters
+    ----------
+    pairs : list[tuple[str, str]]
+      対局する組み合わせ
+    game_num : int
+      組み合わせ毎の最大の対局数, 先手と後手を入れ替えるので偶数に切り上げる
+    batch_size : int, default 50
+      SPRTを確認するまでに行う序盤の数(対局数はその2倍)
+    sprt : dict, default None
+      SPRTのコンストラクタに渡す引数, Noneであれば常にgame_num局行う
+
+    Returns
+    -------
+    results : dict[tuple[str, str], list[int]]
+      これまでの全ての対局結果
+    """
+    for pair in pairs:
+      self.results.setdefault(pair, [0, 0, 0])
+      if sprt is not None:
+        self.sprt[pair] = SPRT(**sprt)
+
+    opening_num = (game_num+1)//2
+    if sprt is None:
+      batch_size = opening_num
+    active = list(pairs)
+    played = 0
+
+    if self.pool_size > 1:
+      pool = Pool(self.pool_size, initializer=_init_worker, initargs=(self.board_size, self.agents))
+    else:
+      pool = None
+      _init_worker(self.board_size, self.agents)
+    try:
+      while len(active) > 0 and played < opening_num:
+        n = min(batch_size, opening_num-played)
+        sizes = [CHUNK_SIZE]*(n//CHUNK_SIZE) + ([n%CHUNK_SIZE] if n%CHUNK_SIZE > 0 else [])
+        tasks = []
+        for name1, name2 in active:
+          for size, seed in zip(sizes, self.__seed_sequence.spawn(len(sizes))):
+            opening_seed, game_seed = seed.spawn(2)
+            openings = [make_opening(self.board_size, self.opening_plies, s) for s in opening_seed.spawn(size)]
+            tasks.append((name1, name2, openings, game_seed))
+        if pool is not None:
+          batch_results = pool.starmap(_play_games, tasks)
+        else:
+          batch_results = [_play_games(*task) for task in tasks]
+
+        for (name1, name2, _, _), result in zip(tasks, batch_results):
+          for i in range(3):
+            self.results[(name1, name2)][i] += result[i]
+          if sprt is not None:
+            self.sprt[(name1, name2)].add(*result)
+        played += n
+
+        if sprt is not None:
+          for pair in list(active):
+            status = self.sprt[pair].get_status()
+            if status != -1:
+              logger.info('{} vs {}: H{} accepted after {} games'.format(*pair, status, sum(self.results[pair])))
+              active.remove(pair)
+    finally:
+      if pool is not None:
+        pool.close()
+        pool.join()
+
+    return self.results
+
+  def get_ratings(self, prior: float = 1.0) -> dict[str, tuple[float, float]]:
+    """
+    これまでの対局結果からEloレーティングを求めるメソッド
+
+    Parameters
+    ----------
+    prior : float, default 1.0
+      組み合わせ毎に加える仮想的な引き分けの数
+
+    Returns
+    -------
+    ratings : dict[str, tuple[float, float]]
+      名前を(レーティング, 95%信頼区間の幅)に写す辞書
+    """
+    return get_elo_ratings(list(self.agents), self.results, prior)
+
+  def get_report(self) -> str:
+    """
+    対局結果とレーティングの表を返すメソッド
+
+    Returns
+    -------
+    report : str
+      レーティングの高い順の表と組み合わせ毎の対局結果
+    """
+    ratings = self.get_ratings()
+    lines = ['{:<24} {:>8} {:>8}'.format('name', 'elo', '95%')]
+    for name, (elo, ci) in sorted(ratings.items(), key=lambda x: -x[1][0]):
+      lines.append('{:<24} {:>8.1f} {:>8.1f}'.format(name, elo, ci))
+    lines.append('')
+    for (name1, name2), (win, lose, draw) in self.results.items():
+      lines.append('{} vs {}: win: {}, lose: {}, draw: {}'.format(name1, name2, win, lose, draw))
+
+    return '\n'.join(lines)
@@ -1,4 +1,14 @@
+import gzip
+import struct
+from typing import BinaryIO, Iterable
+import numpy as np
 from nbt import nbt
+from othello_rl.error import ArgsError
+
+# 一度にgzipへ書き込む値の数
+CHUNK_SIZE = 1 << 16
+INT_MIN = -(1 << 31)
+INT_MAX = (1 << 31)-1
 
 def get_empty_storage(name_space: str, data_ver: int = 2724) -> nbt.NBTFile:
   """
@@ -38,7 +48,7 @@ def gen_ql_data_storage(ql_data_values: list[int], name_space: str, name: str, s
   Parameters
   ----------
   ql_data_values : list[int]
-    Storageに変換するデータ
+    Storageに変換するデータ, 各値はint()と同様に0の方向へ切り捨てる
   name_space : str
     `name_space`:`name`
   name : str
@@ -46,17 +56,85 @@ def gen_ql_data_storage(ql_data_values: list[int], name_space: str, name: str, s
   save_path : str
     storageの保存場所
   """
-  f = get_empty_storage(name_space)
-  
-  name_com = nbt.TAG_Compound()
-  name_com.name = name
-  f['data']['contents'].tags.append(name_com)
-  
-  text_tag = nbt.TAG_String('test','ql_data')
-  data_list = nbt.TAG_List(name='data', type=nbt.TAG_Int)
-  for v in ql_data_values:
-    data_list.tags.append(nbt.TAG_Int(value=int(v)))
-  name_com.tags.append(text_tag)
-  name_com.tags.append(data_list)
-
-  f.write_file(save_path+'command_storage_'+name_space+'.dat')
\ No newline at end of file
+  if isinstance(ql_data_values, np.ndarray):
+    values = ql_data_values.reshape(-1)
+  else:
+    # dict.values()やジェネレータも受け付けるように、一度だけ配列にする
+    values = np.fromiter(ql_data_values, dtype=np.float64)
+  if not np.issubdtype(values.dtype, np.integer):
+    values = np.trunc(values.astype(np.float64))
+    # NaNも範囲外として扱う
+    if not np.all((values >= INT_MIN) & (values <= INT_MAX)):
+      raise ArgsError('ql_data_values must be in range of int32')
+    values = values.astype(np.int64)
+  write_ql_data_storage(values, name_space, name, save_path)
+
+def _write_tag_header(f: BinaryIO, tag_id: int, name: str) -> None:
+  """
+  タグの種類と名前を書き込む
+  """
+  b = name.encode('utf-8')
+  f.write(struct.pack('>bH', tag_id, len(b)))
+  f.write(b)
+
+def write_ql_data_storage(ql_data_values: Iterable[int], name_space: str, name: str, save_path: str, data_ver: int = 2724, int_array: bool = False) -> None:
+  """
+  QLearning用のStorageをタグのオブジェクトを作らずに直接書き出す
+
+  Parameters
+  ----------
+  ql_data_values : Iterable[int]
+    Storageに変換するデータ, 整数型のみ, numpy.ndarrayであればそのまま用いる
+  name_space : str
+    `name_space`:`name`
+  name : str
+    `name_space`:`name`
+  save_path : str
+    storageの保存場所
+  data_ver : int, default 2724
+    DataVersion
+  int_array : bool, default False
+    dataをTAG_Int_Arrayとするか否か, FalseであればTAG_IntのTAG_List
+
+  Notes
+  -----
+  get_empty_storageとgen_ql_data_storageで作成していたものと同じ構造をgzipへ順に書き込む
+  入力はnp.asarrayで一度配列にする(numpy.ndarray以外はデータ全体の複製となる)
+  ビッグエンディアンのint32への変換と書き込みはCHUNK_SIZE個ずつ行うので、変換後の全体の複製は作らない
+  整数型以外(小数, bool, object等)の配列やint32の範囲外の値を含む場合はArgsErrorとする
+  小数を切り捨てて書き出す場合はgen_ql_data_storageを用いる
+  """
+  values = np.asarray(ql_data_values)
+  if values.ndim != 1:
+    values = values.reshape(-1)
+  # astype('>i4')は小数を切り捨ててしまうので、整数型以外は受け付けない
+  if not np.issubdtype(values.dtype, np.integer):
+    raise ArgsError('ql_data_values must be integers, got {}'.format(values.dtype))
+  if values.size > 0 and (values.min() < INT_MIN or values.max() > INT_MAX):
+    raise ArgsError('ql_data_values must be in range of int32')
+
+  with gzip.open(save_path+'command_storage_'+name_space+'.dat', 'wb') as f:
+    _write_tag_header(f, nbt.TAG_COMPOUND, 'command_storage_'+name_space+'.dat')
+    _write_tag_header(f, nbt.TAG_COMPOUND, 'data')
+    _write_tag_header(f, nbt.TAG_COMPOUND, 'contents')
+    _write_tag_header(f, nbt.TAG_COMPOUND, name)
+
+    _write_tag_header(f, nbt.TAG_STRING, 'ql_data')
+    b = 'test'.encode('utf-8')
+    f.write(struct.pack('>H', len(b)))
+    f.write(b)
+
+    if int_array:
+      _write_tag_header(f, nbt.TAG_INT_ARRAY, 'data')
+      f.write(struct.pack('>i', values.size))
+    else:
+      _write_tag_header(f, nbt.TAG_LIST, 'data')
+      f.write(struct.pack('>bi', nbt.TAG_INT, values.size))
+    for i in range(0, values.size, CHUNK_SIZE):
+      f.write(values[i:i+CHUNK_SIZE].astype('>i4').tobytes())
+
+    # name, contents, dataの終わり
+    f.write(bytes([nbt.TAG_END]*3))
+    _write_tag_header(f, nbt.TAG_INT, 'DataVersion')
+    f.write(struct.pack('>i', data_ver))
+    f.write(bytes([nbt.TAG_END]))
@@ -1,10 +1,16 @@
 from abc import ABCMeta, abstractmethod
-import random
 from logging import getLogger
+from typing import TYPE_CHECKING
+from othello_rl.profiler import profile
+from othello_rl.rng import RandomStream, SeedLike
 from othello_rl.tree import Node
 from othello_rl.othello.board import OthelloBoard, OthelloData
 from othello_rl.othello.features import Features
 from othello_rl.othello.positional_evaluation import PositionalEvaluation
+from othello_rl.othello.solver import PerfectPlayTable
+if TYPE_CHECKING:
+  # bookはagentをimportするので、型注釈のためだけにimportする
+  from othello_rl.othello.book import OpeningBook
 
 logger = getLogger(__name__)
 inf = float('inf')
@@ -30,6 +36,25 @@ class Agent(metaclass=ABCMeta):
     """
     pass
 
+  def set_seed(self, seed: SeedLike) -> None:
+    """
+    agentが利用する乱数列を初期化するメソッド
+    乱数を利用しないagentでは何もしない
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence
+      乱数列のseed
+    """
+    pass
+
+  def reset(self) -> None:
+    """
+    新しいゲームを始める前に、前のゲームから持ち越した状態を破棄するメソッド
+    状態を持たないagentでは何もしない
+    """
+    pass
+
 class PlayerAgent(Agent):
   """
   プレイヤーによるagent
@@ -61,7 +86,35 @@ class PlayerAgent(Agent):
 class RandomAgent(Agent):
   """
   候補からランダムに次の手を選択するagent
+
+  Attributes
+  ----------
+  rng : RandomStream
+    手の選択に用いる乱数列
   """
+  def __init__(self, seed: SeedLike = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence, default None
+      乱数列のseed
+    """
+    self.rng = RandomStream(seed)
+
+  def set_seed(self, seed: SeedLike) -> None:
+    """
+    agentが利用する乱数列を初期化するメソッド
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence
+      乱数列のseed
+    """
+    self.rng.seed(seed)
+
+  @profile
   def step(self, othello: OthelloBoard) -> bool:
     """
     オセロを一手進めるメソッド
@@ -77,7 +130,7 @@ class RandomAgent(Agent):
       ゲームを進めることが出来たか否か
     """
     candidate_list = othello.get_candidate_list()
-    next = random.choice(candidate_list)
+    next = self.rng.choice(candidate_list)
     result = othello.reverse(next[0], next[1], False)
 
     return result
@@ -96,8 +149,13 @@ class MinMaxAgent(Agent):
   root_player : int
     ゲーム木のrootのプレイヤー
   tree : Node
+  book : OpeningBook or None
+    探索の前に参照する定石
+  book_exit_count : int or None
+    定石を外れた時の着手数, Noneであれば定石の中にいる
+    新しいゲームを始める前にresetを呼ぶこと
   """
-  def __init__(self, deepth: int, pos_evaluation: PositionalEvaluation) -> None:
+  def __init__(self, deepth: int, pos_evaluation: PositionalEvaluation, book: 'OpeningBook' = None) -> None:
     """
     コンストラクタ
 
@@ -107,10 +165,21 @@ class MinMaxAgent(Agent):
       ゲーム木の深さ
     pos_evaluation : PositionalEvaluation
       局面評価関数
+    book : othello.book.OpeningBook, default None
+      探索の前に参照する定石, Noneであれば参照しない
     """
     self.deepth = deepth
     self.pos_evaluation = pos_evaluation
+    self.book = book
+    self.book_exit_count = None
+    self.tree = None
+
+  def reset(self) -> None:
+    """
+    新しいゲームを始める前に、前のゲームから持ち越した状態を破棄するメソッド
+    """
     self.tree = None
+    self.book_exit_count = None
 
   def __alpha_beta(self, othello: OthelloBoard, n: int, alpha: int, beta: int, node: Node) -> tuple[int, int, int]:
     """
@@ -122,11 +191,7 @@ class MinMaxAgent(Agent):
       ret_x = ret_y = -1
 
       for next_node in node.next:
-        othello.past_data.append(OthelloData(board_0=othello.board[0], board_1=othello.board[1], turn=othello.now_turn, count=othello.count, x=node.data['x'], y=node.data['y']))
-        othello.board[0] = next_node.data['board_0']
-        othello.board[1] = next_node.data['board_1']
-        othello.now_turn = next_node.data['now_turn']
-        othello.count = next_node.data['count']
+        othello.push_state(next_node.data['board_0'], next_node.data['board_1'], next_node.data['now_turn'], next_node.data['count'], node.data['x'], node.data['y'])
         x = next_node.data['x']
         y = next_node.data['y']
         if len(next_node.next) != 0:
@@ -193,7 +258,18 @@ class MinMaxAgent(Agent):
         return True
     return False
 
+  @profile
   def step(self, othello: OthelloBoard) -> bool:
+    if self.book is not None:
+      # 一度定石を外れたら、そのゲームでは定石を参照しない
+      if self.book_exit_count is None:
+        move = self.book.get_move(othello)
+        if move is not None:
+          # 定石の間はゲーム木を保持しない
+          self.tree = None
+          return othello.reverse(move[0], move[1], False)
+        self.book_exit_count = othello.count
+
     self.root_player = othello.now_turn
     new_node_flg = True
     if self.tree != None and self.deepth >= 3:
@@ -267,6 +343,7 @@ class QLearningAgent(Agent):
     """
     return self.data.get((s, a), self.init_value)
 
+  @profile
   def step(self, othello: OthelloBoard) -> bool:
     """
     オセロを一手進めるメソッド
@@ -282,14 +359,53 @@ class QLearningAgent(Agent):
       ゲームを進めることが出来たか否か
     """
     candidate_list = othello.get_candidate_list()
+    s = self.features.get_index(othello)
     q_list = []
-    tmp = []
     for x, y in candidate_list:
-      tmp.append([self.features.get_index(othello), x*8+y])
-      q_list.append(self.__get(tmp[-1][0], tmp[-1][1]))
+      q_list.append(self.__get(s, self.features.get_action(othello, x, y)))
     
     q = max(q_list)
     idx = q_list.index(q)
     result = othello.reverse(candidate_list[idx][0], candidate_list[idx][1], False)
 
-    return result
\ No newline at end of file
+    return result
+
+class PerfectAgent(Agent):
+  """
+  4x4のオセロの完全解析の結果によるagent
+
+  Attributes
+  ----------
+  table : PerfectPlayTable
+    完全解析の結果
+  """
+  def __init__(self, table: PerfectPlayTable) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    table : PerfectPlayTable
+      完全解析の結果
+    """
+    self.table = table
+
+  @profile
+  def step(self, othello: OthelloBoard) -> bool:
+    """
+    オセロを一手進めるメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      ゲームの現在の状況, 4x4のみ
+
+    Returns
+    -------
+    result : bool
+      ゲームを進めることが出来たか否か
+    """
+    _, move = self.table.get(othello)
+    result = othello.reverse(move//4, move%4, False)
+
+    return result
@@ -1,5 +1,7 @@
 from abc import ABCMeta, abstractmethod
-from othello_rl.bit_opperation import pop_count, flip_horizontal_bm4, flip_vertical_bm4, flip_diagonal_bm4, flip_anti_diagonal_bm4
+from othello_rl.bit_opperation import pop_count
+from othello_rl.profiler import profile
+from othello_rl.othello.stability import get_determine_piece_table_4x4, get_edge_stable_board, get_stable_board
 from othello_rl.tree import NodeData
 from logging import getLogger
 from pprint import pprint
@@ -23,6 +25,10 @@ class OthelloData(NodeData):
     この盤面に至る最後の着手位置x
   y : int
     この盤面に至る最後の着手位置y
+  piece_num : tuple[int, int]
+    この盤面でのplayer0, 1のコマの数
+  corner_num : tuple[int, int]
+    この盤面でのplayer0, 1の角のコマの数
   """
   board_0: int
   board_1: int
@@ -30,6 +36,8 @@ class OthelloData(NodeData):
   count: int
   x: int
   y: int
+  piece_num: tuple[int, int]
+  corner_num: tuple[int, int]
 
 class OthelloBoard(metaclass=ABCMeta):
   """
@@ -45,11 +53,21 @@ class OthelloBoard(metaclass=ABCMeta):
     現在手番であるプレイヤー
   count : int
     手番の総数
-  legal_board_cache : list
-    leagal_boardのキャッシュ
+  position_cache : dict[tuple[int, int], list]
+    盤面毎の[player0の合成手ボード, player1の合成手ボード, ゲームの結果]のキャッシュ
+  piece_num : list[int]
+    player0, 1のコマの数
+  corner_num : list[int]
+    player0, 1の角のコマの数
 
   Notes
   -----
+  piece_num, corner_numはreverse, undoの度に差分で更新されるので、盤面を直接書き換える場合はset_boardを用いること
+
+  position_cacheは盤面そのものをキーとするので、undo, change_player, set_boardの後も正しい値を返す
+  合成手ボードは手番に依らないので、次の手番での状態は手番とキャッシュした合成手ボードから求める
+  キャッシュの数がposition_cache_sizeに達した場合は全て破棄する
+
   以下のサイトを参考にした
   https://qiita.com/sensuikan1973/items/459b3e11d91f3cb37e43
   """
@@ -58,15 +76,95 @@ class OthelloBoard(metaclass=ABCMeta):
   horizontal_pivot_coff: int
   vertical_pivot_coff: int
   all_pivot_coff: int
+  corner_coff: int
   transfer_coff: list[int]
+  position_cache_size = 4096
 
   @abstractmethod
   def __init__(self, first_player_num: int = 0) -> None:    
     self.now_turn = first_player_num
     self.count = 0
     self.past_data = []
-    self.legal_board_cache = [{'count': -1, 'legal_board': -1}, {'count': -1, 'legal_board': -1}]
+    self.position_cache = {}
+
+  def set_board(self, board_0: int, board_1: int) -> None:
+    """
+    盤面を直接設定するメソッド
 
+    Parameters
+    ----------
+    board_0 : int
+      player0のコマの位置
+    board_1 : int
+      player1のコマの位置
+    """
+    self.board = [board_0, board_1]
+    self.piece_num = [pop_count(board_0), pop_count(board_1)]
+    self.corner_num = [pop_count(board_0 & self.corner_coff), pop_count(board_1 & self.corner_coff)]
+
+  def push_state(self, board_0: int, board_1: int, turn: int, count: int, x: int, y: int) -> None:
+    """
+    現在の盤面をpast_dataに保存し、指定された盤面に移るメソッド
+    undoで元の盤面に戻ることができる
+
+    Parameters
+    ----------
+    board_0 : int
+      player0のコマの位置
+    board_1 : int
+      player1のコマの位置
+    turn : int
+      移った盤面でのプレイヤー
+    count : int
+      移った盤面までの着手数
+    x : int
+      past_dataに記録する着手位置x
+    y : int
+      past_dataに記録する着手位置y
+    """
+    self.past_data.append(self.__get_data(x, y))
+    self.set_board(board_0, board_1)
+    self.now_turn = turn
+    self.count = count
+
+  def __get_data(self, x: int, y: int) -> OthelloData:
+    """
+    現在の盤面のOthelloDataを作成するメソッド
+
+    Parameters
+    ----------
+    x : int
+      記録する着手位置x
+    y : int
+      記録する着手位置y
+
+    Returns
+    -------
+    data : OthelloData
+      現在の盤面のデータ
+    """
+    return OthelloData(board_0=self.board[0], board_1=self.board[1], turn=self.now_turn, count=self.count, x=x, y=y, piece_num=(self.piece_num[0], self.piece_num[1]), corner_num=(self.corner_num[0], self.corner_num[1]))
+
+  def __get_position_cache(self) -> list:
+    """
+    現在の盤面のキャッシュを返すメソッド
+
+    Returns
+    -------
+    cache : list
+      [player0の合成手ボード, player1の合成手ボード, ゲームの結果], 未計算の値はNone
+    """
+    key = (self.board[0], self.board[1])
+    cache = self.position_cache.get(key)
+    if cache is None:
+      if len(self.position_cache) >= self.position_cache_size:
+        self.position_cache.clear()
+      cache = [None, None, None]
+      self.position_cache[key] = cache
+
+    return cache
+
+  @profile
   def __make_legal_board(self, player_num: int) -> int:
     """
     合成手ボードの作成を行うメソッド
@@ -81,8 +179,9 @@ class OthelloBoard(metaclass=ABCMeta):
     legal_board : int
       合成手ボード
     """
-    if self.legal_board_cache[player_num]['count'] == self.count:
-      return self.legal_board_cache[player_num]['legal_board']
+    cache = self.__get_position_cache()
+    if cache[player_num] is not None:
+      return cache[player_num]
     
     horizontal_pivot = self.board[player_num-1] & self.horizontal_pivot_coff
     vertical_pivot = self.board[player_num-1] & self.vertical_pivot_coff
@@ -130,11 +229,44 @@ class OthelloBoard(metaclass=ABCMeta):
       tmp |= all_pivot & (tmp >> (self.board_width-1))
     retval |= blank & (tmp >> (self.board_width-1))
 
-    self.legal_board_cache[player_num]['count'] = self.count
-    self.legal_board_cache[player_num]['legal_board'] = retval
+    cache[player_num] = retval
 
     return retval
   
+  def get_legal_board(self, player_num: int) -> int:
+    """
+    合成手ボードを返すメソッド
+
+    Parameters
+    ----------
+    player_num : int
+      合成手ボードを作成するプレイヤー
+
+    Returns
+    -------
+    legal_board : int
+      合成手ボード
+    """
+    return self.__make_legal_board(player_num)
+
+  def get_adjacent_board(self, bits: int) -> int:
+    """
+    指定されたマスに8方向で隣接するマスを返すメソッド
+
+    Parameters
+    ----------
+    bits : int
+      対象となるマス
+
+    Returns
+    -------
+    adjacent_board : int
+      bitsのいずれかのマスに隣接するマス
+    """
+    t = self.transfer_coff
+    return ((bits << t[0][0]) & t[0][1]) | ((bits << t[1][0]) & t[1][1]) | ((bits >> t[2][0]) & t[2][1]) | ((bits >> t[3][0]) & t[3][1]) \
+      | ((bits >> t[4][0]) & t[4][1]) | ((bits >> t[5][0]) & t[5][1]) | ((bits << t[6][0]) & t[6][1]) | ((bits << t[7][0]) & t[7][1])
+
   def __can_put(self, x: int, y: int) -> bool:
     """
     指定された座標上にコマを置けるかを返すメソッド
@@ -156,6 +288,7 @@ class OthelloBoard(metaclass=ABCMeta):
   
     return (put & legal_board) == put
 
+  @profile
   def reverse(self, x: int, y: int, check_can_put: bool = True) -> bool:
     """
     指定された座標のコマを裏返すメソッド
@@ -177,7 +310,7 @@ class OthelloBoard(metaclass=ABCMeta):
     if check_can_put and not self.__can_put(x, y):
       return False
     
-    self.past_data.append(OthelloData(board_0=self.board[0], board_1=self.board[1], turn=self.now_turn, count=self.count, x=x, y=y))
+    self.past_data.append(self.__get_data(x, y))
     
     put = 1 << (x*self.board_width+y)
     rev = 0
@@ -200,6 +333,12 @@ class OthelloBoard(metaclass=ABCMeta):
     self.board[self.now_turn] ^= put | rev
     self.board[self.now_turn-1] ^= rev
 
+    rev_num = pop_count(rev)
+    self.piece_num[self.now_turn] += rev_num + 1
+    self.piece_num[self.now_turn-1] -= rev_num
+    if put & self.corner_coff:
+      self.corner_num[self.now_turn] += 1
+
     self.count += 1
 
     return True
@@ -215,8 +354,13 @@ class OthelloBoard(metaclass=ABCMeta):
       - 1: パスする
       - 2: ゲームを終了する
     """
-    player_legal_board = self.__make_legal_board(abs(self.now_turn-1))
-    opponent_legal_board = self.__make_legal_board(self.now_turn)
+    cache = self.__get_position_cache()
+    player_legal_board = cache[1-self.now_turn]
+    if player_legal_board is None:
+      player_legal_board = self.__make_legal_board(1-self.now_turn)
+    opponent_legal_board = cache[self.now_turn]
+    if opponent_legal_board is None:
+      opponent_legal_board = self.__make_legal_board(self.now_turn)
 
     if player_legal_board == 0 and opponent_legal_board != 0:
       return 1
@@ -319,6 +463,8 @@ class OthelloBoard(metaclass=ABCMeta):
       data = self.past_data.pop(-1)
       self.board[0] = data['board_0']
       self.board[1] = data['board_1']
+      self.piece_num = list(data['piece_num'])
+      self.corner_num = list(data['corner_num'])
       self.now_turn = data['turn']
       self.count = data['count']
   
@@ -355,14 +501,7 @@ class OthelloBoard(metaclass=ABCMeta):
     piece_num : int
       コマの総数
     """
-    i = 1
-    retval = 0
-    while i<=self.board[player_num]:
-      if self.board[player_num] & i:
-        retval += 1
-      i <<= 1
-
-    return retval
+    return self.piece_num[player_num]
 
   def get_result(self) -> int:
     """
@@ -377,17 +516,21 @@ class OthelloBoard(metaclass=ABCMeta):
       - 2 : 引き分け
       - -1: ゲームがまだ終了していない
     """
+    cache = self.__get_position_cache()
+    if cache[2] is not None:
+      return cache[2]
+
     if self.get_next_state() != 2:
-      return -1
-    
-    a_count = self.get_piece_num(0)
-    b_count = self.get_piece_num(1)
-    
-    if a_count > b_count:
-      return 0
-    if a_count < b_count:  
-      return 1
-    return 2
+      retval = -1
+    elif self.piece_num[0] > self.piece_num[1]:
+      retval = 0
+    elif self.piece_num[0] < self.piece_num[1]:
+      retval = 1
+    else:
+      retval = 2
+    cache[2] = retval
+
+    return retval
 
   @abstractmethod
   def get_determine_piece_line(self, player_num: int) -> int:
@@ -412,19 +555,20 @@ class OthelloBoard4x4(OthelloBoard):
     現在手番であるプレイヤー
   count : int
     手番の総数
-  legal_board_cache : list
-    leagal_boardのキャッシュ
+  position_cache : dict[tuple[int, int], list]
+    盤面毎の[player0の合成手ボード, player1の合成手ボード, ゲームの結果]のキャッシュ
   """
   board_width = 4
   transfer_coff = [[4, 0xfff0], [3, 0x7770], [1, 0x7777], [5, 0x0777], [4, 0x0fff], [3, 0x0eee], [1, 0xeeee], [5, 0xeee0]]
   horizontal_pivot_coff = 0x6666
   vertical_pivot_coff = 0x0ff0
   all_pivot_coff = 0x0660
+  corner_coff = 0x9009
   
   def __init__(self, first_player_num: int) -> None:
     super().__init__(first_player_num=first_player_num)
 
-    self.board = [0x0_4_2_0, 0x0_2_4_0]
+    self.set_board(0x0_4_2_0, 0x0_2_4_0)
     
   def get_determine_piece_line(self, player_num: int) -> int:
     pass
@@ -442,128 +586,12 @@ class OthelloBoard4x4(OthelloBoard):
     -------
     determine_piece_num : int
       確定石の数
-    """
-    retval = 0
-    line_list = [False]*4
-    if self.board[player_num] & 0x000f == 0x000f:
-      line_list[0] = True
-    if self.board[player_num] & 0x1111 == 0x1111:
-      line_list[1] = True
-    if self.board[player_num] & 0x8888 == 0x8888:
-      line_list[2] = True
-    if self.board[player_num] & 0xf000 == 0xf000:
-      line_list[3] = True
-    
-    if line_list.count(True) == 4:
-      retval = 12
-      retval += pop_count(self.board[player_num] & 0x0aa0)
-    elif line_list.count(True) == 3:
-      if line_list[0] == False:
-        bits = flip_vertical_bm4(self.board[player_num])
-      elif line_list[1] == False:
-        bits = flip_diagonal_bm4(self.board[player_num])
-      elif line_list[2] == False:
-        bits = flip_anti_diagonal_bm4(self.board[player_num])
-      else:
-        bits = self.board[player_num]
-
-      retval = 10
-      retval += pop_count(bits & 0xa0a0)
-      if (bits & 0x4000 or bits & 0x0040) and bits & 0x0400:
-        retval += 1
-      if (bits & 0x2000 or bits & 0x0020) and bits & 0x0200:
-        retval += 1
-    elif line_list.count(True) == 2:
-      if line_list[0] == line_list[3]:
-        if line_list[0] == True:
-          bits = flip_diagonal_bm4(self.board[player_num])
-        else:
-          bits = self.board[player_num]
-
-        retval = 8
-        retval += pop_count(bits & 0xa00a)
-        if bits & 0x4400 == 0x4400 or bits & 0x0444 == 0x0444:
-          retval += 1
-        if bits & 0x0044 == 0x0044 or bits & 0x4440 == 0x4440:
-          retval += 1
-        if bits & 0x2200 == 0x2200 or bits & 0x0222 == 0x0222:
-          retval += 1
-        if bits & 0x0022 == 0x0022 or bits & 0x2220 == 0x2220:
-          retval += 1
-      else:
-        if line_list[0] and line_list[1]:
-          bits = self.board[player_num]
-        elif line_list[1] and line_list[3]:
-          bits = flip_vertical_bm4(self.board[player_num])
-        elif line_list[3] and line_list[2]:
-          bits = flip_diagonal_bm4(self.board[player_num])
-        else:
-          bits = flip_horizontal_bm4(self.board[player_num])
-
-        retval = 7
-        retval += pop_count(bits & 0xa0a0)
-        if bits & 0xc000 == 0xc000 or bits & 0x6000 == 0x6000:
-          retval += 1
-        if bits & 0x8800 == 0x8800 or bits & 0x0880 == 0x0880:
-          retval += 1
-        if bits & 0x2200 == 0x2200 or bits & 0x0220 == 0x0220:
-          retval += 1
-        if bits & 0x00c0 == 0x00c0 or bits & 0x0060 == 0x0060:
-          retval += 1
-    elif line_list.count(True) == 1:
-      if line_list[0]:
-        bits = self.board[player_num]
-      elif line_list[1]:
-        bits = flip_anti_diagonal_bm4(self.board[player_num])
-      elif line_list[2]:
-        bits = flip_diagonal_bm4(self.board[player_num])
-      else:
-        bits = flip_vertical_bm4(self.board[player_num])
-
-      retval = 4
-      retval += pop_count(bits & 0x9090)
-      if bits & 0x00c0 == 0x00c0 or bits & 0x0070 == 0x0070:
-        retval += 1
-      if bits & 0x0070 == 0x0070 or bits & 0x0030 == 0x0030:
-        retval += 1
-      if bits & 0xc000 == 0xc000 or bits & 0x7000 == 0x7000:
-        retval += 1
-      if bits & 0xe000 == 0xe000 or bits & 0x3000 == 0x3000:
-        retval += 1
-      if bits & 0x8800 == 0x8800 or bits & 0x0880 == 0x0880:
-        retval += 1
-      if bits & 0x1100 == 0x1100 or bits & 0x0110 == 0x0110:
-        retval += 1
-      if bits & 0xec00 == 0xec00:
-        retval += 1
-      if bits & 0x7300 == 0x7300:
-        retval += 1
-    else:
-      bits = self.board[player_num]
-      if bits & 0xc000 == 0xc000 or bits & 0x7000 == 0x7000:
-        retval += 1
-      if bits & 0x3000 == 0x3000 or bits & 0xe000 == 0xe000:
-        retval += 1
-      if bits & 0x8800 == 0x8800 or bits & 0x0888 == 0x0888:
-        retval += 1
-      if bits & 0xec00 == 0xec00 or bits & 0xcc80 == 0xcc80:
-        retval += 1
-      if bits & 0x7300 == 0x7300 or bits & 0x0331 == 0x0331:
-        retval += 1
-      if bits & 0x1100 == 0x1100 or bits & 0x0111 == 0x0111:
-        retval += 1
-      if bits & 0x0011 == 0x0011 or bits & 0x1110 == 0x1110:
-        retval += 1
-      if bits & 0x08cc == 0x08cc or bits & 0x00ce == 0x00ce:
-        retval += 1
-      if bits & 0x0133 == 0x0133 or bits & 0x0037 == 0x0037:
-        retval += 1
-      if bits & 0x000c == 0x000c or bits & 0x0007 == 0x0007:
-        retval += 1
-      if bits & 0x0003 == 0x0003 or bits & 0x000e == 0x000e:
-        retval += 1
 
-    return retval
+    Notes
+    -----
+    4x4では自分のコマの配置のみから決まるので、予め作成した表を引いて求める
+    """
+    return get_determine_piece_table_4x4()[self.board[player_num]]
   
 
 class OthelloBoard8x8(OthelloBoard):
@@ -580,19 +608,20 @@ class OthelloBoard8x8(OthelloBoard):
     現在手番であるプレイヤー
   count : int
     手番の総数
-  legal_board_cache : list
-    leagal_boardのキャッシュ
+  position_cache : dict[tuple[int, int], list]
+    盤面毎の[player0の合成手ボード, player1の合成手ボード, ゲームの結果]のキャッシュ
   """
   board_width = 8
   transfer_coff = [[8, 0xffffffffffffff00], [7, 0x7f7f7f7f7f7f7f00], [1, 0x7f7f7f7f7f7f7f7f], [9, 0x007f7f7f7f7f7f7f], [8, 0x00ffffffffffffff], [7, 0x00fefefefefefefe], [1, 0xfefefefefefefefe], [9, 0xfefefefefefefe00]]
   horizontal_pivot_coff = 0x7e7e7e7e7e7e7e7e
   vertical_pivot_coff = 0x00ffffffffffff00
   all_pivot_coff = 0x007e7e7e7e7e7e00
+  corner_coff = 0x8100000000000081
   
   def __init__(self, first_player_num: int) -> None:
     super().__init__(first_player_num=first_player_num)
 
-    self.board = [0x0000000810000000, 0x0000001008000000]
+    self.set_board(0x0000000810000000, 0x0000001008000000)
     
   def get_determine_piece_line(self, player_num: int) -> int:
     """
@@ -607,65 +636,25 @@ class OthelloBoard8x8(OthelloBoard):
     -------
     determine_piece_num : int
       確定石の数
-    """
-    retval = 0
-    i = 0x00_00_00_00_00_00_00_01
-    count = 0
-    while self.board[player_num] & i:
-      i <<= 8
-      count += 1
-    retval += count
-    if i != 0x01_00_00_00_00_00_00_00_00 and self.board[player_num] & 0x01_00_00_00_00_00_00_00:
-      i = 0x00_01_00_00_00_00_00_00
-      count = 0
-      while self.board[player_num] & i:
-        i >>= 8
-        count += 1
-      retval += count
-      
-    i = 0x01_00_00_00_00_00_00_00
-    count = 0
-    while self.board[player_num] & i:
-      i <<= 1
-      count += 1
-    retval += count
-    if i != 0x01_00_00_00_00_00_00_00_00_00 and self.board[player_num] & 0x80_00_00_00_00_00_00_00:
-      i = 0x40_00_00_00_00_00_00_00
-      count = 0
-      while self.board[player_num] & i:
-        i >>= 1
-        count += 1
-      retval += count
-
-    i = 0x80_00_00_00_00_00_00_00
-    count = 0
-    while self.board[player_num] & i:
-      i >>= 8
-      count += 1
-    retval += count
-    if i != 0x00_00_00_00_00_00_00_00_00 and self.board[player_num] & 0x00_00_00_00_00_00_00_80:
-      i = 0x00_00_00_00_00_00_80_00
-      count = 0
-      while self.board[player_num] & i:
-        i <<= 8
-        count += 1
-      retval += count
-    
-    i = 0x00_00_00_00_00_00_00_80
-    count = 0
-    while self.board[player_num] & i:
-      i >>= 1
-      count += 1
-    retval += count
-    if i != 0x00_00_00_00_00_00_00_00 and self.board[player_num] & 0x00_00_00_00_00_00_00_01:
-      i = 0x00_00_00_00_00_00_00_02
-      count = 0
-      while self.board[player_num] & i:
-        i <<= 1
-        count += 1
-      retval += count
 
-    return retval
+    Notes
+    -----
+    縁の1行毎に、予め作成した表を引いて求める
+    """
+    return pop_count(get_edge_stable_board(self.board[player_num], self.board[player_num-1]))
 
   def get_determine_piece(self, player_num: int) -> int:
-    pass
\ No newline at end of file
+    """
+    確定石を数え上げるメソッド
+
+    Parameters
+    ----------
+    player_num : int
+      確定石を数えるプレイヤー
+
+    Returns
+    -------
+    determine_piece_num : int
+      確定石の数
+    """
+    return pop_count(get_stable_board(self.board[player_num], self.board[player_num-1]))
\ No newline at end of file
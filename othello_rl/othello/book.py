@@ -0,0 +1,296 @@
+"""
+序盤の定石(opening book)
+
+Notes
+-----
+自己対戦で頻繁に現れた序盤の局面について、深い探索で求めた手を保存しておく
+局面は盤面の8通りの対称変換のうち(手番のプレイヤーのコマ, 相手のコマ)が最小となるものに正規化し、
+64bitのハッシュ値をキーとする
+手は正規化した盤面上での位置(x*board_width+y)として保存する
+"""
+from logging import getLogger
+import numpy as np
+from othello_rl.bit_opperation import DIHEDRAL_BM4, DIHEDRAL_BM8
+from othello_rl.error import ArgsError
+from othello_rl.rng import SeedLike, spawn_seeds
+from othello_rl.othello.agent import Agent, MinMaxAgent, RandomAgent
+from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
+from othello_rl.othello.positional_evaluation import PositionalEvaluation
+
+logger = getLogger(__name__)
+MASK64 = 0xffffffffffffffff
+
+def _mix64(x: int) -> int:
+  """
+  64bitの値を撹拌する(splitmix64)
+
+  Parameters
+  ----------
+  x : int
+    撹拌する値
+
+  Returns
+  -------
+  x : int
+    撹拌された値
+  """
+  x = ((x ^ (x >> 30))*0xbf58476d1ce4e5b9) & MASK64
+  x = ((x ^ (x >> 27))*0x94d049bb133111eb) & MASK64
+  return x ^ (x >> 31)
+
+def _make_othello(board_size: int) -> OthelloBoard:
+  """
+  盤のサイズからオセロを作成する
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ, 4 or 8
+
+  Returns
+  -------
+  othello : OthelloBoard
+    初期盤面
+  """
+  if board_size == 8:
+    return OthelloBoard8x8(0)
+  elif board_size == 4:
+    return OthelloBoard4x4(0)
+  raise ArgsError('board_size({}) must be 4 or 8'.format(board_size))
+
+def get_canonical_position(othello: OthelloBoard) -> tuple[int, int, object]:
+  """
+  局面を正規化する
+
+  Parameters
+  ----------
+  othello : OthelloBoard
+    対象となる局面, 手番はothello.now_turn
+
+  Returns
+  -------
+  p : int
+    正規化された手番のプレイヤーのコマの位置
+  o : int
+    正規化された相手のコマの位置
+  transform : Callable[[int], int]
+    正規化に用いた対称変換
+  """
+  transforms = DIHEDRAL_BM8 if othello.board_width == 8 else DIHEDRAL_BM4
+  p = othello.board[othello.now_turn]
+  o = othello.board[othello.now_turn-1]
+
+  retval = None
+  for transform in transforms:
+    position = (transform(p), transform(o))
+    if retval is None or position < retval[:2]:
+      retval = (*position, transform)
+
+  return retval
+
+def get_book_key(p: int, o: int) -> int:
+  """
+  正規化された局面のキーを求める
+
+  Parameters
+  ----------
+  p : int
+    正規化された手番のプレイヤーのコマの位置
+  o : int
+    正規化された相手のコマの位置
+
+  Returns
+  -------
+  key : int
+    64bitのハッシュ値
+  """
+  return _mix64(p ^ _mix64(o))
+
+
+class OpeningBook:
+  """
+  序盤の定石
+
+  Attributes
+  ----------
+  board_width : int
+    盤面の長さ
+  data : dict[int, int]
+    局面のキーを正規化された盤面上での手に写す辞書
+  max_ply : int or None
+    定石に含まれる局面の着手数(othello.count)の上限, これ以上の局面は参照しなくてよい
+  """
+  def __init__(self, board_width: int, data: dict[int, int] = None, max_ply: int = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    board_width : int
+      盤面の長さ
+    data : dict[int, int], default None
+      定石, Noneであれば空
+    max_ply : int, default None
+      定石に含まれる局面の着手数の上限, Noneであれば上限なし
+    """
+    self.board_width = board_width
+    self.data = {} if data is None else data
+    self.max_ply = max_ply
+
+  def __len__(self) -> int:
+    return len(self.data)
+
+  def add(self, othello: OthelloBoard, x: int, y: int) -> None:
+    """
+    定石を追加するメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      対象となる局面
+    x : int
+      打つ手のx座標
+    y : int
+      打つ手のy座標
+    """
+    p, o, transform = get_canonical_position(othello)
+    put = transform(1 << (x*self.board_width+y))
+    self.data[get_book_key(p, o)] = put.bit_length()-1
+
+  def get_move(self, othello: OthelloBoard) -> tuple[int, int]:
+    """
+    局面に対する定石の手を返すメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      対象となる局面, 手番はothello.now_turn
+
+    Returns
+    -------
+    move : tuple[int, int] or None
+      定石の手(x, y), 定石がなければNone
+    """
+    if othello.board_width != self.board_width:
+      return None
+    if self.max_ply is not None and othello.count >= self.max_ply:
+      return None
+    p, o, transform = get_canonical_position(othello)
+    move = self.data.get(get_book_key(p, o))
+    if move is None:
+      return None
+
+    # ハッシュの衝突に備え、合法手の中から変換後に一致するものを探す
+    for x, y in othello.get_candidate_list():
+      if transform(1 << (x*self.board_width+y)) == 1 << move:
+        return x, y
+
+    return None
+
+  def save(self, path: str) -> None:
+    """
+    定石の書き出し
+
+    Parameters
+    ----------
+    path : str
+      ファイルの保存場所(.npz)
+    """
+    keys = np.array(sorted(self.data.keys()), dtype=np.uint64)
+    moves = np.array([self.data[k] for k in keys.tolist()], dtype=np.uint8)
+    max_ply = -1 if self.max_ply is None else self.max_ply
+    np.savez_compressed(path, board_width=self.board_width, keys=keys, moves=moves, max_ply=max_ply)
+
+  @classmethod
+  def load(cls, path: str) -> 'OpeningBook':
+    """
+    定石の読み込み
+
+    Parameters
+    ----------
+    path : str
+      ファイルの場所(.npz)
+
+    Returns
+    -------
+    book : OpeningBook
+      読み込んだ定石
+    """
+    with np.load(path) as f:
+      data = dict(zip(f['keys'].tolist(), f['moves'].tolist()))
+      board_width = int(f['board_width'])
+      max_ply = int(f['max_ply']) if 'max_ply' in f else -1
+
+    return cls(board_width, data, None if max_ply < 0 else max_ply)
+
+
+def build_book(board_size: int, deepth: int, pos_evaluation: PositionalEvaluation, game_num: int, max_ply: int = 10, min_count: int = 2, agent_list: list[Agent] = None, seed: SeedLike = None) -> OpeningBook:
+  """
+  自己対戦と探索によって定石を作成する
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ
+  deepth : int
+    探索に用いるMinMaxAgentのゲーム木の深さ
+  pos_evaluation : PositionalEvaluation
+    探索に用いる局面評価関数
+  game_num : int
+    局面を集めるための自己対戦の数
+  max_ply : int, default 10
+    定石に含める局面の最大の着手数
+  min_count : int, default 2
+    定石に含める局面が自己対戦で現れた最小の回数
+  agent_list : list[Agent], default None
+    自己対戦を行う2つのagent, NoneであればRandomAgentを用いる
+  seed : None or int or SeedSequence, default None
+    自己対戦に用いる乱数列のseed
+
+  Returns
+  -------
+  book : OpeningBook
+    作成した定石
+  """
+  if agent_list is None:
+    agent_list = [RandomAgent(), RandomAgent()]
+  for agent, child in zip(agent_list, spawn_seeds(seed, 2)):
+    agent.set_seed(child)
+
+  # 自己対戦で局面の出現回数を数える
+  frequency = {}
+  for i in range(game_num):
+    othello = _make_othello(board_size)
+    if i%2 == 1:
+      othello.change_player()
+    for agent in agent_list:
+      agent.reset()
+    while othello.count < max_ply:
+      p, o, _ = get_canonical_position(othello)
+      if (p, o) in frequency:
+        frequency[(p, o)] += 1
+      else:
+        frequency[(p, o)] = 1
+
+      agent_list[othello.now_turn].step(othello)
+      next_state = othello.get_next_state()
+      if next_state == 0:
+        othello.change_player()
+      elif next_state == 2:
+        break
+
+  # 頻出局面を探索する
+  book = OpeningBook(board_size, max_ply=max_ply)
+  position_list = sorted([position for position, n in frequency.items() if n >= min_count], key=lambda x: -frequency[x])
+  for p, o in position_list:
+    othello = _make_othello(board_size)
+    othello.set_board(p, o)
+    agent = MinMaxAgent(deepth, pos_evaluation)
+    agent.step(othello)
+    x = othello.past_data[-1]['x']
+    y = othello.past_data[-1]['y']
+    othello.undo()
+    book.add(othello, x, y)
+  logger.info('opening book: {} positions from {} games'.format(len(book), game_num))
+
+  return book
@@ -1,7 +1,7 @@
 from abc import ABCMeta, abstractmethod
-from othello_rl.error import ArgsError
-from othello_rl.bit_opperation import pop_count
-from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
+from othello_rl.bit_opperation import DIHEDRAL_BM4, DIHEDRAL_BM8
+from othello_rl.profiler import profile
+from othello_rl.othello.board import OthelloBoard
 
 class Features(metaclass=ABCMeta):
   """
@@ -24,6 +24,26 @@ class Features(metaclass=ABCMeta):
     """
     pass
 
+  def get_action(self, othello: OthelloBoard, x: int, y: int) -> int:
+    """
+    盤面と着手位置から行動のインデックスを取得するメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      盤面の状況
+    x : int
+      着手位置x
+    y : int
+      着手位置y
+
+    Returns
+    -------
+    action : int
+      行動のインデックス
+    """
+    return x*8+y
+
 
 class Featuresv1(Features):
   """
@@ -39,7 +59,10 @@ class Featuresv1(Features):
   また、インデックスは以下のように決定している
   | blank  |   diff   | b_corner | a_corner |
   | 000000 | 00000000 |   000    |   000    |
+
+  各値はOthelloBoardが着手毎に差分で更新しているものを読み出すだけなので、O(1)で求まる
   """
+  @profile
   def get_index(self, othello: OthelloBoard) -> int:
     """
     盤面から特徴量のインデックスを取得するメソッド
@@ -54,17 +77,10 @@ class Featuresv1(Features):
     index : int
       盤面の特徴量のインデックス
     """
-    if isinstance(othello, OthelloBoard4x4):
-      a_corner = pop_count(othello.board[0] & 0x9009)
-      b_corner = pop_count(othello.board[1] & 0x9009)
-    elif isinstance(othello, OthelloBoard8x8):
-      a_corner = pop_count(othello.board[0] & 0x8100000000000081)
-      b_corner = pop_count(othello.board[1] & 0x8100000000000081)
-    else:
-      ArgsError('othello({}) isn\'t defined in {}'.format(othello, self))
-
-    a_piece_num = pop_count(othello.board[0])
-    b_piece_num = pop_count(othello.board[1])
+    a_corner = othello.corner_num[0]
+    b_corner = othello.corner_num[1]
+    a_piece_num = othello.piece_num[0]
+    b_piece_num = othello.piece_num[1]
     diff = abs(a_piece_num - b_piece_num)
     blank = othello.board_width**2 - (a_piece_num + b_piece_num)
 
@@ -82,7 +98,110 @@ class Featuresv2(Features):
   特徴量といってもある盤面に対して1対1対応となっている
   8x8での仕様には注意
   """
+  @profile
   def get_index(self, othello: OthelloBoard) -> int:
     retval = othello.board[0] | othello.board[1] << othello.board_width**2
 
-    return retval
\ No newline at end of file
+    return retval
+
+
+class Featuresv3(Features):
+  """
+  盤面から対称性を考慮した特徴量を取得するためのクラス
+
+  Attributes
+  ----------
+  cache_key : tuple[int, int, int]
+    直前に正規化した盤面
+  cache_index : int
+    直前に正規化した盤面のインデックス
+  cache_transforms : list[Callable[[int], int]]
+    直前の盤面を正規化する変換のリスト
+
+  Notes
+  -----
+  Featuresv2のインデックスを盤面の8通りの対称変換(回転, 反転)に対して求め、その最小値をインデックスとする
+  対称な盤面は同じインデックスとなるので、Q値の保存量がおよそ1/8となる
+  行動も同じ変換で写すので、get_actionを用いて行動のインデックスを取得すること
+  盤面自体が対称な場合は、正規化する変換が複数存在するので、それらで写した行動の最小値を用いる
+  """
+  def __init__(self) -> None:
+    self.cache_key = None
+    self.cache_index = 0
+    self.cache_transforms = []
+
+  def __canonicalize(self, othello: OthelloBoard) -> None:
+    """
+    盤面を正規化し、その結果をキャッシュするメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      盤面の状況
+    """
+    key = (othello.board[0], othello.board[1], othello.board_width)
+    if key == self.cache_key:
+      return
+
+    if othello.board_width == 4:
+      transforms = DIHEDRAL_BM4
+    else:
+      transforms = DIHEDRAL_BM8
+    shift = othello.board_width**2
+
+    best_index = -1
+    best_transforms = []
+    for transform in transforms:
+      index = transform(othello.board[0]) | transform(othello.board[1]) << shift
+      if best_index == -1 or index < best_index:
+        best_index = index
+        best_transforms = [transform]
+      elif index == best_index:
+        best_transforms.append(transform)
+
+    self.cache_key = key
+    self.cache_index = best_index
+    self.cache_transforms = best_transforms
+
+  @profile
+  def get_index(self, othello: OthelloBoard) -> int:
+    """
+    盤面から特徴量のインデックスを取得するメソッド
+    
+    Parameters
+    ----------
+    othello : OthelloBoard
+      盤面の状況
+    
+    Returns
+    -------
+    index : int
+      正規化された盤面のインデックス
+    """
+    self.__canonicalize(othello)
+
+    return self.cache_index
+
+  def get_action(self, othello: OthelloBoard, x: int, y: int) -> int:
+    """
+    盤面と着手位置から行動のインデックスを取得するメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      盤面の状況
+    x : int
+      着手位置x
+    y : int
+      着手位置y
+
+    Returns
+    -------
+    action : int
+      盤面の正規化と同じ変換で写した着手位置のインデックス
+    """
+    self.__canonicalize(othello)
+    put = 1 << (x*othello.board_width+y)
+    pos = min(transform(put) for transform in self.cache_transforms).bit_length()-1
+
+    return pos//othello.board_width*8 + pos%othello.board_width
@@ -0,0 +1,112 @@
+"""
+着手可能数と開放度による局面評価
+
+Notes
+-----
+以下の3つの項を盤面のビット演算のみで求め、重みを掛けて足し合わせる
+- 着手可能数(mobility): 各プレイヤーの合法手の数の差
+- 潜在的着手可能数(potential mobility): 相手のコマに隣接する空白マスの数の差
+- 開放度(frontier): 空白マスに隣接する自分のコマの数の差
+
+重みは序盤と終盤の2つを指定し、盤面上のコマの数に応じて線形に補間する
+"""
+from othello_rl.bit_opperation import pop_count
+from othello_rl.profiler import profile
+from othello_rl.othello.board import OthelloBoard
+from othello_rl.othello.positional_evaluation import PositionalEvaluation
+
+def get_mobility_terms(othello: OthelloBoard) -> tuple[int, int, int]:
+  """
+  着手可能数, 潜在的着手可能数, 開放度をplayer0から見た差として求める
+
+  Parameters
+  ----------
+  othello : OthelloBoard
+    対象となる局面
+
+  Returns
+  -------
+  mobility : int
+    player0とplayer1の合法手の数の差
+  potential_mobility : int
+    player1のコマに隣接する空白マスの数と、player0のコマに隣接する空白マスの数の差
+  frontier : int
+    空白マスに隣接するplayer0のコマの数と、player1のコマの数の差
+  """
+  board_0 = othello.board[0]
+  board_1 = othello.board[1]
+  blank = ~(board_0 | board_1) & ((1 << othello.board_width**2) - 1)
+
+  mobility = pop_count(othello.get_legal_board(0)) - pop_count(othello.get_legal_board(1))
+  potential_mobility = pop_count(blank & othello.get_adjacent_board(board_1)) - pop_count(blank & othello.get_adjacent_board(board_0))
+  blank_adjacent = othello.get_adjacent_board(blank)
+  frontier = pop_count(board_0 & blank_adjacent) - pop_count(board_1 & blank_adjacent)
+
+  return mobility, potential_mobility, frontier
+
+
+class MobilityEvaluation(PositionalEvaluation):
+  """
+  着手可能数と開放度による局面評価
+
+  Attributes
+  ----------
+  base : PositionalEvaluation or None
+    併せて用いる局面評価, Noneであれば用いない
+  mobility : tuple[float, float]
+    着手可能数の(序盤, 終盤)での重み
+  potential_mobility : tuple[float, float]
+    潜在的着手可能数の(序盤, 終盤)での重み
+  frontier : tuple[float, float]
+    開放度の(序盤, 終盤)での重み
+  """
+  def __init__(self, base: PositionalEvaluation = None, mobility: tuple[float, float] = (10, 4), potential_mobility: tuple[float, float] = (4, 1), frontier: tuple[float, float] = (-4, -1)) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    base : PositionalEvaluation, default None
+      併せて用いる局面評価
+    mobility : tuple[float, float], default (10, 4)
+      着手可能数の(序盤, 終盤)での重み
+    potential_mobility : tuple[float, float], default (4, 1)
+      潜在的着手可能数の(序盤, 終盤)での重み
+    frontier : tuple[float, float], default (-4, -1)
+      開放度の(序盤, 終盤)での重み
+    """
+    self.base = base
+    self.mobility = mobility
+    self.potential_mobility = potential_mobility
+    self.frontier = frontier
+
+  @profile
+  def eval(self, othello: OthelloBoard, reverse_eval: bool = False) -> float:
+    """
+    局面評価
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      評価したい局面
+    reverse_eval : bool
+      評価値を反転するか否か
+
+    Returns
+    -------
+    eval : float
+      評価値
+    """
+    phase = (othello.piece_num[0] + othello.piece_num[1])/othello.board_width**2
+    mobility, potential_mobility, frontier = get_mobility_terms(othello)
+
+    retval = ((1-phase)*self.mobility[0] + phase*self.mobility[1])*mobility
+    retval += ((1-phase)*self.potential_mobility[0] + phase*self.potential_mobility[1])*potential_mobility
+    retval += ((1-phase)*self.frontier[0] + phase*self.frontier[1])*frontier
+    if self.base is not None:
+      retval += self.base.eval(othello, False)
+
+    if reverse_eval:
+      retval *= -1
+
+    return retval
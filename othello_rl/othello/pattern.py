@@ -0,0 +1,302 @@
+"""
+パターンによる盤面の特徴量と局面評価
+
+Notes
+-----
+盤面上のいくつかのマスの組(パターン)について、各マスの状態(0: 空白, 1: player0, 2: player1)を
+3進数とみなしたものをパターンのインデックスとする
+パターンは盤面の8通りの対称変換で写したもの同士で同じ重みを共有する
+
+インデックスの計算は、盤面を1行(8bit)ずつに分け、行毎に予め作成した表を引いて足し合わせることで行う
+"""
+from logging import getLogger
+import numpy as np
+from othello_rl.bit_opperation import DIHEDRAL_BM8
+from othello_rl.profiler import profile
+from othello_rl.error import ArgsError
+from othello_rl.othello.board import OthelloBoard
+from othello_rl.othello.positional_evaluation import PositionalEvaluation
+
+logger = getLogger(__name__)
+
+# パターン名とパターンを構成するマス(x, y)
+PATTERN_8X8 = {
+  'edge_2x': [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7), (1, 1), (1, 6)],
+  'corner_3x3': [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)],
+  'corner_2x5': [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0), (1, 1), (1, 2), (1, 3), (1, 4)],
+  'diagonal_8': [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7)],
+  'diagonal_7': [(0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 7)],
+  'diagonal_6': [(0, 2), (1, 3), (2, 4), (3, 5), (4, 6), (5, 7)],
+  'diagonal_5': [(0, 3), (1, 4), (2, 5), (3, 6), (4, 7)],
+  'diagonal_4': [(0, 4), (1, 5), (2, 6), (3, 7)],
+}
+
+def _transform_square(transform, square: tuple[int, int]) -> tuple[int, int]:
+  """
+  マスを対称変換で写す
+
+  Parameters
+  ----------
+  transform : Callable[[int], int]
+    bit matrixの対称変換
+  square : tuple[int, int]
+    写すマス(x, y)
+
+  Returns
+  -------
+  square : tuple[int, int]
+    写されたマス(x, y)
+  """
+  pos = transform(1 << (square[0]*8+square[1])).bit_length()-1
+  return pos//8, pos%8
+
+def _make_row_tables(squares: list[tuple[int, int]]) -> list[tuple[int, list[int], list[int]]]:
+  """
+  パターンのインデックス計算用の表を作成する
+
+  Parameters
+  ----------
+  squares : list[tuple[int, int]]
+    パターンを構成するマス, k番目のマスが3^kの桁に対応する
+
+  Returns
+  -------
+  row_tables : list[tuple[int, list[int], list[int]]]
+    (行番号, player0用の表, player1用の表)のリスト
+    表は行の8bitを、その行に含まれるマスの3進数での寄与に写す
+  """
+  row_tables = []
+  for row in sorted({x for x, _ in squares}):
+    table = [0]*256
+    for bits in range(256):
+      for k, (x, y) in enumerate(squares):
+        if x == row and bits & (1 << y):
+          table[bits] += 3**k
+    row_tables.append((row, table, [2*v for v in table]))
+
+  return row_tables
+
+def _make_canonical_table(squares: list[tuple[int, int]]) -> list[int]:
+  """
+  自身が対称なパターンについて、対称なインデックス同士を同一視する表を作成する
+
+  Parameters
+  ----------
+  squares : list[tuple[int, int]]
+    パターンを構成するマス
+
+  Returns
+  -------
+  canonical_table : list[int] or None
+    インデックスを対称なインデックスの最小値に写す表
+    パターンが対称でなければNone
+  """
+  position = {square: k for k, square in enumerate(squares)}
+  perms = []
+  for transform in DIHEDRAL_BM8[1:]:
+    mapped = [_transform_square(transform, square) for square in squares]
+    if set(mapped) == set(squares):
+      perms.append([position[square] for square in mapped])
+  if len(perms) == 0:
+    return None
+
+  n = len(squares)
+  index = np.arange(3**n, dtype=np.int64)
+  digits = (index[:, None] // 3**np.arange(n, dtype=np.int64)) % 3
+  canonical = index.copy()
+  for perm in perms:
+    canonical = np.minimum(canonical, digits @ (3**np.array(perm, dtype=np.int64)))
+
+  return canonical.tolist()
+
+
+class PatternFeatures:
+  """
+  8x8の盤面からパターンのインデックスを取得するためのクラス
+
+  Attributes
+  ----------
+  pattern_names : list[str]
+    利用するパターン名
+  offset : dict[str, int]
+    各パターンの重みの先頭位置
+  size : int
+    全パターンの重みの総数
+  instances : list[tuple[int, list, list[int]]]
+    (重みの先頭位置, 行毎の表, 正規化用の表)のリスト, 盤面上に配置された各パターンに対応する
+  """
+  def __init__(self, pattern_names: list[str] = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    pattern_names : list[str], default None
+      利用するパターン名, NoneであればPATTERN_8X8の全てを利用する
+    """
+    if pattern_names is None:
+      pattern_names = list(PATTERN_8X8.keys())
+    self.pattern_names = pattern_names
+
+    self.offset = {}
+    self.size = 0
+    self.instances = []
+    for name in pattern_names:
+      if name not in PATTERN_8X8:
+        raise ArgsError('pattern({}) isn\'t defined in PATTERN_8X8'.format(name))
+      squares = PATTERN_8X8[name]
+      canonical_table = _make_canonical_table(squares)
+
+      self.offset[name] = self.size
+      used = []
+      for transform in DIHEDRAL_BM8:
+        mapped = [_transform_square(transform, square) for square in squares]
+        if set(mapped) in used:
+          continue
+        used.append(set(mapped))
+        self.instances.append((self.size, _make_row_tables(mapped), canonical_table))
+      self.size += 3**len(squares)
+
+  def get_indices(self, othello: OthelloBoard) -> list[int]:
+    """
+    盤面から各パターンのインデックスを取得するメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      盤面の状況, 8x8のみ
+
+    Returns
+    -------
+    indices : list[int]
+      盤面上に配置された各パターンの重みのインデックス
+    """
+    if othello.board_width != 8:
+      raise ArgsError('othello({}) isn\'t supported in {}'.format(othello, self))
+
+    board_0 = othello.board[0]
+    board_1 = othello.board[1]
+    rows_0 = [(board_0 >> (8*i)) & 0xff for i in range(8)]
+    rows_1 = [(board_1 >> (8*i)) & 0xff for i in range(8)]
+
+    retval = []
+    for offset, row_tables, canonical_table in self.instances:
+      idx = 0
+      for row, table_0, table_1 in row_tables:
+        idx += table_0[rows_0[row]] + table_1[rows_1[row]]
+      if canonical_table is not None:
+        idx = canonical_table[idx]
+      retval.append(offset + idx)
+
+    return retval
+
+
+class PatternEvaluation(PositionalEvaluation):
+  """
+  パターンの重みの和による局面評価
+
+  Attributes
+  ----------
+  features : PatternFeatures
+    利用するパターン
+  weight : list[float]
+    各パターンのインデックスに対する重み
+  """
+  def __init__(self, features: PatternFeatures = None, weight: list[float] = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    features : PatternFeatures, default None
+      利用するパターン, Noneであれば全てのパターンを利用する
+    weight : list[float], default None
+      重み, Noneであれば全て0で初期化する
+    """
+    if features is None:
+      features = PatternFeatures()
+    self.features = features
+    if weight is None:
+      weight = [0.0]*features.size
+    elif len(weight) != features.size:
+      raise ArgsError('len(weight)({}) must be {}'.format(len(weight), features.size))
+    self.weight = list(weight)
+
+  @profile
+  def eval(self, othello: OthelloBoard, reverse_eval: bool = False) -> float:
+    """
+    局面評価
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      評価したい局面
+    reverse_eval : bool
+      評価値を反転するか否か
+
+    Returns
+    -------
+    eval : float
+      評価値, player0にとっての評価値
+    """
+    weight = self.weight
+    retval = 0
+    for i in self.features.get_indices(othello):
+      retval += weight[i]
+
+    if reverse_eval:
+      retval *= -1
+
+    return retval
+
+  def update(self, othello: OthelloBoard, target: float, alpha: float) -> float:
+    """
+    局面の評価値がtargetに近づくように重みを更新する
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      学習する局面
+    target : float
+      player0にとっての目標の評価値
+    alpha : float
+      学習率
+
+    Returns
+    -------
+    error : float
+      更新前の評価値とtargetの差
+    """
+    indices = self.features.get_indices(othello)
+    weight = self.weight
+    error = target - sum(weight[i] for i in indices)
+    delta = alpha*error/len(indices)
+    for i in indices:
+      weight[i] += delta
+
+    return error
+
+  def save(self, path: str) -> None:
+    """
+    重みの書き出し
+
+    Parameters
+    ----------
+    path : str
+      ファイルの保存場所(.npy)
+    """
+    np.save(path, np.array(self.weight, dtype=np.float64))
+
+  def load(self, path: str) -> None:
+    """
+    重みの読み込み
+
+    Parameters
+    ----------
+    path : str
+      ファイルの場所(.npy)
+    """
+    weight = np.load(path)
+    if len(weight) != self.features.size:
+      raise ArgsError('len(weight)({}) must be {}'.format(len(weight), self.features.size))
+    self.weight = weight.tolist()
@@ -0,0 +1,151 @@
+"""
+合法手生成の検証と計測(perft)
+
+Notes
+-----
+指定した局面から深さdepthまでの全ての着手を展開し、末端の局面の数を数える
+手番のプレイヤーに合法手がなく相手にはある場合はパスを1手として数え、
+両者に合法手がない場合はその局面を末端とする
+
+python -m othello_rl.othello.perft --size 8 --depth 8
+で、初期盤面からの各深さの局面数とnodes/sを表示する
+"""
+import argparse
+import time
+from logging import getLogger
+from othello_rl.bit_opperation import pop_count
+from othello_rl.error import ArgsError
+from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
+
+logger = getLogger(__name__)
+
+# 8x8の初期盤面からの深さ毎の局面数
+PERFT_8X8 = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284]
+
+def perft(othello: OthelloBoard, depth: int) -> int:
+  """
+  深さdepthの末端の局面の数を数える
+
+  Parameters
+  ----------
+  othello : OthelloBoard
+    対象となる局面, 手番はothello.now_turn, 終了時には元の局面に戻る
+  depth : int
+    深さ
+
+  Returns
+  -------
+  nodes : int
+    末端の局面の数
+  """
+  if depth == 0:
+    return 1
+
+  legal_board = othello.get_legal_board(othello.now_turn)
+  if legal_board == 0:
+    if othello.get_legal_board(1-othello.now_turn) == 0:
+      return 1
+    othello.change_player()
+    retval = perft(othello, depth-1)
+    othello.change_player()
+    return retval
+
+  if depth == 1:
+    return pop_count(legal_board)
+
+  retval = 0
+  for x, y in othello.get_candidate_list():
+    othello.reverse(x, y, False)
+    othello.change_player()
+    retval += perft(othello, depth-1)
+    othello.undo()
+
+  return retval
+
+def divide(othello: OthelloBoard, depth: int) -> dict[tuple[int, int], int]:
+  """
+  最初の着手毎に末端の局面の数を数える
+
+  Parameters
+  ----------
+  othello : OthelloBoard
+    対象となる局面
+  depth : int
+    深さ, 1以上
+
+  Returns
+  -------
+  nodes : dict[tuple[int, int], int]
+    最初の着手(x, y)を末端の局面の数に写す辞書, パスの場合は(-1, -1)
+  """
+  if len(othello.get_candidate_list()) == 0:
+    return {(-1, -1): perft(othello, depth)}
+
+  retval = {}
+  for x, y in othello.get_candidate_list():
+    othello.reverse(x, y, False)
+    othello.change_player()
+    retval[(x, y)] = perft(othello, depth-1)
+    othello.undo()
+
+  return retval
+
+def make_position(board_size: int, board_0: int = None, board_1: int = None, turn: int = 0) -> OthelloBoard:
+  """
+  perftを行う局面を作成する
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ, 4 or 8
+  board_0 : int, default None
+    player0のコマの位置, Noneであれば初期盤面
+  board_1 : int, default None
+    player1のコマの位置, Noneであれば初期盤面
+  turn : int, default 0
+    手番のプレイヤー
+
+  Returns
+  -------
+  othello : OthelloBoard
+    作成した局面
+  """
+  if board_size == 8:
+    othello = OthelloBoard8x8(turn)
+  elif board_size == 4:
+    othello = OthelloBoard4x4(turn)
+  else:
+    raise ArgsError('board_size({}) must be 4 or 8'.format(board_size))
+  if board_0 is not None and board_1 is not None:
+    othello.set_board(board_0, board_1)
+
+  return othello
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='perft for OthelloBoard')
+  parser.add_argument('--size', type=int, default=8, help='board size (4 or 8)')
+  parser.add_argument('--depth', type=int, default=6, help='max depth')
+  parser.add_argument('--board0', type=lambda x: int(x, 0), default=None, help='bitboard of player0')
+  parser.add_argument('--board1', type=lambda x: int(x, 0), default=None, help='bitboard of player1')
+  parser.add_argument('--turn', type=int, default=0, help='player to move')
+  parser.add_argument('--divide', action='store_true', help='show nodes for each first move at max depth')
+  args = parser.parse_args()
+
+  othello = make_position(args.size, args.board0, args.board1, args.turn)
+  is_initial = args.size == 8 and args.board0 is None
+  print('{:>5} {:>12} {:>10} {:>12}  {}'.format('depth', 'nodes', 'time(s)', 'nodes/s', 'check'))
+  for depth in range(1, args.depth+1):
+    start = time.perf_counter()
+    nodes = perft(othello, depth)
+    elapsed = time.perf_counter()-start
+    check = ''
+    if is_initial and depth < len(PERFT_8X8):
+      check = 'ok' if nodes == PERFT_8X8[depth] else 'NG (expected {})'.format(PERFT_8X8[depth])
+    print('{:>5} {:>12} {:>10.3f} {:>12.0f}  {}'.format(depth, nodes, elapsed, nodes/max(elapsed, 1e-9), check))
+
+  if args.divide:
+    for (x, y), nodes in divide(othello, args.depth).items():
+      print('({}, {}): {}'.format(x, y, nodes))
+
+if __name__ == '__main__':
+  main()
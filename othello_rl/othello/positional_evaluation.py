@@ -1,5 +1,9 @@
 from abc import ABCMeta, abstractmethod
-from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
+import numpy as np
+from othello_rl.bit_opperation import pop_count
+from othello_rl.profiler import profile
+from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4
+from othello_rl.othello.stability import get_determine_piece_table_4x4
 
 # TODO: 終端での処理の追加
 
@@ -26,29 +30,185 @@ class PositionalEvaluation(metaclass=ABCMeta):
     """
     pass
 
-class PositionalEvaluation8x8v1(PositionalEvaluation):
+
+def boards_to_array(othello_list: list[OthelloBoard]) -> np.ndarray:
   """
-  局面評価v1
+  盤面のリストを(board_0, board_1)の配列に変換する
+
+  Parameters
+  ----------
+  othello_list : list[OthelloBoard]
+    盤面のリスト
+
+  Returns
+  -------
+  boards : np.ndarray
+    shapeが(N, 2)でdtypeがuint64の配列
+  """
+  return np.array([othello.board for othello in othello_list], dtype=np.uint64).reshape(-1, 2)
+
+def unpack_boards(boards: np.ndarray, board_width: int) -> tuple[np.ndarray, np.ndarray]:
+  """
+  (board_0, board_1)の配列をマス毎の0/1の配列に展開する
+
+  Parameters
+  ----------
+  boards : np.ndarray
+    shapeが(N, 2)でdtypeがuint64の配列
+  board_width : int
+    盤面の長さ
+
+  Returns
+  -------
+  bits_0 : np.ndarray
+    shapeが(N, board_width**2)の配列, player0のコマがあるマスが1となる
+  bits_1 : np.ndarray
+    shapeが(N, board_width**2)の配列, player1のコマがあるマスが1となる
+  """
+  boards = np.ascontiguousarray(boards, dtype='<u8').reshape(-1, 2)
+  bits = np.unpackbits(boards.view(np.uint8).reshape(-1, 2, 8), axis=2, bitorder='little')
+  n = board_width**2
+
+  return bits[:, 0, :n], bits[:, 1, :n]
+
+
+def make_weight_masks(weight: list[list[int]]) -> list[tuple[int, int]]:
+  """
+  盤面の重みづけを、同じ重みのマスをまとめたマスクに変換する
+
+  Parameters
+  ----------
+  weight : list[list[int]]
+    盤面の重みづけ
+
+  Returns
+  -------
+  weight_masks : list[tuple[int, int]]
+    (重み, その重みを持つマスのマスク)のリスト, 重みが0のマスは含まない
+  """
+  masks = {}
+  idx = 1
+  for row in weight:
+    for w in row:
+      if w != 0:
+        masks[w] = masks.get(w, 0) | idx
+      idx <<= 1
+
+  return sorted(masks.items())
+
+def make_weight_tables(weight: list[list[int]]) -> list[list[int]]:
+  """
+  盤面の重みづけを、行毎の表に変換する
+
+  Parameters
+  ----------
+  weight : list[list[int]]
+    盤面の重みづけ
+
+  Returns
+  -------
+  weight_tables : list[list[int]]
+    i行目の表は、i行目のビット列をその行でコマのあるマスの重みの和に写す
+  """
+  width = len(weight)
+  tables = []
+  for row in weight:
+    table = [0]*(1 << width)
+    for bits in range(1 << width):
+      for j in range(width):
+        if bits & (1 << j):
+          table[bits] += row[j]
+    tables.append(table)
+
+  return tables
+
+
+class WeightPositionalEvaluation(PositionalEvaluation):
+  """
+  盤面の重みづけによる局面評価の基底クラス
 
   Attributes
   ----------
   weight : list[list[int]]
     盤面の重みづけ
+  count_occupied : bool
+    Trueであればどちらのプレイヤーのコマでも重みを足し、Falseであればplayer0のコマの重みからplayer1のコマの重みを引く
+  """
+  weight: list[list[int]]
+  count_occupied = False
+
+  def __init__(self, weight: list[list[int]] = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    weight : list[list[int]], default None
+      盤面の重みづけ, Noneであればクラスのweightを用いる
+    """
+    if weight is not None:
+      self.weight = weight
+    self.__weight_array = np.array(self.weight, dtype=np.int64).ravel()
+
+  def eval_batch(self, boards: np.ndarray, reverse_eval: bool = False) -> np.ndarray:
+    """
+    複数の局面をまとめて評価する
+
+    Parameters
+    ----------
+    boards : np.ndarray
+      shapeが(N, 2)でdtypeがuint64の(board_0, board_1)の配列
+    reverse_eval : bool
+      評価値を反転するか否か
+
+    Returns
+    -------
+    eval : np.ndarray
+      shapeが(N,)の評価値の配列
+    """
+    bits_0, bits_1 = unpack_boards(boards, len(self.weight))
+    if self.count_occupied:
+      retval = (bits_0 + bits_1) @ self.__weight_array
+    else:
+      retval = bits_0 @ self.__weight_array - bits_1 @ self.__weight_array
+
+    if reverse_eval:
+      retval *= -1
+
+    return retval
+
+
+class MaskPositionalEvaluation(WeightPositionalEvaluation):
+  """
+  同じ重みのマスをまとめたマスクによる局面評価
+
+  Attributes
+  ----------
+  weight : list[list[int]]
+    盤面の重みづけ
+  weight_masks : list[tuple[int, int]]
+    (重み, その重みを持つマスのマスク)のリスト
 
   Notes
   -----
-  以下のサイトを参考にした
-  https://uguisu.skr.jp/othello/5-1.html
+  重みの種類は少ないので、マス毎に見ていく代わりに重み毎のpop_countの和で評価値を求める
   """
-  weight = [[120, -20, 20, 5, 5, 20, -20, 120],
-            [-20, -40, -5, -5, -5, -5, -40, -20],
-            [20, -5, 15, 3, 3, 15, -5, 20],
-            [5, -5, 3, 3, 3, 3, -5, 5],
-            [5, -5, 3, 3, 3, 3, -5, 5],
-            [20, -5, 15, 3, 3, 15, -5, 20],
-            [-20, -40, -5, -5, -5, -5, -40, -20],
-            [120, -20, 20, 5, 5, 20, -20, 120]]
-  def eval(self, othello: OthelloBoard8x8, reverse_eval: bool = False) -> int:
+  weight: list[list[int]]
+
+  def __init__(self, weight: list[list[int]] = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    weight : list[list[int]], default None
+      盤面の重みづけ, Noneであればクラスのweightを用いる
+    """
+    super().__init__(weight)
+    self.weight_masks = make_weight_masks(self.weight)
+
+  @profile
+  def eval(self, othello: OthelloBoard, reverse_eval: bool = False) -> int:
     """
     局面評価
 
@@ -64,48 +224,53 @@ class PositionalEvaluation8x8v1(PositionalEvaluation):
     eval : int
       評価値
     """
+    board_0 = othello.board[0]
+    board_1 = othello.board[1]
     retval = 0
-    idx = 1
-    for i in range(8):
-      for j in range(8):
-        if othello.board[0] & idx:
-          retval += self.weight[i][j]
-        elif othello.board[1] & idx:
-          retval -= self.weight[i][j]
-        idx <<= 1
+    for w, mask in self.weight_masks:
+      retval += w*(pop_count(board_0 & mask) - pop_count(board_1 & mask))
 
     if reverse_eval:
       retval *= -1
-    
+
     return retval
 
 
-class PositionalEvaluation8x8v2(PositionalEvaluation):
+class TablePositionalEvaluation(WeightPositionalEvaluation):
   """
-  局面評価v2
+  行毎の表による局面評価
 
   Attributes
   ----------
   weight : list[list[int]]
     盤面の重みづけ
+  weight_tables : list[list[int]]
+    行毎の表
 
   Notes
   -----
-  以下のサイトを参考にした
-  https://uguisu.skr.jp/othello/5-1.html
+  重みの種類が多い場合に用いる
+  各行のビット列で表を引いて足し合わせるので、8x8でも1プレイヤーあたり8回の参照で評価値が求まる
   """
-  weight = [[30, -12, 0, -1, -1, 0, -12, 30],
-            [-12, -15, -3, -3, -3, -3, -15, -12],
-            [0, -3, 0, -1, -1, 0, -3, 0],
-            [-1, -3, -1, -1, -1, -1, -3, -1],
-            [-1, -3, -1, -1, -1, -1, -3, -1],
-            [0, -3, 0, -1, -1, 0, -3, 0],
-            [-12, -15, -3, -3, -3, -3, -15, -12],
-            [30, -12, 0, -1, -1, 0, -12, 30]]
-  def eval(self, othello: OthelloBoard8x8, reverse_eval: bool = False) -> int:
+  weight: list[list[int]]
+
+  def __init__(self, weight: list[list[int]] = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    weight : list[list[int]], default None
+      盤面の重みづけ, Noneであればクラスのweightを用いる
+    """
+    super().__init__(weight)
+    self.weight_tables = make_weight_tables(self.weight)
+
+  @profile
+  def eval(self, othello: OthelloBoard, reverse_eval: bool = False) -> int:
     """
     局面評価
-    
+
     Parameters
     ----------
     othello : OthelloBoard
@@ -118,65 +283,135 @@ class PositionalEvaluation8x8v2(PositionalEvaluation):
     eval : int
       評価値
     """
+    width = othello.board_width
+    row_mask = (1 << width) - 1
+    board_0 = othello.board[0]
+    board_1 = othello.board[1]
     retval = 0
-    idx = 1
-    for i in range(8):
-      for j in range(8):
-        if othello.board[0] & idx:
-          retval += self.weight[i][j]
-        elif othello.board[1] & idx:
-          retval -= self.weight[i][j]
-        idx <<= 1
+    for table in self.weight_tables:
+      retval += table[board_0 & row_mask] - table[board_1 & row_mask]
+      board_0 >>= width
+      board_1 >>= width
 
     if reverse_eval:
       retval *= -1
 
     return retval
 
-class PositionalEvaluation4x4v1(PositionalEvaluation):
+
+class PositionalEvaluation8x8v1(MaskPositionalEvaluation):
+  """
+  局面評価v1
+
+  Attributes
+  ----------
+  weight : list[list[int]]
+    盤面の重みづけ
+
+  Notes
+  -----
+  以下のサイトを参考にした
+  https://uguisu.skr.jp/othello/5-1.html
+  """
+  weight = [[120, -20, 20, 5, 5, 20, -20, 120],
+            [-20, -40, -5, -5, -5, -5, -40, -20],
+            [20, -5, 15, 3, 3, 15, -5, 20],
+            [5, -5, 3, 3, 3, 3, -5, 5],
+            [5, -5, 3, 3, 3, 3, -5, 5],
+            [20, -5, 15, 3, 3, 15, -5, 20],
+            [-20, -40, -5, -5, -5, -5, -40, -20],
+            [120, -20, 20, 5, 5, 20, -20, 120]]
+
+
+class PositionalEvaluation8x8v2(MaskPositionalEvaluation):
+  """
+  局面評価v2
+
+  Attributes
+  ----------
+  weight : list[list[int]]
+    盤面の重みづけ
+
+  Notes
+  -----
+  以下のサイトを参考にした
+  https://uguisu.skr.jp/othello/5-1.html
+  """
+  weight = [[30, -12, 0, -1, -1, 0, -12, 30],
+            [-12, -15, -3, -3, -3, -3, -15, -12],
+            [0, -3, 0, -1, -1, 0, -3, 0],
+            [-1, -3, -1, -1, -1, -1, -3, -1],
+            [-1, -3, -1, -1, -1, -1, -3, -1],
+            [0, -3, 0, -1, -1, 0, -3, 0],
+            [-12, -15, -3, -3, -3, -3, -15, -12],
+            [30, -12, 0, -1, -1, 0, -12, 30]]
+
+class PositionalEvaluation4x4v1(MaskPositionalEvaluation):
   weight = [
     [10, -10, -10, 10],
     [-10, 0, 0, -10],
     [-10, 0, 0, -10],
     [10, -10, -10, 10]]
+  count_occupied = True
+
+  @profile
   def eval(self, othello: OthelloBoard4x4, reverse_eval: bool = False) -> int:
+    occupied = othello.board[0] | othello.board[1]
     retval = 0
-    idx = 1
-    for i in range(4):
-      for j in range(4):
-        if othello.board[0] & idx:
-          retval += self.weight[i][j]
-        elif othello.board[1] & idx:
-          retval += self.weight[i][j]
-        idx <<= 1
+    for w, mask in self.weight_masks:
+      retval += w*pop_count(occupied & mask)
 
     if reverse_eval:
       retval *= -1
 
     return retval
 
-class PositionalEvaluation4x4v2(PositionalEvaluation):
+class PositionalEvaluation4x4v2(MaskPositionalEvaluation):
   weight = [
     [10, -2, -2, 10],
     [-2, 0, 0, -2],
     [-2, 0, 0, -2],
     [10, -2, -2, 10]]
+  count_occupied = True
+
+  @profile
   def eval(self, othello: OthelloBoard4x4, reverse_eval: bool = False) -> int:
+    occupied = othello.board[0] | othello.board[1]
     retval = 0
-    idx = 1
-    for i in range(4):
-      for j in range(4):
-        if othello.board[0] & idx:
-          retval += self.weight[i][j]
-        elif othello.board[1] & idx:
-          retval += self.weight[i][j]
-        idx <<= 1
+    for w, mask in self.weight_masks:
+      retval += w*pop_count(occupied & mask)
 
     d0 = othello.get_determine_piece(0)
     d1 = othello.get_determine_piece(1)
 
     retval += (d0 - d1)*30
 
+    if reverse_eval:
+      retval *= -1
+
+    return retval
+
+  def eval_batch(self, boards: np.ndarray, reverse_eval: bool = False) -> np.ndarray:
+    """
+    複数の局面をまとめて評価する
+
+    Parameters
+    ----------
+    boards : np.ndarray
+      shapeが(N, 2)でdtypeがuint64の(board_0, board_1)の配列
+    reverse_eval : bool
+      評価値を反転するか否か
+
+    Returns
+    -------
+    eval : np.ndarray
+      shapeが(N,)の評価値の配列
+    """
+    retval = super().eval_batch(boards)
+    table = np.frombuffer(get_determine_piece_table_4x4(), dtype=np.uint8).astype(np.int64)
+    boards = np.asarray(boards, dtype=np.uint64).reshape(-1, 2)
+    retval += (table[boards[:, 0]] - table[boards[:, 1]])*30
+
     if reverse_eval:
       retval *= -1
 
@@ -0,0 +1,303 @@
+"""
+4x4のオセロの完全解析
+
+Notes
+-----
+初期盤面から到達可能な全ての局面について、両者が最善を尽くした時の最終的なコマの数の差と最善手を求める
+局面は(手番のプレイヤーのコマ, 相手のコマ)の組で表し、p << 16 | oをキーとする
+"""
+from logging import getLogger
+import numpy as np
+from othello_rl.bit_opperation import pop_count
+from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4
+from othello_rl.othello.features import Features
+
+logger = getLogger(__name__)
+PASS = -1
+
+def _get_legal_board(p: int, o: int) -> int:
+  """
+  4x4での合成手ボードを求める
+
+  Parameters
+  ----------
+  p : int
+    手番のプレイヤーのコマの位置
+  o : int
+    相手のコマの位置
+
+  Returns
+  -------
+  legal_board : int
+    合成手ボード
+  """
+  blank = ~(p | o) & 0xffff
+  retval = 0
+  for i, (shift, mask) in enumerate(OthelloBoard4x4.transfer_coff):
+    if i//2 == 0 or i//2 == 3:
+      tmp = (p << shift) & mask & o
+      tmp |= (tmp << shift) & mask & o
+      retval |= (tmp << shift) & mask & blank
+    else:
+      tmp = (p >> shift) & mask & o
+      tmp |= (tmp >> shift) & mask & o
+      retval |= (tmp >> shift) & mask & blank
+
+  return retval
+
+def _get_flip(p: int, o: int, put: int) -> int:
+  """
+  4x4でputにコマを置いた時に裏返るコマを求める
+
+  Parameters
+  ----------
+  p : int
+    手番のプレイヤーのコマの位置
+  o : int
+    相手のコマの位置
+  put : int
+    コマを置く位置
+
+  Returns
+  -------
+  flip : int
+    裏返るコマの位置
+  """
+  retval = 0
+  for i, (shift, mask) in enumerate(OthelloBoard4x4.transfer_coff):
+    left = i//2 == 0 or i//2 == 3
+    rev = 0
+    bits = ((put << shift) if left else (put >> shift)) & mask
+    while bits & o:
+      rev |= bits
+      bits = ((bits << shift) if left else (bits >> shift)) & mask
+    if bits & p:
+      retval |= rev
+
+  return retval
+
+
+class PerfectPlayTable:
+  """
+  4x4のオセロの完全解析の結果
+
+  Attributes
+  ----------
+  data : dict[int, tuple[int, int]]
+    p << 16 | oを(最善を尽くした時の手番のプレイヤーから見たコマの数の差, 最善手)に写す辞書
+    最善手はx*4+yで表し、パスであればPASSとなる
+  """
+  def __init__(self, data: dict[int, tuple[int, int]] = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    data : dict[int, tuple[int, int]], default None
+      解析結果, Noneであれば空
+    """
+    self.data = {} if data is None else data
+
+  def __solve(self, p: int, o: int) -> int:
+    """
+    局面を解析するメソッド
+
+    Parameters
+    ----------
+    p : int
+      手番のプレイヤーのコマの位置
+    o : int
+      相手のコマの位置
+
+    Returns
+    -------
+    value : int
+      最善を尽くした時の手番のプレイヤーから見たコマの数の差
+    """
+    key = p << 16 | o
+    if key in self.data:
+      return self.data[key][0]
+
+    legal_board = _get_legal_board(p, o)
+    if legal_board == 0:
+      if _get_legal_board(o, p) == 0:
+        best_value = pop_count(p) - pop_count(o)
+      else:
+        best_value = -self.__solve(o, p)
+      self.data[key] = (best_value, PASS)
+      return best_value
+
+    best_value = -17
+    best_move = PASS
+    for pos in range(16):
+      put = 1 << pos
+      if legal_board & put:
+        flip = _get_flip(p, o, put)
+        value = -self.__solve(o ^ flip, p | put | flip)
+        if value > best_value:
+          best_value = value
+          best_move = pos
+    self.data[key] = (best_value, best_move)
+
+    return best_value
+
+  def solve(self) -> None:
+    """
+    初期盤面から到達可能な全ての局面を解析する
+    """
+    othello = OthelloBoard4x4(0)
+    self.__solve(othello.board[0], othello.board[1])
+    self.__solve(othello.board[1], othello.board[0])
+    logger.info('solved {} positions'.format(len(self.data)))
+
+  def get(self, othello: OthelloBoard) -> tuple[int, int]:
+    """
+    局面の解析結果を返すメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      対象となる局面, 手番はothello.now_turn
+
+    Returns
+    -------
+    value : int
+      最善を尽くした時の手番のプレイヤーから見たコマの数の差
+    move : int
+      最善手, x*4+y
+    """
+    p = othello.board[othello.now_turn]
+    o = othello.board[othello.now_turn-1]
+    key = p << 16 | o
+    if key not in self.data:
+      self.__solve(p, o)
+
+    return self.data[key]
+
+  def get_move_values(self, othello: OthelloBoard) -> dict[int, int]:
+    """
+    局面の各合法手の価値を返すメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      対象となる局面, 手番はothello.now_turn
+
+    Returns
+    -------
+    move_values : dict[int, int]
+      合法手(x*4+y)を、その手を打った後に最善を尽くした時の手番のプレイヤーから見たコマの数の差に写す辞書
+    """
+    p = othello.board[othello.now_turn]
+    o = othello.board[othello.now_turn-1]
+    legal_board = _get_legal_board(p, o)
+    retval = {}
+    for pos in range(16):
+      put = 1 << pos
+      if legal_board & put:
+        flip = _get_flip(p, o, put)
+        retval[pos] = -self.__solve(o ^ flip, p | put | flip)
+
+    return retval
+
+  def save(self, path: str) -> None:
+    """
+    解析結果の書き出し
+
+    Parameters
+    ----------
+    path : str
+      ファイルの保存場所(.npz)
+    """
+    keys = np.array(sorted(self.data.keys()), dtype=np.uint32)
+    values = np.array([self.data[k][0] for k in keys.tolist()], dtype=np.int8)
+    moves = np.array([self.data[k][1] for k in keys.tolist()], dtype=np.int8)
+    np.savez_compressed(path, keys=keys, values=values, moves=moves)
+
+  @classmethod
+  def load(cls, path: str) -> 'PerfectPlayTable':
+    """
+    解析結果の読み込み
+
+    Parameters
+    ----------
+    path : str
+      ファイルの場所(.npz)
+
+    Returns
+    -------
+    table : PerfectPlayTable
+      読み込んだ解析結果
+    """
+    with np.load(path) as f:
+      data = dict(zip(f['keys'].tolist(), zip(f['values'].tolist(), f['moves'].tolist())))
+
+    return cls(data)
+
+
+def evaluate_q_table(table: PerfectPlayTable, features: Features, data: dict, init_value: float = 0.0, ql_num: int = 0) -> tuple[float, float, float]:
+  """
+  Q Learningの学習結果を完全解析の結果と比較する
+
+  Parameters
+  ----------
+  table : PerfectPlayTable
+    完全解析の結果
+  features : Features
+    学習に用いた特徴量
+  data : dict
+    Q Learningによって得られた結果
+  init_value : float, default 0.0
+    data内に値がない場合の初期値
+  ql_num : int, default 0
+    学習したプレイヤー, OthelloQLearningManager.learn_one_gameのdo_from_opponentがTrueであれば1
+
+  Returns
+  -------
+  accuracy : float
+    Q値が最大の手が最善手と同じ価値を持つ局面の割合
+  regret : float
+    Q値が最大の手を打った時に失うコマの数の差の平均
+  hit_rate : float
+    dataに含まれる状態のうち、完全解析のいずれかの局面と一致したものの割合
+
+  Notes
+  -----
+  合法手が2つ以上ある全ての局面を対象とする
+  完全解析の局面は手番側から見た(p, o)なので、学習時と同じくplayer ql_numの手番の盤面に戻してから特徴量を求める
+  """
+  othello = OthelloBoard4x4(0)
+  learned = {s for s, _ in data}
+  hit = set()
+  count = 0
+  correct = 0
+  regret = 0
+  for key, (value, move) in list(table.data.items()):
+    if move == PASS:
+      continue
+    p, o = key >> 16, key & 0xffff
+    if ql_num == 0:
+      othello.set_board(p, o)
+    else:
+      othello.set_board(o, p)
+    othello.now_turn = ql_num
+    s = features.get_index(othello)
+    if s in learned:
+      hit.add(s)
+
+    move_values = table.get_move_values(othello)
+    if len(move_values) < 2:
+      continue
+
+    q_list = [(data.get((s, features.get_action(othello, pos//4, pos%4)), init_value), pos) for pos in move_values]
+    _, q_move = max(q_list, key=lambda x: x[0])
+
+    count += 1
+    if move_values[q_move] == value:
+      correct += 1
+    regret += value - move_values[q_move]
+
+  hit_rate = len(hit)/len(learned) if len(learned) > 0 else 0.0
+  if count == 0:
+    return 0.0, 0.0, hit_rate
+  return correct/count, regret/count, hit_rate
@@ -0,0 +1,437 @@
+"""
+確定石の計算
+
+Notes
+-----
+以下の手順で確定石を求める
+- 盤面の縁の確定石は、縁の1行(3^8通り)に対する表を引いて求める
+- 4方向全ての列が埋まっているコマは確定石となる
+- 4方向それぞれについて、列が埋まっているか隣接する自分のコマが確定石であるコマは確定石となる
+  これを確定石が増えなくなるまで繰り返す
+
+縁の表は初回の利用時に作成する
+
+4x4の確定石の数は自分のコマの配置のみから決まるので、2^16通り全てについて表にしておく
+"""
+import hashlib
+import os
+from logging import getLogger
+from othello_rl.bit_opperation import pop_count, flip_anti_diagonal_bm8, flip_horizontal_bm4, flip_vertical_bm4, flip_diagonal_bm4, flip_anti_diagonal_bm4
+
+logger = getLogger(__name__)
+_edge_stability_table = None
+# 4x4の確定石の数の表のSHA-256, count_determine_piece_4x4を変更した場合は更新すること
+DETERMINE_PIECE_TABLE_4X4_SHA256 = '67fd63c899b751f6e7847d457cc26897aa1054792797e0308ee92dac9eda4f10'
+_determine_piece_table_4x4 = None
+# このプロセスで読み込むか書き出して、内容のSHA-256を確認済みのcache_path
+_determine_piece_table_4x4_paths = set()
+
+def _play_line(p: int, o: int, x: int) -> tuple[int, int]:
+  """
+  1行の上でpの側がxにコマを置いた結果を返す
+
+  Parameters
+  ----------
+  p : int
+    コマを置く側の行のビット列
+  o : int
+    相手の行のビット列
+  x : int
+    コマを置く位置
+
+  Returns
+  -------
+  p : int
+    置いた後のコマを置いた側の行のビット列
+  o : int
+    置いた後の相手の行のビット列
+  """
+  p |= 1 << x
+
+  y = x-1
+  while y >= 0 and o & (1 << y):
+    y -= 1
+  if y >= 0 and y < x-1 and p & (1 << y):
+    flip = ((1 << x) - 1) ^ ((1 << (y+1)) - 1)
+    p |= flip
+    o &= ~flip
+
+  y = x+1
+  while y < 8 and o & (1 << y):
+    y += 1
+  if y < 8 and y > x+1 and p & (1 << y):
+    flip = ((1 << y) - 1) ^ ((1 << (x+1)) - 1)
+    p |= flip
+    o &= ~flip
+
+  return p, o
+
+def _find_edge_stable(p: int, o: int, memo: dict[int, int]) -> int:
+  """
+  1行の上で、以後どのように打たれてもpの側のままであるコマを求める
+
+  Parameters
+  ----------
+  p : int
+    対象となる側の行のビット列
+  o : int
+    相手の行のビット列
+  memo : dict[int, int]
+    計算済みの結果
+
+  Returns
+  -------
+  stable : int
+    確定石のビット列
+  """
+  key = p << 8 | o
+  if key in memo:
+    return memo[key]
+
+  stable = p
+  blank = ~(p | o) & 0xff
+  for x in range(8):
+    if not stable:
+      break
+    if blank & (1 << x):
+      next_p, next_o = _play_line(p, o, x)
+      stable &= _find_edge_stable(next_p, next_o, memo)
+      next_o, next_p = _play_line(o, p, x)
+      stable &= _find_edge_stable(next_p, next_o, memo)
+
+  memo[key] = stable
+  return stable
+
+def get_edge_stability_table() -> list[int]:
+  """
+  縁の確定石の表を返す
+
+  Returns
+  -------
+  table : list[int]
+    p << 8 | oを、pの側の確定石のビット列に写す表
+  """
+  global _edge_stability_table
+  if _edge_stability_table is None:
+    memo = {}
+    table = [0]*(1 << 16)
+    for p in range(256):
+      for o in range(256):
+        if p & o == 0:
+          table[p << 8 | o] = _find_edge_stable(p, o, memo)
+    _edge_stability_table = table
+
+  return _edge_stability_table
+
+def _make_line_masks() -> tuple[list[int], list[int], list[int], list[int]]:
+  """
+  4方向の列のマスクを作成する
+
+  Returns
+  -------
+  horizontal : list[int]
+    横方向の列のマスク
+  vertical : list[int]
+    縦方向の列のマスク
+  diagonal : list[int]
+    x+yが一定の列のマスク
+  anti_diagonal : list[int]
+    x-yが一定の列のマスク
+  """
+  horizontal = [0xff << (8*i) for i in range(8)]
+  vertical = [0x0101010101010101 << i for i in range(8)]
+  diagonal = [0]*15
+  anti_diagonal = [0]*15
+  for x in range(8):
+    for y in range(8):
+      diagonal[x+y] |= 1 << (x*8+y)
+      anti_diagonal[x-y+7] |= 1 << (x*8+y)
+
+  return horizontal, vertical, diagonal, anti_diagonal
+
+HORIZONTAL_LINES, VERTICAL_LINES, DIAGONAL_LINES, ANTI_DIAGONAL_LINES = _make_line_masks()
+CENTRAL_MASK = 0x007e7e7e7e7e7e00
+
+def _get_full_lines(occupied: int, lines: list[int]) -> int:
+  """
+  全て埋まっている列のマスクを返す
+
+  Parameters
+  ----------
+  occupied : int
+    コマのあるマス
+  lines : list[int]
+    列のマスク
+
+  Returns
+  -------
+  full_lines : int
+    全て埋まっている列の和
+  """
+  retval = 0
+  for line in lines:
+    if occupied & line == line:
+      retval |= line
+
+  return retval
+
+def get_edge_stable_board(p: int, o: int) -> int:
+  """
+  盤面の縁にあるpの確定石を求める
+
+  Parameters
+  ----------
+  p : int
+    対象となるプレイヤーのコマの位置
+  o : int
+    相手のコマの位置
+
+  Returns
+  -------
+  stable : int
+    縁にある確定石の位置
+  """
+  table = get_edge_stability_table()
+  stable = table[(p & 0xff) << 8 | (o & 0xff)]
+  stable |= table[(p >> 56) << 8 | (o >> 56)] << 56
+
+  t_p = flip_anti_diagonal_bm8(p)
+  t_o = flip_anti_diagonal_bm8(o)
+  t_stable = table[(t_p & 0xff) << 8 | (t_o & 0xff)]
+  t_stable |= table[(t_p >> 56) << 8 | (t_o >> 56)] << 56
+
+  return stable | flip_anti_diagonal_bm8(t_stable)
+
+def get_stable_board(p: int, o: int) -> int:
+  """
+  8x8の盤面でのpの確定石を求める
+
+  Parameters
+  ----------
+  p : int
+    対象となるプレイヤーのコマの位置
+  o : int
+    相手のコマの位置
+
+  Returns
+  -------
+  stable : int
+    確定石の位置
+  """
+  occupied = p | o
+  full_h = _get_full_lines(occupied, HORIZONTAL_LINES)
+  full_v = _get_full_lines(occupied, VERTICAL_LINES)
+  full_d = _get_full_lines(occupied, DIAGONAL_LINES)
+  full_a = _get_full_lines(occupied, ANTI_DIAGONAL_LINES)
+
+  stable = get_edge_stable_board(p, o) | (p & full_h & full_v & full_d & full_a)
+  central = p & CENTRAL_MASK
+  while True:
+    stable_h = (stable >> 1) | (stable << 1) | full_h
+    stable_v = (stable >> 8) | (stable << 8) | full_v
+    stable_d = (stable >> 7) | (stable << 7) | full_d
+    stable_a = (stable >> 9) | (stable << 9) | full_a
+    new_stable = stable | (stable_h & stable_v & stable_d & stable_a & central)
+    if new_stable == stable:
+      break
+    stable = new_stable
+
+  return stable
+
+def count_determine_piece_4x4(board: int) -> int:
+  """
+  4x4の盤面で確定石を数え上げる
+
+  Parameters
+  ----------
+  board : int
+    確定石を数えるプレイヤーのコマの位置
+
+  Returns
+  -------
+  determine_piece_num : int
+    確定石の数
+  """
+  retval = 0
+  line_list = [False]*4
+  if board & 0x000f == 0x000f:
+    line_list[0] = True
+  if board & 0x1111 == 0x1111:
+    line_list[1] = True
+  if board & 0x8888 == 0x8888:
+    line_list[2] = True
+  if board & 0xf000 == 0xf000:
+    line_list[3] = True
+  
+  if line_list.count(True) == 4:
+    retval = 12
+    retval += pop_count(board & 0x0aa0)
+  elif line_list.count(True) == 3:
+    if line_list[0] == False:
+      bits = flip_vertical_bm4(board)
+    elif line_list[1] == False:
+      bits = flip_diagonal_bm4(board)
+    elif line_list[2] == False:
+      bits = flip_anti_diagonal_bm4(board)
+    else:
+      bits = board
+
+    retval = 10
+    retval += pop_count(bits & 0xa0a0)
+    if (bits & 0x4000 or bits & 0x0040) and bits & 0x0400:
+      retval += 1
+    if (bits & 0x2000 or bits & 0x0020) and bits & 0x0200:
+      retval += 1
+  elif line_list.count(True) == 2:
+    if line_list[0] == line_list[3]:
+      if line_list[0] == True:
+        bits = flip_diagonal_bm4(board)
+      else:
+        bits = board
+
+      retval = 8
+      retval += pop_count(bits & 0xa00a)
+      if bits & 0x4400 == 0x4400 or bits & 0x0444 == 0x0444:
+        retval += 1
+      if bits & 0x0044 == 0x0044 or bits & 0x4440 == 0x4440:
+        retval += 1
+      if bits & 0x2200 == 0x2200 or bits & 0x0222 == 0x0222:
+        retval += 1
+      if bits & 0x0022 == 0x0022 or bits & 0x2220 == 0x2220:
+        retval += 1
+    else:
+      if line_list[0] and line_list[1]:
+        bits = board
+      elif line_list[1] and line_list[3]:
+        bits = flip_vertical_bm4(board)
+      elif line_list[3] and line_list[2]:
+        bits = flip_diagonal_bm4(board)
+      else:
+        bits = flip_horizontal_bm4(board)
+
+      retval = 7
+      retval += pop_count(bits & 0xa0a0)
+      if bits & 0xc000 == 0xc000 or bits & 0x6000 == 0x6000:
+        retval += 1
+      if bits & 0x8800 == 0x8800 or bits & 0x0880 == 0x0880:
+        retval += 1
+      if bits & 0x2200 == 0x2200 or bits & 0x0220 == 0x0220:
+        retval += 1
+      if bits & 0x00c0 == 0x00c0 or bits & 0x0060 == 0x0060:
+        retval += 1
+  elif line_list.count(True) == 1:
+    if line_list[0]:
+      bits = board
+    elif line_list[1]:
+      bits = flip_anti_diagonal_bm4(board)
+    elif line_list[2]:
+      bits = flip_diagonal_bm4(board)
+    else:
+      bits = flip_vertical_bm4(board)
+
+    retval = 4
+    retval += pop_count(bits & 0x9090)
+    if bits & 0x00c0 == 0x00c0 or bits & 0x0070 == 0x0070:
+      retval += 1
+    if bits & 0x0070 == 0x0070 or bits & 0x0030 == 0x0030:
+      retval += 1
+    if bits & 0xc000 == 0xc000 or bits & 0x7000 == 0x7000:
+      retval += 1
+    if bits & 0xe000 == 0xe000 or bits & 0x3000 == 0x3000:
+      retval += 1
+    if bits & 0x8800 == 0x8800 or bits & 0x0880 == 0x0880:
+      retval += 1
+    if bits & 0x1100 == 0x1100 or bits & 0x0110 == 0x0110:
+      retval += 1
+    if bits & 0xec00 == 0xec00:
+      retval += 1
+    if bits & 0x7300 == 0x7300:
+      retval += 1
+  else:
+    bits = board
+    if bits & 0xc000 == 0xc000 or bits & 0x7000 == 0x7000:
+      retval += 1
+    if bits & 0x3000 == 0x3000 or bits & 0xe000 == 0xe000:
+      retval += 1
+    if bits & 0x8800 == 0x8800 or bits & 0x0888 == 0x0888:
+      retval += 1
+    if bits & 0xec00 == 0xec00 or bits & 0xcc80 == 0xcc80:
+      retval += 1
+    if bits & 0x7300 == 0x7300 or bits & 0x0331 == 0x0331:
+      retval += 1
+    if bits & 0x1100 == 0x1100 or bits & 0x0111 == 0x0111:
+      retval += 1
+    if bits & 0x0011 == 0x0011 or bits & 0x1110 == 0x1110:
+      retval += 1
+    if bits & 0x08cc == 0x08cc or bits & 0x00ce == 0x00ce:
+      retval += 1
+    if bits & 0x0133 == 0x0133 or bits & 0x0037 == 0x0037:
+      retval += 1
+    if bits & 0x000c == 0x000c or bits & 0x0007 == 0x0007:
+      retval += 1
+    if bits & 0x0003 == 0x0003 or bits & 0x000e == 0x000e:
+      retval += 1
+
+  return retval
+
+def _is_valid_determine_piece_table_4x4(table: bytes) -> bool:
+  """
+  4x4の確定石の数の表として正しいか
+
+  Parameters
+  ----------
+  table : bytes
+    確認する表
+
+  Returns
+  -------
+  is_valid : bool
+    SHA-256がDETERMINE_PIECE_TABLE_4X4_SHA256と一致するか否か
+  """
+  return hashlib.sha256(table).hexdigest() == DETERMINE_PIECE_TABLE_4X4_SHA256
+
+def get_determine_piece_table_4x4(cache_path: str = None) -> bytes:
+  """
+  4x4の確定石の数の表を返す
+
+  Parameters
+  ----------
+  cache_path : str, default None
+    表を保存するファイルの場所
+    指定された場合、ファイルがあれば読み込み、なければ作成した表を書き出す
+    ファイルの内容のSHA-256が正しくなければ、作り直した表で上書きする
+
+  Returns
+  -------
+  table : bytes
+    自分のコマの位置(16bit)を確定石の数に写す表
+
+  Notes
+  -----
+  表はcache_pathによらず同じなので、プロセス内では1つだけ保持する
+  既に表を保持している場合でも、初めて指定されたcache_pathには表を書き出す
+  """
+  global _determine_piece_table_4x4
+  if cache_path is None or cache_path in _determine_piece_table_4x4_paths:
+    if _determine_piece_table_4x4 is None:
+      _determine_piece_table_4x4 = bytes(count_determine_piece_4x4(board) for board in range(1 << 16))
+    return _determine_piece_table_4x4
+
+  table = None
+  if os.path.exists(cache_path):
+    with open(cache_path, 'rb') as f:
+      table = f.read()
+    if not _is_valid_determine_piece_table_4x4(table):
+      logger.warning('invalid determine piece table: {}, regenerate it'.format(cache_path))
+      table = None
+
+  if table is None:
+    if _determine_piece_table_4x4 is None:
+      _determine_piece_table_4x4 = bytes(count_determine_piece_4x4(board) for board in range(1 << 16))
+    with open(cache_path, 'wb') as f:
+      f.write(_determine_piece_table_4x4)
+  elif _determine_piece_table_4x4 is None:
+    _determine_piece_table_4x4 = table
+  _determine_piece_table_4x4_paths.add(cache_path)
+
+  return _determine_piece_table_4x4
@@ -0,0 +1,195 @@
+"""
+処理の多い関数の計測
+
+Notes
+-----
+環境変数OTHELLO_RL_PROFILEに計測結果の保存場所を指定した場合のみ有効になる
+無効な場合、profileデコレータは関数をそのまま返すので計測のオーバーヘッドはない
+
+有効な場合は全ての呼び出し回数を数え、OTHELLO_RL_PROFILE_SAMPLE回に1回だけ時間を計測する
+計測結果はプロセス毎に'<OTHELLO_RL_PROFILE>.<pid>.json'へ定期的に、およびプロセスの終了時に書き出す
+Poolのワーカーはterminateで終了されるので、Poolのinitializerにinit_workerを指定し、SIGTERMを受け取った時にも書き出す
+forkした子プロセスでは親の計測結果を引き継がないように0に戻すので、load_statsで合計しても二重に数えない
+
+python -m othello_rl.profiler <OTHELLO_RL_PROFILE>
+で、全てのプロセスの計測結果をまとめて表示する
+"""
+import atexit
+import functools
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from logging import getLogger
+from typing import Callable, TypeVar
+
+logger = getLogger(__name__)
+F = TypeVar('F', bound=Callable)
+
+PROFILE_PATH = os.environ.get('OTHELLO_RL_PROFILE', '')
+ENABLED = PROFILE_PATH != ''
+SAMPLE_INTERVAL = int(os.environ.get('OTHELLO_RL_PROFILE_SAMPLE', '16'))
+DUMP_INTERVAL = 10.0
+
+# 関数名 -> [呼び出し回数, 計測した回数, 計測した時間の合計]
+_stats = {}
+_last_dump = time.perf_counter()
+
+def profile(func: F = None, name: str = None) -> F:
+  """
+  関数の呼び出し回数と時間を計測するデコレータ
+
+  Parameters
+  ----------
+  func : Callable
+    計測する関数
+  name : str, default None
+    計測結果での名前, Noneであれば関数の__qualname__
+
+  Returns
+  -------
+  func : Callable
+    無効な場合はfuncそのもの、有効な場合は計測を行う関数
+  """
+  if func is None:
+    return functools.partial(profile, name=name)
+  if not ENABLED:
+    return func
+
+  stat = _stats.setdefault(name or func.__qualname__, [0, 0, 0.0])
+
+  @functools.wraps(func)
+  def wrapper(*args, **kwargs):
+    stat[0] += 1
+    if stat[0] % SAMPLE_INTERVAL != 0:
+      return func(*args, **kwargs)
+
+    start = time.perf_counter()
+    retval = func(*args, **kwargs)
+    end = time.perf_counter()
+    stat[1] += 1
+    stat[2] += end-start
+    if end-_last_dump > DUMP_INTERVAL:
+      dump()
+    return retval
+
+  return wrapper
+
+def get_stats() -> dict[str, list]:
+  """
+  現在のプロセスの計測結果を返す
+
+  Returns
+  -------
+  stats : dict[str, list]
+    関数名を[呼び出し回数, 計測した回数, 計測した時間の合計]に写す辞書
+  """
+  return {k: list(v) for k, v in _stats.items() if v[0] > 0}
+
+def _reset_stats() -> None:
+  """
+  現在のプロセスの計測結果を0に戻す
+
+  Notes
+  -----
+  各関数のwrapperは_statsの要素のリストを保持しているので、リストそのものを書き換える
+  """
+  global _last_dump
+  for stat in _stats.values():
+    stat[:] = [0, 0, 0.0]
+  _last_dump = time.perf_counter()
+
+def dump() -> None:
+  """
+  現在のプロセスの計測結果を書き出す
+  """
+  global _last_dump
+  _last_dump = time.perf_counter()
+  if not ENABLED:
+    return
+  with open('{}.{}.json'.format(PROFILE_PATH, os.getpid()), 'w') as f:
+    json.dump(get_stats(), f)
+
+def load_stats(path: str) -> dict[str, list]:
+  """
+  全てのプロセスの計測結果を読み込んでまとめる
+
+  Parameters
+  ----------
+  path : str
+    OTHELLO_RL_PROFILEに指定した場所
+
+  Returns
+  -------
+  stats : dict[str, list]
+    関数名を[呼び出し回数, 計測した回数, 計測した時間の合計]に写す辞書
+  """
+  retval = {}
+  for file_path in glob.glob('{}.*.json'.format(glob.escape(path))):
+    with open(file_path) as f:
+      for k, v in json.load(f).items():
+        stat = retval.setdefault(k, [0, 0, 0.0])
+        for i in range(3):
+          stat[i] += v[i]
+
+  return retval
+
+def format_report(stats: dict[str, list]) -> str:
+  """
+  計測結果を表にする
+
+  Parameters
+  ----------
+  stats : dict[str, list]
+    load_stats等で得た計測結果
+
+  Returns
+  -------
+  report : str
+    呼び出し回数, 推定合計時間, 1回あたりの時間, 1手あたりの回数と時間の表
+
+  Notes
+  -----
+  合計時間は計測した時間の平均に呼び出し回数を掛けて推定する
+  1手の数はメソッド名がstepで始まる関数(agentのstep等)の呼び出し回数の合計とする
+  """
+  ply = sum(v[0] for k, v in stats.items() if k.rsplit('.', 1)[-1].lstrip('_').startswith('step')) or 1
+  rows = []
+  for k, (calls, sampled, sampled_time) in stats.items():
+    per_call = sampled_time/sampled if sampled > 0 else 0.0
+    rows.append((per_call*calls, k, calls, per_call))
+  rows.sort(reverse=True)
+
+  lines = ['{:<48} {:>12} {:>10} {:>10} {:>10} {:>10}'.format('name', 'calls', 'total(s)', 'call(us)', 'calls/ply', 'ply(us)')]
+  for total, k, calls, per_call in rows:
+    lines.append('{:<48} {:>12} {:>10.3f} {:>10.2f} {:>10.2f} {:>10.2f}'.format(k, calls, total, per_call*1e6, calls/ply, total/ply*1e6))
+
+  return '\n'.join(lines)
+
+def _on_sigterm(signum: int, frame) -> None:
+  dump()
+  os._exit(128+signum)
+
+def init_worker() -> None:
+  """
+  Poolのワーカーの初期化, 有効な場合はSIGTERMを受け取った時に計測結果を書き出して終了する
+
+  Notes
+  -----
+  呼び出し元のプロセスのSIGTERMの処理は変更しないように、Poolのワーカーでのみ呼ぶ
+  """
+  if ENABLED:
+    signal.signal(signal.SIGTERM, _on_sigterm)
+
+if ENABLED:
+  atexit.register(dump)
+if hasattr(os, 'register_at_fork'):
+  os.register_at_fork(after_in_child=_reset_stats)
+
+if __name__ == '__main__':
+  if len(sys.argv) < 2:
+    print('usage: python -m othello_rl.profiler <OTHELLO_RL_PROFILE>')
+    sys.exit(1)
+  print(format_report(load_stats(sys.argv[1])))
@@ -0,0 +1,164 @@
+"""
+学習結果のチェックポイントの読み込み
+
+Notes
+-----
+読み込んだQ値のテーブルをメモリ使用量の上限つきのLRUで保持し、同じチェックポイントを再び読み込まないようにする
+max_bytesの既定値は0で、直近に返したテーブルのみを保持する(先頭から順に一度ずつ読む場合)
+同じチェックポイントを何度も参照する場合のみmax_bytesを大きくすること
+prefetchを有効にすると、i番目を返した時点でi+1番目の読み込みをスレッドで開始する
+parse_ql_jsonはGILを保持するので、ファイルの読み込み以外は評価の処理と並列にはならない
+"""
+import collections
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import getLogger
+from typing import Iterator
+from othello_rl.file import parse_ql_json
+
+logger = getLogger(__name__)
+# dictの1要素あたりのおおよそのサイズ(tupleのkey, 2つのint, floatの値)
+ENTRY_SIZE = 136
+
+def get_table_size(data: dict) -> int:
+  """
+  Q値のテーブルのおおよそのメモリ使用量を返す
+
+  Parameters
+  ----------
+  data : dict
+    parse_ql_jsonで読み込んだテーブル
+
+  Returns
+  -------
+  size : int
+    メモリ使用量(byte)
+  """
+  return sys.getsizeof(data)+len(data)*ENTRY_SIZE
+
+
+class CheckpointLoader:
+  """
+  チェックポイントを読み込み、キャッシュするクラス
+
+  Attributes
+  ----------
+  paths : list[str]
+    チェックポイントのファイルの場所のリスト
+  scale : float
+    parse_ql_jsonに渡す倍率
+  max_bytes : int
+    キャッシュするテーブルの合計サイズの上限, 直近に使ったテーブルは上限を超えても保持する
+    先読み中のテーブルはキャッシュに含まない
+  prefetch : bool
+    次のチェックポイントをスレッドで先に読み込むか否か
+  load_count : int
+    ファイルを読み込んだ回数
+  """
+  def __init__(self, paths: list[str], scale: float = 1, max_bytes: int = 0, prefetch: bool = True) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    paths : list[str]
+      チェックポイントのファイルの場所のリスト
+    scale : float, default 1
+      parse_ql_jsonに渡す倍率
+    max_bytes : int, default 0
+      キャッシュするテーブルの合計サイズの上限, 0であれば直近に返したテーブルと先読み中のテーブルのみを保持する
+    prefetch : bool, default True
+      次のチェックポイントをスレッドで先に読み込むか否か
+    """
+    self.paths = paths
+    self.scale = scale
+    self.max_bytes = max_bytes
+    self.prefetch = prefetch
+    self.load_count = 0
+
+    self.__lock = threading.Lock()
+    self.__cache = collections.OrderedDict()
+    self.__sizes = {}
+    self.__futures = {}
+    self.__executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+  def __len__(self) -> int:
+    return len(self.paths)
+
+  def __load(self, i: int) -> dict:
+    data = parse_ql_json(self.paths[i], self.scale)
+    with self.__lock:
+      self.load_count += 1
+    return data
+
+  def __put(self, i: int, data: dict) -> None:
+    """
+    テーブルをキャッシュに追加し、上限を超えた分を古い順に破棄するメソッド
+    """
+    with self.__lock:
+      self.__cache[i] = data
+      self.__cache.move_to_end(i)
+      self.__sizes[i] = get_table_size(data)
+      total = sum(self.__sizes.values())
+      while total > self.max_bytes and len(self.__cache) > 1:
+        old, _ = self.__cache.popitem(last=False)
+        total -= self.__sizes.pop(old)
+        logger.debug('evict checkpoint {}'.format(old))
+
+  def __start_prefetch(self, i: int) -> None:
+    if self.__executor is None or i >= len(self.paths):
+      return
+    with self.__lock:
+      if i in self.__cache or i in self.__futures:
+        return
+      self.__futures[i] = self.__executor.submit(self.__load, i)
+
+  def get(self, i: int) -> dict:
+    """
+    i番目のチェックポイントを返すメソッド
+
+    Parameters
+    ----------
+    i : int
+      チェックポイントの番号
+
+    Returns
+    -------
+    data : dict
+      Q値のテーブル, 呼び出し元で変更しないこと
+    """
+    with self.__lock:
+      data = self.__cache.get(i)
+      if data is not None:
+        self.__cache.move_to_end(i)
+      future: Future = self.__futures.pop(i, None)
+
+    if data is None:
+      data = future.result() if future is not None else self.__load(i)
+      self.__put(i, data)
+    self.__start_prefetch(i+1)
+
+    return data
+
+  def __iter__(self) -> Iterator[dict]:
+    for i in range(len(self.paths)):
+      yield self.get(i)
+
+  def close(self) -> None:
+    """
+    先読みのスレッドを終了し、キャッシュを破棄するメソッド
+    """
+    if self.__executor is not None:
+      self.__executor.shutdown(wait=True, cancel_futures=True)
+      self.__executor = None
+    with self.__lock:
+      self.__cache.clear()
+      self.__sizes.clear()
+      self.__futures.clear()
+
+  def __enter__(self) -> 'CheckpointLoader':
+    return self
+
+  def __exit__(self, *args) -> None:
+    self.close()
@@ -1,7 +1,43 @@
 from logging import getLogger
+from typing import Sequence
+import numpy as np
 
 logger = getLogger(__name__)
 
+def get_lambda_returns(r: np.ndarray, q_next: np.ndarray, gamma: float, lam: float) -> np.ndarray:
+  """
+  1ゲーム分の報酬とQ値からλ収益を求める
+
+  Parameters
+  ----------
+  r : numpy.ndarray
+    各着手の報酬r_t
+  q_next : numpy.ndarray
+    各着手の次の着手のQ値Q(s_t+1, a_t+1), 最後の着手では0
+  gamma : float
+    割引率γ
+  lam : float
+    λ, 0であれば1ステップのQ Learning, 1であればモンテカルロ法と同じ
+
+  Returns
+  -------
+  g : numpy.ndarray
+    各着手のλ収益G_t
+
+  Notes
+  -----
+  G_t = r_t + γ((1-λ)Q(s_t+1, a_t+1) + λG_t+1)を展開した
+  G_t = Σ_{k>=t} (γλ)^(k-t) (r_k + γ(1-λ)Q(s_k+1, a_k+1))
+  を上三角行列との積として一度に求める
+  """
+  n = len(r)
+  c = np.asarray(r, dtype=np.float64) + gamma*(1-lam)*np.asarray(q_next, dtype=np.float64)
+  k = np.arange(n)
+  power = k[None, :] - k[:, None]
+  decay = np.where(power >= 0, (gamma*lam)**np.maximum(power, 0), 0.0)
+
+  return decay @ c
+
 class QLearning:
   """
   Q-Learning用のクラス
@@ -24,6 +60,12 @@ class QLearning:
     self.data = data
     self.init_value = init_value
 
+  def __len__(self) -> int:
+    """
+    学習した(状態, 行動)の数
+    """
+    return len(self.data)
+
   def get(self, s: int, a: int) -> float:
     """
     dataから値の取得
@@ -57,7 +99,7 @@ class QLearning:
     """
     self.data[(s, a)] = value
 
-  def update(self, s: int, a: int, r: float, q: float, *q_old: float) -> float:
+  def update(self, s: int, a: int, r: float, q: float, *q_old: float, weight: float = 1.0) -> float:
     """
     Q値の更新
 
@@ -73,6 +115,8 @@ class QLearning:
       Q(s_t+1, a)
     q_old : float
       Q(s, a)
+    weight : float, default 1.0
+      学習率に掛ける重み, 経験再生での重要度重み等に用いる
 
     Returns
     ------
@@ -84,8 +128,263 @@ class QLearning:
     else:
       q_old = q_old[0]
     #print('alpha:{}, q_old:{}, r:{}, gamma:{}, q:{}'.format(self.alpha, q_old, r, self.gamma, q))
-    q_new = (1-self.alpha)*q_old+self.alpha*(r + self.gamma*q)
+    alpha = self.alpha*weight
+    q_new = (1-alpha)*q_old+alpha*(r + self.gamma*q)
 
     self.__set(s, a, q_new)
 
     return q_new
+
+
+  def update_trajectory(self, s: Sequence[int], a: Sequence[int], r: Sequence[float], lam: float) -> np.ndarray:
+    """
+    1ゲーム分の着手をλ収益でまとめて更新
+
+    Parameters
+    ----------
+    s : Sequence[int]
+      着手順の状態
+    a : Sequence[int]
+      着手順の行動
+    r : Sequence[float]
+      着手順の報酬
+    lam : float
+      λ
+
+    Returns
+    -------
+    g : numpy.ndarray
+      各着手のλ収益
+    """
+    q_old = [self.get(s_t, a_t) for s_t, a_t in zip(s, a)]
+    g = get_lambda_returns(r, q_old[1:]+[0], self.gamma, lam)
+    for s_t, a_t, g_t, q_t in zip(s, a, g.tolist(), q_old):
+      self.update(s_t, a_t, g_t, 0, q_t)
+
+    return g
+
+class ArrayQLearning(QLearning):
+  """
+  Q値をnumpyの配列で保持するQ-Learning用のクラス
+
+  Attributes
+  ----------
+  alpha : float
+    学習率α
+  gamma : float
+    割引率γ
+  index : dict[tuple[int, int], int]
+    (状態, 行動)をvalues内の位置に写す辞書
+  values : numpy.ndarray
+    Q値の配列, 先頭のlen(index)個が有効
+  init_value : float
+    dataの初期値
+
+  Notes
+  -----
+  update_batchで複数の(状態, 行動)をまとめて更新できる
+  配列は各プロセスで独立しているので、learn_mpのように複数のプロセスから更新する場合はQLearningを用いること
+  """
+  def __init__(self, alpha: float, gamma: float, data: dict = None, init_value: float = 0, capacity: int = 1024) -> None:
+    self.capacity = capacity
+    self.init_value = init_value
+    super().__init__(alpha, gamma, {} if data is None else data, init_value)
+
+  def __len__(self) -> int:
+    """
+    学習した(状態, 行動)の数, dataと異なり辞書を作らない
+    """
+    return len(self.index)
+
+  @property
+  def data(self) -> dict:
+    """
+    QLearningと互換性のある(状態, 行動)からQ値への辞書
+    """
+    values = self.values[:len(self.index)].tolist()
+    return {k: values[i] for k, i in self.index.items()}
+
+  @data.setter
+  def data(self, data: dict) -> None:
+    self.index = {}
+    self.values = np.full(max(self.capacity, len(data)), self.init_value, dtype=np.float64)
+    if len(data) > 0:
+      slots = self.get_slots(*zip(*data.keys()))
+      self.values[slots] = list(data.values())
+
+  def get_slots(self, s: Sequence[int], a: Sequence[int]) -> np.ndarray:
+    """
+    (状態, 行動)のvalues内の位置を求める, 存在しない場合は値がinit_valueの位置を割り当てる
+
+    Parameters
+    ----------
+    s : Sequence[int]
+      状態の列
+    a : Sequence[int]
+      行動の列
+
+    Returns
+    -------
+    slots : numpy.ndarray
+      values内の位置
+    """
+    index = self.index
+    retval = []
+    for key in zip(s, a):
+      i = index.get(key)
+      if i is None:
+        i = len(index)
+        index[key] = i
+      retval.append(i)
+
+    if len(index) > len(self.values):
+      new_values = np.full(max(len(index), 2*len(self.values)), self.init_value, dtype=np.float64)
+      new_values[:len(self.values)] = self.values
+      self.values = new_values
+    return np.array(retval, dtype=np.int64)
+
+  def get(self, s: int, a: int) -> float:
+    """
+    dataから値の取得
+
+    Parameters
+    ----------
+    s : int
+      状態
+    a : int
+      行動
+
+    Returns
+    -------
+    value : float
+      Q値, Q(s, a)
+    """
+    i = self.index.get((s, a))
+    if i is None:
+      return self.init_value
+    return float(self.values[i])
+
+  def get_batch(self, s: Sequence[int], a: Sequence[int]) -> np.ndarray:
+    """
+    dataから値をまとめて取得
+
+    Parameters
+    ----------
+    s : Sequence[int]
+      状態の列
+    a : Sequence[int]
+      行動の列
+
+    Returns
+    -------
+    values : numpy.ndarray
+      Q値の配列
+    """
+    index = self.index
+    slots = np.array([index.get(key, -1) for key in zip(s, a)], dtype=np.int64)
+    return np.where(slots >= 0, self.values[slots], self.init_value)
+
+  def update(self, s: int, a: int, r: float, q: float, *q_old: float, weight: float = 1.0) -> float:
+    """
+    Q値の更新
+
+    Parameters
+    ----------
+    s : int
+      状態
+    a : int
+      行動
+    r : float
+      報酬
+    q : float
+      Q(s_t+1, a)
+    q_old : float
+      Q(s, a)
+    weight : float, default 1.0
+      学習率に掛ける重み
+
+    Returns
+    ------
+    q_new : float
+      updateされたQ値
+    """
+    if len(q_old) == 0:
+      q_old = self.get(s, a)
+    else:
+      q_old = q_old[0]
+    alpha = self.alpha*weight
+    q_new = (1-alpha)*q_old+alpha*(r + self.gamma*q)
+
+    i = self.index.get((s, a))
+    if i is None:
+      i = self.get_slots([s], [a])[0]
+    self.values[i] = q_new
+
+    return q_new
+
+  def update_batch(self, s: Sequence[int], a: Sequence[int], r: np.ndarray, q: np.ndarray, q_old: np.ndarray = None, weight: np.ndarray = None) -> np.ndarray:
+    """
+    Q値をまとめて更新
+
+    Parameters
+    ----------
+    s : Sequence[int]
+      状態の列
+    a : Sequence[int]
+      行動の列
+    r : numpy.ndarray
+      報酬
+    q : numpy.ndarray
+      Q(s_t+1, a)
+    q_old : numpy.ndarray, default None
+      Q(s, a), Noneであれば現在の値を用いる
+    weight : numpy.ndarray, default None
+      学習率に掛ける重み, Noneであれば全て1
+
+    Returns
+    ------
+    q_new : numpy.ndarray
+      updateされたQ値
+
+    Notes
+    -----
+    同じ(状態, 行動)が複数含まれる場合は、それぞれの更新後の値の平均を代入する
+    """
+    slots = self.get_slots(s, a)
+    if q_old is None:
+      q_old = self.values[slots]
+    alpha = self.alpha if weight is None else self.alpha*np.asarray(weight, dtype=np.float64)
+    q_new = (1-alpha)*np.asarray(q_old, dtype=np.float64)+alpha*(np.asarray(r, dtype=np.float64)+self.gamma*np.asarray(q, dtype=np.float64))
+
+    unique_slots, inverse = np.unique(slots, return_inverse=True)
+    sums = np.zeros(len(unique_slots), dtype=np.float64)
+    np.add.at(sums, inverse, q_new)
+    self.values[unique_slots] = sums/np.bincount(inverse)
+
+    return self.values[slots]
+
+  def update_trajectory(self, s: Sequence[int], a: Sequence[int], r: Sequence[float], lam: float) -> np.ndarray:
+    """
+    1ゲーム分の着手をλ収益でまとめて更新
+
+    Parameters
+    ----------
+    s : Sequence[int]
+      着手順の状態
+    a : Sequence[int]
+      着手順の行動
+    r : Sequence[float]
+      着手順の報酬
+    lam : float
+      λ
+
+    Returns
+    -------
+    g : numpy.ndarray
+      各着手のλ収益
+    """
+    q_old = self.get_batch(s, a)
+    g = get_lambda_returns(r, np.append(q_old[1:], 0.0), self.gamma, lam)
+    self.update_batch(s, a, g, np.zeros(len(g)), q_old)
+
+    return g
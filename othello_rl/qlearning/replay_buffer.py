@@ -0,0 +1,250 @@
+"""
+Q Learning用の経験再生(experience replay)
+
+Notes
+-----
+遷移(s, a, r, s', a', done)を固定長の配列に循環的に保存し、一様または優先度付きでサンプリングして再学習する
+s', a'は同じプレイヤーの次の着手であり、learn_one_gameと同じくQ(s', a')を次の状態の価値として用いる
+
+優先度付きサンプリングでは、優先度p_iに対してP(i) = p_i^α/Σp_k^αで選択し、
+重要度重みw_i = (N*P(i))^(-β)/max(w)で更新量を補正する
+
+Featuresv2, v3の8x8の状態のインデックスは64bitに収まらないので、状態は既定ではobjectの配列に保存する
+
+バッファはプロセス間で共有されない
+learn_mpではPoolの各タスクにOthelloQLearningManagerが複製されて渡されるため、
+各タスクは独立した(空から始まる)バッファを用い、タスクの終了時に破棄される
+"""
+from logging import getLogger
+import numpy as np
+from othello_rl.qlearning.qlearning import QLearning
+from othello_rl.rng import SeedLike, to_seed_sequence
+
+logger = getLogger(__name__)
+
+class ReplayBuffer:
+  """
+  固定長の経験再生用バッファ
+
+  Attributes
+  ----------
+  capacity : int
+    保存できる遷移の最大数
+  size : int
+    保存されている遷移の数
+  position : int
+    次に書き込む位置
+  s : numpy.ndarray
+    状態
+  a : numpy.ndarray
+    行動
+  r : numpy.ndarray
+    報酬
+  s_next : numpy.ndarray
+    次の状態
+  a_next : numpy.ndarray
+    次の行動
+  done : numpy.ndarray
+    終局か否か
+  priorities : numpy.ndarray
+    優先度
+  max_priority : float
+    これまでの最大の優先度
+  prioritized : bool
+    優先度付きでサンプリングするか否か
+  alpha : float
+    優先度の指数α
+  beta : float
+    重要度重みの指数β
+  epsilon : float
+    優先度がなくならないように加える値
+  generator : numpy.random.Generator
+    サンプリングに用いる乱数生成器
+  """
+  def __init__(self, capacity: int, prioritized: bool = False, alpha: float = 0.6, beta: float = 0.4, epsilon: float = 1e-3, state_dtype = object, seed: SeedLike = None) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    capacity : int
+      保存できる遷移の最大数
+    prioritized : bool, default False
+      優先度付きでサンプリングするか否か
+    alpha : float, default 0.6
+      優先度の指数α
+    beta : float, default 0.4
+      重要度重みの指数β
+    epsilon : float, default 1e-3
+      優先度がなくならないように加える値
+    state_dtype : numpy.dtype, default object
+      状態を保存する配列の型, 状態のインデックスが常に64bitに収まる特徴量(Featuresv1等)ではnumpy.int64を指定すると速い
+    seed : None or int or SeedSequence, default None
+      サンプリングに用いる乱数列のseed
+    """
+    self.capacity = capacity
+    self.prioritized = prioritized
+    self.alpha = alpha
+    self.beta = beta
+    self.epsilon = epsilon
+
+    self.s = np.zeros(capacity, dtype=state_dtype)
+    self.a = np.zeros(capacity, dtype=np.int64)
+    self.r = np.zeros(capacity, dtype=np.float64)
+    self.s_next = np.zeros(capacity, dtype=state_dtype)
+    self.a_next = np.zeros(capacity, dtype=np.int64)
+    self.done = np.zeros(capacity, dtype=np.bool_)
+    self.priorities = np.zeros(capacity, dtype=np.float64)
+    self.max_priority = 1.0
+    self.size = 0
+    self.position = 0
+    self.generator = np.random.default_rng(to_seed_sequence(seed))
+
+  def __len__(self) -> int:
+    return self.size
+
+  def add(self, s: int, a: int, r: float, s_next: int, a_next: int, done: bool) -> None:
+    """
+    遷移を追加するメソッド
+    新しい遷移には既存の最大の優先度を与える
+
+    Parameters
+    ----------
+    s : int
+      状態
+    a : int
+      行動
+    r : float
+      報酬
+    s_next : int
+      次の状態
+    a_next : int
+      次の行動
+    done : bool
+      終局か否か
+    """
+    i = self.position
+    self.s[i] = s
+    self.a[i] = a
+    self.r[i] = r
+    self.s_next[i] = s_next
+    self.a_next[i] = a_next
+    self.done[i] = done
+    self.priorities[i] = self.max_priority
+
+    self.position = (i+1)%self.capacity
+    self.size = min(self.size+1, self.capacity)
+
+  def add_trajectory(self, trajectory: list[list]) -> None:
+    """
+    1ゲーム分の着手を遷移として追加するメソッド
+
+    Parameters
+    ----------
+    trajectory : list[list]
+      着手順の[s, a, ..., r]のリスト, 先頭を状態、2番目を行動、最後を報酬とする
+    """
+    for i, action in enumerate(trajectory):
+      if i+1 < len(trajectory):
+        self.add(action[0], action[1], action[-1], trajectory[i+1][0], trajectory[i+1][1], False)
+      else:
+        self.add(action[0], action[1], action[-1], 0, 0, True)
+
+  def sample(self, batch_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    遷移をサンプリングするメソッド
+
+    Parameters
+    ----------
+    batch_size : int
+      サンプリングする数
+
+    Returns
+    -------
+    indices : numpy.ndarray
+      サンプリングされた遷移の位置
+    weights : numpy.ndarray
+      各遷移の重要度重み, 一様なサンプリングでは全て1
+    """
+    if not self.prioritized:
+      indices = self.generator.integers(0, self.size, batch_size)
+      return indices, np.ones(batch_size, dtype=np.float64)
+
+    p = self.priorities[:self.size]**self.alpha
+    cumsum = np.cumsum(p)
+    indices = np.searchsorted(cumsum, self.generator.random(batch_size)*cumsum[-1], side='right')
+    indices = np.minimum(indices, self.size-1)
+    weights = (self.size*p[indices]/cumsum[-1])**(-self.beta)
+
+    return indices, weights/weights.max()
+
+  def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray) -> None:
+    """
+    遷移の優先度を更新するメソッド
+
+    Parameters
+    ----------
+    indices : numpy.ndarray
+      更新する遷移の位置
+    td_errors : numpy.ndarray
+      各遷移のTD誤差
+    """
+    priorities = np.abs(td_errors)+self.epsilon
+    self.priorities[indices] = priorities
+    self.max_priority = max(self.max_priority, float(priorities.max()))
+
+  def replay(self, ql: QLearning, batch_size: int) -> np.ndarray:
+    """
+    サンプリングした遷移で再学習を行うメソッド
+
+    Parameters
+    ----------
+    ql : QLearning
+      Q-Learning用のクラス
+    batch_size : int
+      サンプリングする数
+
+    Returns
+    -------
+    td_errors : numpy.ndarray
+      更新前のTD誤差
+
+    Notes
+    -----
+    qlがupdate_batchを持つ場合(ArrayQLearning)はまとめて更新する
+    """
+    if self.size == 0:
+      return np.zeros(0, dtype=np.float64)
+
+    indices, weights = self.sample(batch_size)
+    if hasattr(ql, 'update_batch'):
+      s = self.s[indices]
+      a = self.a[indices]
+      q = np.where(self.done[indices], 0.0, ql.get_batch(self.s_next[indices], self.a_next[indices]))
+      q_old = ql.get_batch(s, a)
+      td_errors = self.r[indices] + ql.gamma*q - q_old
+      ql.update_batch(s, a, self.r[indices], q, q_old, weights)
+      if self.prioritized:
+        self.update_priorities(indices, td_errors)
+      return td_errors
+
+    s = self.s[indices].tolist()
+    a = self.a[indices].tolist()
+    r = self.r[indices].tolist()
+    s_next = self.s_next[indices].tolist()
+    a_next = self.a_next[indices].tolist()
+    done = self.done[indices].tolist()
+    weights = weights.tolist()
+
+    td_errors = []
+    for i in range(len(indices)):
+      q = 0 if done[i] else ql.get(s_next[i], a_next[i])
+      q_old = ql.get(s[i], a[i])
+      td_errors.append(r[i] + ql.gamma*q - q_old)
+      ql.update(s[i], a[i], r[i], q, q_old, weight=weights[i])
+
+    td_errors = np.array(td_errors, dtype=np.float64)
+    if self.prioritized:
+      self.update_priorities(indices, td_errors)
+
+    return td_errors
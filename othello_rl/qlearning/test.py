@@ -1,10 +1,13 @@
+from othello_rl.error import OthelloRLError
 from othello_rl.othello.features import Features
 from othello_rl.othello.agent import Agent, QLearningAgent
 from othello_rl.othello.board import OthelloBoard8x8, OthelloBoard4x4
-from othello_rl.file import parse_ql_json
+from othello_rl.manager.tournament import SPRT
+from othello_rl.qlearning.checkpoint import CheckpointLoader
+from othello_rl.record import GameRecorder
 import matplotlib.pyplot as plt
 
-def tester(board_size: int, agent1: Agent, agent2: Agent, do_from_agent1: bool = True):
+def tester(board_size: int, agent1: Agent, agent2: Agent, do_from_agent1: bool = True, recorder: GameRecorder = None):
   """
   オセロを1ゲーム行う
 
@@ -18,6 +21,8 @@ def tester(board_size: int, agent1: Agent, agent2: Agent, do_from_agent1: bool =
     agent2
   do_from_agent1 : bool, dafault True
     agent1からゲームを始めるか否か
+  recorder : GameRecorder, default None
+    対局の棋譜を記録するクラス, Noneであれば記録しない
 
   Returns
   -------
@@ -30,6 +35,8 @@ def tester(board_size: int, agent1: Agent, agent2: Agent, do_from_agent1: bool =
     othello = OthelloBoard4x4(0)
 
   agent = [agent1, agent2]
+  agent1.reset()
+  agent2.reset()
 
   if not do_from_agent1:
     othello.change_player()
@@ -44,8 +51,62 @@ def tester(board_size: int, agent1: Agent, agent2: Agent, do_from_agent1: bool =
       pass
     else:
       result = othello.get_result()
+      if recorder is not None:
+        recorder.record(othello)
       return result
 
+def sprt_test(board_size: int, agent: Agent, opponent_agent: Agent, max_count: int, batch_size: int = 100, elo0: float = 0.0, elo1: float = 50.0, alpha: float = 0.05, beta: float = 0.05, order_type: int = 2, recorder: GameRecorder = None) -> tuple[list[int], int]:
+  """
+  対局をbatch_size局ずつ行い、opponent_agentとの差が統計的に確定した時点で打ち切る
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ
+  agent : Agent
+    評価するagent
+  opponent_agent : Agent
+    基準となるagent
+  max_count : int
+    最大の対局数
+  batch_size : int, default 100
+    SPRTを確認するまでに行う対局数
+  elo0 : float, default 0.0
+    帰無仮説H0でのEloの差
+  elo1 : float, default 50.0
+    対立仮説H1でのEloの差
+  alpha : float, default 0.05
+    第1種の過誤の確率
+  beta : float, default 0.05
+    第2種の過誤の確率
+  order_type : int, default 2
+    0: 先手agent, 1: 先手opponent_agent, 2: 交互
+  recorder : GameRecorder, default None
+    対局の棋譜を記録するクラス
+
+  Returns
+  -------
+  result : list[int]
+    [agentの勝ち数, agentの負け数, 引き分けの数]
+  status : int
+    0: H0を採択, 1: H1を採択, -1: max_count局で確定しなかった
+  """
+  sprt = SPRT(elo0, elo1, alpha, beta)
+  result = [0, 0, 0]
+  count = 0
+  while count < max_count:
+    batch = [0, 0, 0]
+    for j in range(count, min(count+batch_size, max_count)):
+      batch[tester(board_size, agent, opponent_agent, order_type == 0 or (order_type == 2 and j%2 == 0), recorder)] += 1
+    sprt.add(*batch)
+    result = [r+b for r, b in zip(result, batch)]
+    count += sum(batch)
+    status = sprt.get_status()
+    if status != -1:
+      return result, status
+
+  return result, -1
+
 def ql_test(board_size: int, features: Features, dic: dict, init_value: int, opponent_agent: Agent, count: int, ql_order: int = 1):
   ql_agent = QLearningAgent(features, dic, init_value)
   result_sum = [0, 0, 0]
@@ -54,6 +115,8 @@ def ql_test(board_size: int, features: Features, dic: dict, init_value: int, opp
       othello = OthelloBoard8x8(ql_order)
     elif board_size == 4:
       othello = OthelloBoard4x4(ql_order)
+    ql_agent.reset()
+    opponent_agent.reset()
     while True:
       if othello.now_turn == 0:
         ql_agent.step(othello)
@@ -68,13 +131,13 @@ def ql_test(board_size: int, features: Features, dic: dict, init_value: int, opp
       else:
         result = othello.get_result()
         if result == -1:
-          exit()
+          raise OthelloRLError('game finished without result')
         result_sum[result] += 1
         break
 
   return result_sum
 
-def test_graph(file_name: str, board_size: int, features: Features, init_value: int, dir: str, path: str, dict_num: int, opponent_agent: Agent, count: int, order_type : int):
+def test_graph(file_name: str, board_size: int, features: Features, init_value: int, dir: str, path: str, dict_num: int, opponent_agent: Agent, count: int, order_type : int, sprt: dict = None):
   """
   
   Parameters
@@ -83,22 +146,30 @@ def test_graph(file_name: str, board_size: int, features: Features, init_value:
     0: 先手ql
     1: 先手opp_agent
     2: 交互
+  sprt : dict, default None
+    sprt_testに渡す引数(batch_size, elo0, elo1, alpha, beta), Noneであれば常にcount局行う
   """
   result = []
-  for i in range(dict_num):
-    dic = parse_ql_json(dir+str(i)+path,1)
-    l = [0, 0, 0]
-    for j in range(count):
-      if order_type == 0:
-        r = tester(board_size, QLearningAgent(features, dic, init_value), opponent_agent, True)
-      elif order_type == 1:
-        r = tester(board_size, QLearningAgent(features, dic, init_value), opponent_agent, False)
-      elif order_type == 2:
-        r = tester(board_size, QLearningAgent(features, dic, init_value), opponent_agent, True if j%2==0 else False)
-      l[r] += 1
-    #result.append(ql_test(board_size, features, dic, init_value, opponent_agent, count, ql_order))
-    result.append(l)
-    print('win: {}, lose: {}, draw: {}'.format(*(result[-1])))
+  # 各チェックポイントは順に一度ずつしか読まないので、現在と先読み中のテーブルのみを保持する
+  with CheckpointLoader([dir+str(i)+path for i in range(dict_num)], max_bytes=0) as loader:
+    for dic in loader:
+      ql_agent = QLearningAgent(features, dic, init_value)
+      if sprt is not None:
+        l, _ = sprt_test(board_size, ql_agent, opponent_agent, count, order_type=order_type, **sprt)
+        result.append(l)
+        print('win: {}, lose: {}, draw: {}'.format(*(result[-1])))
+        continue
+      l = [0, 0, 0]
+      for j in range(count):
+        if order_type == 0:
+          r = tester(board_size, ql_agent, opponent_agent, True)
+        elif order_type == 1:
+          r = tester(board_size, ql_agent, opponent_agent, False)
+        elif order_type == 2:
+          r = tester(board_size, ql_agent, opponent_agent, True if j%2==0 else False)
+        l[r] += 1
+      result.append(l)
+      print('win: {}, lose: {}, draw: {}'.format(*(result[-1])))
   
   fig, ax = plt.subplots()
   label = ['win', 'lose', 'draw']
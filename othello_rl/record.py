@@ -0,0 +1,330 @@
+"""
+対局の棋譜の記録と読み込み
+
+Notes
+-----
+棋譜ファイルは以下のバイナリ形式で、追記が可能
+- ファイルヘッダ(6byte): マジックナンバー b'ORLR', バージョン(uint8), 盤のサイズ(uint8)
+- 各対局: フラグ(uint8), 着手数(uint8), 着手(uint8 x 着手数)
+  - フラグの下位1bitは先手のプレイヤー, 上位2bitはゲームの結果(0, 1, 2, 3: 未終了)
+  - 着手はx*盤のサイズ+yで表し、パスは記録せず再生時に補う
+
+各対局の先頭位置はuint64の配列として、棋譜ファイル名に'.idx'を付けたファイルに追記する
+
+multiprocessingの子プロセスで記録する場合は、ファイル名にプロセスIDを付けた別のファイルに書き込む
+"""
+import glob
+import os
+import struct
+from logging import getLogger
+from typing import Iterator, TypedDict
+import numpy as np
+from othello_rl.error import ArgsError
+from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
+
+logger = getLogger(__name__)
+MAGIC = b'ORLR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sBB')
+GAME_HEADER = struct.Struct('<BB')
+
+class GameRecord(TypedDict):
+  """
+  1対局分の棋譜
+
+  Attributes
+  ----------
+  first_player : int
+    先手のプレイヤー
+  result : int
+    ゲームの結果, OthelloBoard.get_resultと同じ
+  moves : list[int]
+    着手(x*盤のサイズ+y)のリスト
+  """
+  first_player: int
+  result: int
+  moves: list[int]
+
+def encode_game(othello: OthelloBoard) -> bytes:
+  """
+  盤面の履歴から1対局分の棋譜を作成する
+
+  Parameters
+  ----------
+  othello : OthelloBoard
+    対局後の盤面
+
+  Returns
+  -------
+  data : bytes
+    棋譜
+  """
+  past_data = othello.past_data
+  first_player = past_data[0]['turn'] if len(past_data) > 0 else othello.now_turn
+  result = othello.get_result()
+  moves = bytes(data['x']*othello.board_width+data['y'] for data in past_data)
+
+  return GAME_HEADER.pack(first_player | (result & 3) << 1, len(moves)) + moves
+
+def make_othello(board_size: int, first_player: int = 0) -> OthelloBoard:
+  """
+  盤のサイズからオセロを作成する
+
+  Parameters
+  ----------
+  board_size : int
+    盤のサイズ, 4 or 8
+  first_player : int, default 0
+    先手のプレイヤー
+
+  Returns
+  -------
+  othello : OthelloBoard
+    初期盤面
+  """
+  if board_size == 8:
+    return OthelloBoard8x8(first_player)
+  elif board_size == 4:
+    return OthelloBoard4x4(first_player)
+  raise ArgsError('board_size({}) must be 4 or 8'.format(board_size))
+
+def replay_game(record: GameRecord, board_size: int) -> Iterator[tuple[OthelloBoard, int, int]]:
+  """
+  棋譜を再生する
+
+  Parameters
+  ----------
+  record : GameRecord
+    再生する棋譜
+  board_size : int
+    盤のサイズ
+
+  Yields
+  ------
+  othello : OthelloBoard
+    着手前の盤面, 全ての着手で同じオブジェクトを用いる
+  x : int
+    着手のx座標
+  y : int
+    着手のy座標
+
+  Notes
+  -----
+  yieldの後に着手を行う
+  手番のプレイヤーに合法手がない場合は、パスとして手番を交代する
+  """
+  othello = make_othello(board_size, record['first_player'])
+  for move in record['moves']:
+    if othello.get_legal_board(othello.now_turn) == 0:
+      othello.change_player()
+    x = move//board_size
+    y = move%board_size
+    yield othello, x, y
+    othello.reverse(x, y, False)
+    if othello.get_next_state() == 0:
+      othello.change_player()
+
+def get_record_paths(path: str) -> list[str]:
+  """
+  棋譜ファイルと、子プロセスが書き込んだ棋譜ファイルのリストを返す
+
+  Parameters
+  ----------
+  path : str
+    GameRecorderに指定したファイルの場所
+
+  Returns
+  -------
+  paths : list[str]
+    存在する棋譜ファイルの場所のリスト
+  """
+  root, ext = os.path.splitext(path)
+  paths = [path] if os.path.exists(path) else []
+  paths.extend(sorted(glob.glob('{}.*{}'.format(glob.escape(root), ext))))
+
+  return [p for p in paths if not p.endswith('.idx')]
+
+
+class GameRecorder:
+  """
+  棋譜を記録するクラス
+
+  Attributes
+  ----------
+  path : str
+    棋譜ファイルの場所
+  board_size : int
+    盤のサイズ
+  owner_pid : int
+    このrecorderを作成したプロセスのID
+
+  Notes
+  -----
+  pickleする際にはファイルを閉じ、別のプロセスで利用された場合はプロセス毎のファイルに書き込む
+  """
+  def __init__(self, path: str, board_size: int) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    path : str
+      棋譜ファイルの場所
+    board_size : int
+      盤のサイズ
+    """
+    self.path = path
+    self.board_size = board_size
+    self.owner_pid = os.getpid()
+    self.__file = None
+    self.__idx_file = None
+    self.__pid = None
+
+  def __getstate__(self) -> dict:
+    state = self.__dict__.copy()
+    state['_GameRecorder__file'] = None
+    state['_GameRecorder__idx_file'] = None
+    state['_GameRecorder__pid'] = None
+    return state
+
+  def __open(self) -> None:
+    """
+    現在のプロセス用の棋譜ファイルを開くメソッド
+    """
+    self.close()
+    pid = os.getpid()
+    if pid == self.owner_pid:
+      path = self.path
+    else:
+      root, ext = os.path.splitext(self.path)
+      path = '{}.{}{}'.format(root, pid, ext)
+
+    self.__file = open(path, 'ab')
+    self.__idx_file = open(path+'.idx', 'ab')
+    self.__pid = pid
+    if self.__file.tell() == 0:
+      self.__file.write(FILE_HEADER.pack(MAGIC, VERSION, self.board_size))
+
+  def record(self, othello: OthelloBoard) -> None:
+    """
+    1対局分の棋譜を記録するメソッド
+
+    Parameters
+    ----------
+    othello : OthelloBoard
+      対局後の盤面
+    """
+    if self.__pid != os.getpid():
+      self.__open()
+
+    self.__idx_file.write(struct.pack('<Q', self.__file.tell()))
+    self.__file.write(encode_game(othello))
+    if self.__pid != self.owner_pid:
+      # 子プロセスのrecorderはタスク毎に破棄されるので、書き込みを確定させておく
+      self.flush()
+
+  def flush(self) -> None:
+    """
+    書き込みを確定するメソッド
+    """
+    if self.__file is not None:
+      self.__file.flush()
+      self.__idx_file.flush()
+
+  def close(self) -> None:
+    """
+    ファイルを閉じるメソッド
+    """
+    if self.__file is not None:
+      self.__file.close()
+      self.__idx_file.close()
+    self.__file = None
+    self.__idx_file = None
+    self.__pid = None
+
+
+class GameRecordReader:
+  """
+  棋譜ファイルを読み込むクラス
+
+  Attributes
+  ----------
+  path : str
+    棋譜ファイルの場所
+  board_size : int
+    盤のサイズ
+  data : numpy.memmap
+    棋譜ファイルの内容
+  offsets : numpy.ndarray
+    各対局の先頭位置
+  """
+  def __init__(self, path: str) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    path : str
+      棋譜ファイルの場所
+    """
+    self.path = path
+    self.data = np.memmap(path, dtype=np.uint8, mode='r')
+    magic, version, self.board_size = FILE_HEADER.unpack(bytes(self.data[:FILE_HEADER.size]))
+    if magic != MAGIC or version != VERSION:
+      raise ArgsError('{} isn\'t a game record file (version {})'.format(path, VERSION))
+
+    if os.path.exists(path+'.idx'):
+      self.offsets = np.fromfile(path+'.idx', dtype='<u8')
+    else:
+      self.offsets = self.__build_offsets()
+
+  def __build_offsets(self) -> np.ndarray:
+    """
+    索引ファイルがない場合に、棋譜ファイルを走査して各対局の先頭位置を求めるメソッド
+
+    Returns
+    -------
+    offsets : numpy.ndarray
+      各対局の先頭位置
+    """
+    logger.warning('{}.idx is not found, rebuilding offsets'.format(self.path))
+    offsets = []
+    offset = FILE_HEADER.size
+    while offset < len(self.data):
+      offsets.append(offset)
+      offset += GAME_HEADER.size + int(self.data[offset+1])
+
+    return np.array(offsets, dtype=np.uint64)
+
+  def __len__(self) -> int:
+    return len(self.offsets)
+
+  def __getitem__(self, i: int) -> GameRecord:
+    offset = int(self.offsets[i])
+    flags = int(self.data[offset])
+    n = int(self.data[offset+1])
+    result = flags >> 1
+    moves = self.data[offset+GAME_HEADER.size:offset+GAME_HEADER.size+n].tolist()
+
+    return GameRecord(first_player=flags & 1, result=-1 if result == 3 else result, moves=moves)
+
+  def __iter__(self) -> Iterator[GameRecord]:
+    for i in range(len(self)):
+      yield self[i]
+
+  def iter_chunks(self, chunk_size: int) -> Iterator[list[GameRecord]]:
+    """
+    棋譜をchunk_size対局ずつ読み込むメソッド
+
+    Parameters
+    ----------
+    chunk_size : int
+      一度に読み込む対局数
+
+    Yields
+    ------
+    records : list[GameRecord]
+      棋譜のリスト
+    """
+    for start in range(0, len(self), chunk_size):
+      yield [self[i] for i in range(start, min(start+chunk_size, len(self)))]
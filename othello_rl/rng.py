@@ -0,0 +1,161 @@
+"""
+乱数生成の補助クラス群
+
+Notes
+-----
+multiprocessingでforkされた各プロセスが同一の乱数状態を共有しないように、
+numpy.random.SeedSequenceから独立した乱数列を生成してagentやmanagerへ渡す
+"""
+from typing import Sequence, TypeVar, Union
+import numpy as np
+
+T = TypeVar('T')
+SeedLike = Union[None, int, np.random.SeedSequence]
+
+def to_seed_sequence(seed: SeedLike) -> np.random.SeedSequence:
+  """
+  seedをSeedSequenceに変換する
+
+  Parameters
+  ----------
+  seed : None or int or SeedSequence
+    元となるseed, Noneであればosのエントロピーを用いる
+
+  Returns
+  -------
+  seed_sequence : SeedSequence
+    変換されたSeedSequence
+  """
+  if isinstance(seed, np.random.SeedSequence):
+    return seed
+  return np.random.SeedSequence(seed)
+
+def spawn_seeds(seed: SeedLike, n: int) -> list[np.random.SeedSequence]:
+  """
+  seedから互いに独立したn個の子SeedSequenceを生成する
+
+  Parameters
+  ----------
+  seed : None or int or SeedSequence
+    元となるseed
+  n : int
+    生成する数
+
+  Returns
+  -------
+  seeds : list[SeedSequence]
+    子SeedSequenceのリスト
+  """
+  return to_seed_sequence(seed).spawn(n)
+
+
+class RandomStream:
+  """
+  numpy.random.Generatorによる乱数列
+
+  Attributes
+  ----------
+  generator : numpy.random.Generator
+    乱数生成器
+  buffer_size : int
+    一度にまとめて生成する一様乱数の数
+  buffer : list[float]
+    生成済みの一様乱数
+
+  Notes
+  -----
+  Generatorを1回ずつ呼び出すとオーバーヘッドが大きいので、
+  一様乱数をbuffer_size個まとめて生成して使いまわす
+  """
+  def __init__(self, seed: SeedLike = None, buffer_size: int = 1024) -> None:
+    """
+    コンストラクタ
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence, default None
+      乱数列のseed
+    buffer_size : int, default 1024
+      一度にまとめて生成する一様乱数の数
+    """
+    self.buffer_size = buffer_size
+    self.seed(seed)
+
+  def seed(self, seed: SeedLike) -> None:
+    """
+    乱数列を初期化する
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence
+      乱数列のseed
+    """
+    self.generator = np.random.default_rng(to_seed_sequence(seed))
+    self.buffer = []
+
+  def random(self) -> float:
+    """
+    [0, 1)の一様乱数を返す
+
+    Returns
+    -------
+    value : float
+      一様乱数
+    """
+    if not self.buffer:
+      self.buffer = self.generator.random(self.buffer_size).tolist()
+    return self.buffer.pop()
+
+  def randrange(self, n: int) -> int:
+    """
+    [0, n)の整数を一様に返す
+
+    Parameters
+    ----------
+    n : int
+      上限
+
+    Returns
+    -------
+    value : int
+      一様乱数
+    """
+    return min(int(self.random()*n), n-1)
+
+  def choice(self, seq: Sequence[T]) -> T:
+    """
+    seqから一様に要素を選択する
+
+    Parameters
+    ----------
+    seq : Sequence
+      選択元
+
+    Returns
+    -------
+    item
+      選択された要素
+    """
+    return seq[self.randrange(len(seq))]
+
+  def choice_weighted(self, p: Sequence[float]) -> int:
+    """
+    重みpに従ってインデックスを選択する
+
+    Parameters
+    ----------
+    p : Sequence[float]
+      各インデックスの重み, 正規化されていなくてもよい
+
+    Returns
+    -------
+    idx : int
+      選択されたインデックス
+    """
+    r = self.random()*sum(p)
+    acc = 0
+    for i, w in enumerate(p):
+      acc += w
+      if r < acc:
+        return i
+    return len(p)-1
@@ -12,7 +12,7 @@ setup(
   description='Package of creating othello AI for Minecraft datapack with reinforcement learning',
   long_description=readme,
   author='aka',
-  install_requires=['matplotlib', 'NBT'],
+  install_requires=['matplotlib', 'NBT', 'numpy'],
   url='https://github.com/aka256/othello-rl',
   license=license,
   packages=find_packages(exclude=('tests', 'docs'))
@@ -0,0 +1,26 @@
+import unittest
+from othello_rl.benchmark import compare, get_benchmarks, is_selected
+
+class TestBenchmark(unittest.TestCase):
+  def test_is_selected(self):
+    """
+    名前は完全一致, グループは'.'より前の部分で選択されるか
+    """
+    names = list(get_benchmarks())
+    self.assertEqual(['qtable.save1000'], [name for name in names if is_selected(name, ['qtable.save1000'])])
+    self.assertEqual(['search.minmax1'], [name for name in names if is_selected(name, ['search.minmax1'])])
+    self.assertEqual(4, len([name for name in names if is_selected(name, ['search'])]))
+
+  def test_compare_spread(self):
+    """
+    ばらつきの大きい計測では、threshold以上の低下でも性能の低下とみなさないか
+    """
+    baseline = {'results': {'a': {'value': 100.0, 'unit': 'nodes/s', 'samples': [100.0, 80.0, 70.0]}, 'b': {'value': 1.0, 'unit': 's', 'samples': [1.0, 1.0, 1.0]}}}
+    result = {'results': {'a': {'value': 85.0, 'unit': 'nodes/s', 'samples': [85.0, 80.0, 75.0]}, 'b': {'value': 1.2, 'unit': 's', 'samples': [1.2, 1.2, 1.2]}}}
+    comparison = {name: (speedup, is_regression) for name, speedup, _, is_regression in compare(result, baseline, 0.1)}
+    self.assertFalse(comparison['a'][1])
+    self.assertAlmostEqual(1/1.2, comparison['b'][0])
+    self.assertTrue(comparison['b'][1])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.board import OthelloBoard8x8
+
+class TestBoard(unittest.TestCase):
+  def test_legal_board_after_undo(self):
+    """
+    undoの後に別の手を打った場合も正しい合成手ボードが得られるか
+    """
+    agent = RandomAgent(0)
+    othello = OthelloBoard8x8(0)
+    while othello.get_next_state() != 2:
+      candidate_list = othello.get_candidate_list()
+      for x, y in candidate_list:
+        othello.reverse(x, y, False)
+        fresh = OthelloBoard8x8(0)
+        fresh.set_board(othello.board[0], othello.board[1])
+        self.assertEqual(fresh.get_legal_board(0), othello.get_legal_board(0))
+        self.assertEqual(fresh.get_legal_board(1), othello.get_legal_board(1))
+        othello.undo()
+      agent.step(othello)
+      if othello.get_next_state() == 0:
+        othello.change_player()
+
+  def test_result(self):
+    """
+    キャッシュされたゲームの結果が盤面に応じて変わるか
+    """
+    othello = OthelloBoard8x8(0)
+    self.assertEqual(-1, othello.get_result())
+    othello.set_board(0xffffffffffffffff, 0)
+    self.assertEqual(0, othello.get_result())
+    othello.set_board(0, 0xffffffffffffffff)
+    self.assertEqual(1, othello.get_result())
+
+if __name__ == '__main__':
+  unittest.main()
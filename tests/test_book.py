@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from othello_rl.othello.agent import MinMaxAgent, RandomAgent
+from othello_rl.othello.board import OthelloBoard4x4
+from othello_rl.othello.book import OpeningBook, build_book
+from othello_rl.othello.positional_evaluation import PositionalEvaluation4x4v1
+
+class CountingBook(OpeningBook):
+  def __init__(self, book: OpeningBook) -> None:
+    super().__init__(book.board_width, book.data, book.max_ply)
+    self.calls = []
+
+  def get_move(self, othello):
+    move = super().get_move(othello)
+    self.calls.append(move)
+    return move
+
+class TestOpeningBook(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.book = build_book(4, 3, PositionalEvaluation4x4v1(), 50, max_ply=4, min_count=1, seed=0)
+
+  def test_save_load(self):
+    """
+    書き出した定石を読み込めるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'book.npz')
+      self.book.save(path)
+      book = OpeningBook.load(path)
+    self.assertEqual(self.book.data, book.data)
+    self.assertEqual(4, book.max_ply)
+
+  def test_stop_after_miss(self):
+    """
+    定石を外れた後は参照せず、resetすると再び参照するか
+    """
+    book = CountingBook(self.book)
+    agent_list = [MinMaxAgent(2, PositionalEvaluation4x4v1(), book), RandomAgent(0)]
+    for _ in range(5):
+      book.calls = []
+      othello = OthelloBoard4x4(0)
+      for agent in agent_list:
+        agent.reset()
+      while True:
+        agent_list[othello.now_turn].step(othello)
+        next_state = othello.get_next_state()
+        if next_state == 0:
+          othello.change_player()
+        elif next_state == 2:
+          break
+      # 最後の1回だけが外れで、それ以前は全て定石の手
+      self.assertIsNone(book.calls[-1])
+      self.assertNotIn(None, book.calls[:-1])
+      self.assertLessEqual(len(book.calls), 3)
+
+    # resetしなければ、新しい局面でも定石を参照しない
+    book.calls = []
+    agent_list[0].step(OthelloBoard4x4(0))
+    self.assertEqual([], book.calls)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from othello_rl.bit_opperation import pop_count, DIHEDRAL_BM4, DIHEDRAL_BM8
+from othello_rl.othello.agent import MinMaxAgent, RandomAgent
+from othello_rl.othello.board import OthelloBoard4x4, OthelloBoard8x8
+from othello_rl.othello.features import Featuresv1, Featuresv3
+from othello_rl.othello.positional_evaluation import PositionalEvaluation8x8v2
+
+class TestFeaturesv1(unittest.TestCase):
+  def test_incremental_index(self):
+    """
+    差分で更新された特徴量が盤面から直接求めたものと一致するか
+    """
+    features = Featuresv1()
+    othello = OthelloBoard8x8(0)
+    agent = [RandomAgent(0), MinMaxAgent(3, PositionalEvaluation8x8v2())]
+    while True:
+      agent[othello.now_turn].step(othello)
+      a_piece_num = pop_count(othello.board[0])
+      b_piece_num = pop_count(othello.board[1])
+      a_corner = pop_count(othello.board[0] & 0x8100000000000081)
+      b_corner = pop_count(othello.board[1] & 0x8100000000000081)
+      index = a_corner + (b_corner << 3) + (abs(a_piece_num - b_piece_num) << 6) + ((64 - a_piece_num - b_piece_num) << 14)
+      self.assertEqual(index, features.get_index(othello))
+
+      next_state = othello.get_next_state()
+      if next_state == 0:
+        othello.change_player()
+      elif next_state == 2:
+        break
+
+class TestFeaturesv3(unittest.TestCase):
+  def __transformed(self, othello, transform):
+    """
+    othelloを対称変換した盤面を作成する
+    """
+    new_othello = type(othello)(othello.now_turn)
+    new_othello.set_board(transform(othello.board[0]), transform(othello.board[1]))
+    return new_othello
+
+  def __check(self, othello, transforms):
+    features = Featuresv3()
+    index = features.get_index(othello)
+    actions = {features.get_action(othello, x, y) for x, y in othello.get_candidate_list()}
+    for transform in transforms:
+      t_othello = self.__transformed(othello, transform)
+      self.assertEqual(index, features.get_index(t_othello))
+      t_actions = {features.get_action(t_othello, x, y) for x, y in t_othello.get_candidate_list()}
+      self.assertEqual(actions, t_actions)
+
+  def test_symmetric_positions_4x4(self):
+    """
+    対称な4x4の盤面が同じインデックスと行動の集合を持つか
+    """
+    othello = OthelloBoard4x4(0)
+    othello.reverse(0, 1)
+    othello.change_player()
+    self.__check(othello, DIHEDRAL_BM4)
+
+  def test_symmetric_positions_8x8(self):
+    """
+    対称な8x8の盤面が同じインデックスと行動の集合を持つか
+    """
+    othello = OthelloBoard8x8(0)
+    othello.reverse(2, 3)
+    othello.change_player()
+    othello.reverse(2, 2)
+    othello.change_player()
+    self.__check(othello, DIHEDRAL_BM8)
+
+  def test_initial_position(self):
+    """
+    初期盤面の4つの候補マスが同じ行動に写されるか
+    """
+    othello = OthelloBoard8x8(0)
+    features = Featuresv3()
+    actions = {features.get_action(othello, x, y) for x, y in othello.get_candidate_list()}
+    self.assertEqual(1, len(actions))
@@ -0,0 +1,149 @@
+import csv
+import gc
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import urllib.request
+import weakref
+from othello_rl.manager import metrics as metrics_module
+from othello_rl.manager.metrics import FIELDS, TrainingMetrics
+from othello_rl.manager.multi_precess import learn_mp
+from othello_rl.manager.othello import OthelloQLearningManager
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.features import Featuresv2
+from othello_rl.othello.reward import Rewardv1
+from othello_rl.qlearning.qlearning import ArrayQLearning, QLearning
+
+def make_stats(pid: int, result: int = 1, **kwargs) -> dict:
+  stats = {'pid': pid, 'result': result, 'plies': 10, 'updates': 5, 'time': 0.01}
+  stats.update(kwargs)
+  return stats
+
+class TestTrainingMetrics(unittest.TestCase):
+  def test_jsonl(self):
+    """
+    JSONLに追記され、max_bytesを超えると.1に移されるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'metrics.jsonl')
+      metrics = TrainingMetrics(path, max_bytes=1)
+      metrics.add_games([make_stats(1), make_stats(1, -1)])
+      metrics.snapshot()
+      metrics.add_game(make_stats(1))
+      metrics.snapshot()
+      metrics.close()
+
+      with open(path+'.1') as f:
+        first = [json.loads(line) for line in f]
+      with open(path) as f:
+        second = [json.loads(line) for line in f]
+    self.assertEqual(1, len(first))
+    self.assertEqual(2, first[0]['games'])
+    self.assertEqual(0.5, first[0]['win_rate'])
+    self.assertEqual(3, second[0]['games'])
+
+  def test_csv(self):
+    """
+    CSVのヘッダーが1度だけ書き出されるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'metrics.csv')
+      metrics = TrainingMetrics(path)
+      for _ in range(2):
+        metrics.add_game(make_stats(1))
+        metrics.snapshot()
+      metrics.close()
+
+      with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    self.assertEqual(FIELDS, reader.fieldnames)
+    self.assertEqual(['1', '2'], [row['games'] for row in rows])
+
+  def test_worker_processes(self):
+    """
+    ワーカーが報告したメモリ使用量とGCの回数が合計に含まれるか
+    """
+    metrics = TrainingMetrics()
+    metrics.add_game(make_stats(os.getpid()+1, memory_rss=1000, gc_collections=7))
+    metrics.add_game(make_stats(os.getpid()+2))
+    result = metrics.snapshot()
+    self.assertEqual(result['parent_memory_rss']+1000, result['memory_rss'])
+    self.assertEqual(2, result['worker_num'])
+    # 区間が終わると前の区間のワーカーの値は含まない
+    result = metrics.snapshot()
+    self.assertEqual(result['parent_memory_rss'], result['memory_rss'])
+    metrics.close()
+
+  def test_http(self):
+    """
+    HTTPサーバーが最新の計測結果を返すか
+    """
+    metrics = TrainingMetrics(http_port=0)
+    try:
+      metrics.add_game(make_stats(1))
+      metrics.snapshot()
+      with urllib.request.urlopen('http://127.0.0.1:{}/'.format(metrics.port)) as response:
+        body = json.loads(response.read())
+    finally:
+      metrics.close()
+    self.assertEqual(metrics.latest, body)
+    self.assertIsNone(metrics.port)
+
+  def test_gc_callback(self):
+    """
+    GCの計測がcloseやwith文の終了で外れ、closeしなくてもmetricsを保持し続けないか
+    """
+    n = len(gc.callbacks)
+    with TrainingMetrics() as metrics:
+      self.assertEqual(n+1, len(gc.callbacks))
+      gc.collect()
+      self.assertGreater(metrics.snapshot()['parent_gc_time'], 0)
+    self.assertEqual(n, len(gc.callbacks))
+
+    metrics = TrainingMetrics()
+    ref = weakref.ref(metrics)
+    del metrics
+    gc.collect()
+    self.assertIsNone(ref())
+    self.assertEqual(n, len(gc.callbacks))
+
+  def test_table_size(self):
+    """
+    ArrayQLearningのテーブルのサイズを辞書を作らずに求めるか
+    """
+    ql = ArrayQLearning(0.1, 0.9, {(0, 1): 0.5, (2, 3): 0.1})
+    ql.update(4, 5, 1.0, 0.0)
+    with mock.patch.object(ArrayQLearning, 'data', new_callable=mock.PropertyMock) as data:
+      with TrainingMetrics() as metrics:
+        self.assertEqual(3, metrics.snapshot(ql)['table_size'])
+    data.assert_not_called()
+    with TrainingMetrics() as metrics:
+      self.assertEqual(2, metrics.snapshot(QLearning(0.1, 0.9, {(0, 1): 0.5, (2, 3): 0.1}))['table_size'])
+
+  def test_learn_mp(self):
+    """
+    learn_mpでManagerのプロセスのメモリ使用量を含めて計測できるか
+    """
+    manager = OthelloQLearningManager(4, Featuresv2(), RandomAgent(), QLearning(0.1, 0.9, {}), Rewardv1(), 'e', [0.1])
+    pids = []
+    original = metrics_module.get_memory_rss
+    def get_memory_rss(pid: int = None) -> int:
+      pids.append(pid)
+      return original(pid)
+    with tempfile.TemporaryDirectory() as d, TrainingMetrics() as metrics, \
+        mock.patch('othello_rl.manager.metrics.get_memory_rss', side_effect=get_memory_rss):
+      learn_mp(1, 20, manager, d+'/', 'ql.json', save_interval=1, seed=0, metrics=metrics)
+    result = metrics.history[-1]
+    self.assertEqual(20, result['games'])
+    self.assertEqual(len(manager.ql.data), result['table_size'])
+    # 親, ワーカー, Managerの3つのプロセスの合計
+    self.assertGreater(result['memory_rss'], result['parent_memory_rss'])
+    manager_pids = [pid for pid in pids if pid is not None]
+    self.assertEqual(1, len(manager_pids))
+    self.assertNotEqual(os.getpid(), manager_pids[0])
+
+if __name__ == '__main__':
+  unittest.main()
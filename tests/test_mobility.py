@@ -0,0 +1,115 @@
+import random
+import unittest
+from unittest import mock
+from othello_rl.othello.board import OthelloBoard, OthelloBoard4x4, OthelloBoard8x8
+from othello_rl.othello.mobility import MobilityEvaluation, get_mobility_terms
+
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+def get_cells(othello: OthelloBoard) -> list[list[int]]:
+  """
+  マス毎に-1(空白), 0(player0), 1(player1)とした盤面
+  """
+  width = othello.board_width
+  cells = [[-1]*width for _ in range(width)]
+  for x in range(width):
+    for y in range(width):
+      bit = 1 << (width*x+y)
+      if othello.board[0] & bit:
+        cells[x][y] = 0
+      elif othello.board[1] & bit:
+        cells[x][y] = 1
+  return cells
+
+def get_neighbors(width: int, x: int, y: int) -> list[tuple[int, int]]:
+  return [(x+dx, y+dy) for dx, dy in DIRECTIONS if 0 <= x+dx < width and 0 <= y+dy < width]
+
+def can_put(cells: list[list[int]], player_num: int, x: int, y: int) -> bool:
+  width = len(cells)
+  if cells[x][y] != -1:
+    return False
+  for dx, dy in DIRECTIONS:
+    i, j = x+dx, y+dy
+    n = 0
+    while 0 <= i < width and 0 <= j < width and cells[i][j] == 1-player_num:
+      i, j = i+dx, j+dy
+      n += 1
+    if n > 0 and 0 <= i < width and 0 <= j < width and cells[i][j] == player_num:
+      return True
+  return False
+
+def get_naive_terms(othello: OthelloBoard) -> tuple[int, int, int]:
+  """
+  マス毎に数えた着手可能数, 潜在的着手可能数, 開放度
+  """
+  cells = get_cells(othello)
+  width = othello.board_width
+  squares = [(x, y) for x in range(width) for y in range(width)]
+  mobility = [sum(can_put(cells, p, x, y) for x, y in squares) for p in range(2)]
+  # player pのコマに隣接する空白マスの数
+  adjacent_blank = [sum(cells[x][y] == -1 and any(cells[i][j] == p for i, j in get_neighbors(width, x, y)) for x, y in squares) for p in range(2)]
+  # 空白マスに隣接するplayer pのコマの数
+  frontier = [sum(cells[x][y] == p and any(cells[i][j] == -1 for i, j in get_neighbors(width, x, y)) for x, y in squares) for p in range(2)]
+  return mobility[0]-mobility[1], adjacent_blank[1]-adjacent_blank[0], frontier[0]-frontier[1]
+
+def make_random_board(othello: OthelloBoard, rng: random.Random) -> None:
+  """
+  ランダムな盤面にする, 端のマスにはなるべくコマを置く
+  """
+  width = othello.board_width
+  board = [0, 0]
+  for x in range(width):
+    for y in range(width):
+      is_edge = x in (0, width-1) or y in (0, width-1)
+      r = rng.random()
+      if r < (0.4 if is_edge else 0.3):
+        board[0] |= 1 << (width*x+y)
+      elif r < (0.8 if is_edge else 0.6):
+        board[1] |= 1 << (width*x+y)
+  othello.set_board(board[0], board[1])
+
+class TestMobility(unittest.TestCase):
+  def test_terms_same_as_naive(self):
+    """
+    ビット演算で求めた各項がマス毎に数えた値と一致するか
+    """
+    rng = random.Random(0)
+    for othello in [OthelloBoard4x4(0), OthelloBoard8x8(0)]:
+      for _ in range(300):
+        make_random_board(othello, rng)
+        self.assertEqual(get_naive_terms(othello), get_mobility_terms(othello))
+
+  def test_edge_wraparound(self):
+    """
+    端のコマが反対側の端に隣接するとみなされないか
+    """
+    for othello in [OthelloBoard4x4(0), OthelloBoard8x8(0)]:
+      width = othello.board_width
+      last = width-1
+      for x, y in [(0, 0), (0, last), (last, 0), (last, last), (0, 1), (1, 0), (last, 1), (1, last)]:
+        othello.set_board(1 << (width*x+y), 0)
+        self.assertEqual(get_naive_terms(othello), get_mobility_terms(othello))
+        othello.set_board(0, 1 << (width*x+y))
+        self.assertEqual(get_naive_terms(othello), get_mobility_terms(othello))
+        # 端の1列をplayer0, 残りを空白
+        column = sum(1 << (width*i+y) for i in range(width))
+        othello.set_board(column, 0)
+        self.assertEqual(get_naive_terms(othello), get_mobility_terms(othello))
+
+  def test_phase(self):
+    """
+    空の盤面で序盤の重み、埋まった盤面で終盤の重みを用いるか
+    """
+    evaluation = MobilityEvaluation(mobility=(10, 4), potential_mobility=(4, 1), frontier=(-4, -1))
+    with mock.patch('othello_rl.othello.mobility.get_mobility_terms', return_value=(1, 10, 100)):
+      for othello in [OthelloBoard4x4(0), OthelloBoard8x8(0)]:
+        full = (1 << othello.board_width**2)-1
+        othello.set_board(0, 0)
+        self.assertAlmostEqual(10+4*10-4*100, evaluation.eval(othello))
+        othello.set_board(full, 0)
+        self.assertAlmostEqual(4+1*10-1*100, evaluation.eval(othello))
+        othello.set_board(full & 0x5555555555555555, full & 0xaaaaaaaaaaaaaaaa)
+        self.assertAlmostEqual(-(4+1*10-1*100), evaluation.eval(othello, True))
+
+if __name__ == '__main__':
+  unittest.main()
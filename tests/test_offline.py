@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from othello_rl.manager.offline import OfflineQLearningTrainer, make_trajectories
+from othello_rl.manager.othello import OthelloQLearningManager
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.features import Featuresv1, Featuresv2
+from othello_rl.othello.reward import Rewardv1
+from othello_rl.qlearning.qlearning import QLearning
+from othello_rl.record import GameRecorder, GameRecordReader, replay_game
+
+class RecordingQLearning(QLearning):
+  """
+  updateに渡された(s, a, r)を記録するQLearning
+  """
+  def __init__(self, *args, **kwargs) -> None:
+    super().__init__(*args, **kwargs)
+    self.updates = []
+
+  def update(self, s: int, a: int, r: float, q: float, *q_old: float, weight: float = 1.0) -> float:
+    self.updates.append([s, a, r])
+    return super().update(s, a, r, q, *q_old, weight=weight)
+
+class TestOffline(unittest.TestCase):
+  def record_games(self, d: str, features_class: type, game_num: int = 200, do_from_opponent: bool = True) -> tuple[str, list, dict]:
+    """
+    learn_one_gameで学習しながら棋譜を記録する
+
+    Returns
+    -------
+    path : str
+      棋譜ファイルの場所
+    trajectories : list[list[list]]
+      各ゲームで学習に用いた[s, a, r]のリスト
+    data : dict
+      学習後のQ値のテーブル
+    """
+    path = os.path.join(d, 'games.bin')
+    recorder = GameRecorder(path, 4)
+    ql = RecordingQLearning(0.1, 0.9, {})
+    manager = OthelloQLearningManager(4, features_class(), RandomAgent(0), ql, Rewardv1(), 'e', [0.1], seed=0, recorder=recorder)
+    trajectories = []
+    for i in range(game_num):
+      manager.learn_one_game(do_from_opponent, seed=i)
+      # 終局側から更新するので逆順にする
+      trajectories.append(ql.updates[::-1])
+      ql.updates = []
+    recorder.close()
+    return path, trajectories, dict(ql.data)
+
+  def test_make_trajectories(self):
+    """
+    棋譜から作り直した(s, a, r)の列が学習時と一致するか
+    """
+    for do_from_opponent in [True, False]:
+      ql_num = 1 if do_from_opponent else 0
+      with tempfile.TemporaryDirectory() as d:
+        path, trajectories, _ = self.record_games(d, Featuresv2, do_from_opponent=do_from_opponent)
+        records = [record for chunk in GameRecordReader(path).iter_chunks(1000) for record in chunk]
+      self.assertEqual(trajectories, make_trajectories(Featuresv2(), Rewardv1(), [ql_num], 4, records))
+
+      # パスを含む対局と、相手の着手で終局して最後の報酬を終局時の値で上書きする対局が含まれているか
+      has_pass = False
+      has_override = False
+      for record in records:
+        turns = [othello.now_turn for othello, _, _ in replay_game(record, 4)]
+        has_pass |= any(t0 == t1 for t0, t1 in zip(turns, turns[1:]))
+        has_override |= turns[-1] != ql_num
+      self.assertTrue(has_pass)
+      self.assertTrue(has_override)
+
+  def test_same_as_online(self):
+    """
+    棋譜から学習したQ値のテーブルが学習時と一致するか
+    """
+    for features_class in [Featuresv1, Featuresv2]:
+      with tempfile.TemporaryDirectory() as d:
+        path, _, data = self.record_games(d, features_class)
+        trainer = OfflineQLearningTrainer(features_class(), QLearning(0.1, 0.9, {}), Rewardv1(), ql_num=1)
+        trainer.learn_file(path, chunk_size=64)
+      self.assertEqual(data, trainer.ql.data)
+
+  def test_pool(self):
+    """
+    Poolを用いても同じ結果になるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      path, trajectories, data = self.record_games(d, Featuresv2)
+      trainer = OfflineQLearningTrainer(Featuresv2(), QLearning(0.1, 0.9, {}), Rewardv1(), ql_num=1)
+      trainer.learn_file(path, chunk_size=16, pool_size=2)
+    self.assertEqual(data, trainer.ql.data)
+    self.assertEqual(sum(len(trajectory) for trajectory in trajectories), trainer.update_count)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from othello_rl.bit_opperation import DIHEDRAL_BM8
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.board import OthelloBoard8x8
+from othello_rl.othello.pattern import PatternFeatures
+
+def make_board(squares_0: list[tuple[int, int]], squares_1: list[tuple[int, int]]) -> OthelloBoard8x8:
+  othello = OthelloBoard8x8(0)
+  othello.set_board(sum(1 << (x*8+y) for x, y in squares_0), sum(1 << (x*8+y) for x, y in squares_1))
+  return othello
+
+class TestPatternFeatures(unittest.TestCase):
+  def test_known_index(self):
+    """
+    既知の局面のインデックスが手計算の値と一致するか
+    """
+    # diagonal_4: (0, 4), (1, 5), (2, 6), (3, 7)が3^0, 3^1, 3^2, 3^3の桁
+    # player0が(0, 4), player1が(1, 5)なので1*1+2*3=7, 逆順に読むと1*27+2*9=45なので小さい方の7
+    features = PatternFeatures(['diagonal_4'])
+    othello = make_board([(0, 4)], [(1, 5)])
+    self.assertEqual([0, 0, 0, 7], sorted(features.get_indices(othello)))
+
+    # corner_3x3: (0, 1)は3^1の桁, 対角線で折り返すと(1, 0)で3^3の桁
+    # 3^0の桁(0, 0)がplayer1なので2+3=5と2+27=29の小さい方の5
+    features = PatternFeatures(['corner_3x3'])
+    othello = make_board([(0, 1)], [(0, 0)])
+    self.assertEqual([0, 0, 0, 5], sorted(features.get_indices(othello)))
+
+    # edge_2x: 3^0の桁(0, 0)がplayer0, 3^9の桁(1, 6)がplayer1で1+2*3^9
+    # 左右に折り返すと(0, 7)が3^7, (1, 1)が3^8の桁なので3^7+2*3^8の方が小さい
+    # 2つ目のパターンの重みは3^10から始まる
+    features = PatternFeatures(['edge_2x', 'diagonal_5'])
+    othello = make_board([(0, 0)], [(1, 6)])
+    self.assertIn(3**7+2*3**8, features.get_indices(othello))
+    self.assertNotIn(1+2*3**9, features.get_indices(othello))
+    self.assertEqual(3**10, features.offset['diagonal_5'])
+
+  def test_symmetry(self):
+    """
+    対称変換で写した局面のインデックスが元の局面と一致するか
+    """
+    features = PatternFeatures()
+    othello = OthelloBoard8x8(0)
+    agent = RandomAgent(0)
+    while True:
+      agent.step(othello)
+      expected = sorted(features.get_indices(othello))
+      for transform in DIHEDRAL_BM8:
+        transformed = OthelloBoard8x8(othello.now_turn)
+        transformed.set_board(transform(othello.board[0]), transform(othello.board[1]))
+        self.assertEqual(expected, sorted(features.get_indices(transformed)))
+
+      next_state = othello.get_next_state()
+      if next_state == 0:
+        othello.change_player()
+      elif next_state == 2:
+        break
+
+if __name__ == '__main__':
+  unittest.main()
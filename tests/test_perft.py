@@ -0,0 +1,96 @@
+import unittest
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.perft import PERFT_8X8, make_position, perft
+
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+def naive_moves(board: list[list[int]], player: int) -> list[tuple[int, int, list[tuple[int, int]]]]:
+  """
+  盤面を1マスずつ調べて(x, y, 裏返るマス)のリストを求める
+  """
+  width = len(board)
+  retval = []
+  for x in range(width):
+    for y in range(width):
+      if board[x][y] != -1:
+        continue
+      flips = []
+      for dx, dy in DIRECTIONS:
+        line = []
+        i, j = x+dx, y+dy
+        while 0 <= i < width and 0 <= j < width and board[i][j] == 1-player:
+          line.append((i, j))
+          i, j = i+dx, j+dy
+        if line and 0 <= i < width and 0 <= j < width and board[i][j] == player:
+          flips.extend(line)
+      if flips:
+        retval.append((x, y, flips))
+
+  return retval
+
+def naive_perft(board: list[list[int]], player: int, depth: int) -> int:
+  """
+  perftの素朴な実装
+  """
+  if depth == 0:
+    return 1
+  moves = naive_moves(board, player)
+  if not moves:
+    if not naive_moves(board, 1-player):
+      return 1
+    return naive_perft(board, 1-player, depth-1)
+
+  retval = 0
+  for x, y, flips in moves:
+    new_board = [row[:] for row in board]
+    new_board[x][y] = player
+    for i, j in flips:
+      new_board[i][j] = player
+    retval += naive_perft(new_board, 1-player, depth-1)
+
+  return retval
+
+def to_board(othello) -> list[list[int]]:
+  width = othello.board_width
+  board = [[-1]*width for _ in range(width)]
+  for p in range(2):
+    for k in range(width**2):
+      if othello.board[p] >> k & 1:
+        board[k//width][k%width] = p
+
+  return board
+
+class TestPerft(unittest.TestCase):
+  def test_initial_8x8(self):
+    """
+    8x8の初期盤面からの局面数が既知の値と一致するか
+    """
+    othello = make_position(8)
+    for depth in range(1, 7):
+      self.assertEqual(PERFT_8X8[depth], perft(othello, depth))
+
+  def test_naive_4x4(self):
+    """
+    4x4の全ての局面数が素朴な実装と一致するか
+    """
+    othello = make_position(4)
+    board = to_board(othello)
+    for depth in range(1, 11):
+      self.assertEqual(naive_perft(board, 0, depth), perft(othello, depth))
+
+  def test_naive_midgame(self):
+    """
+    8x8の途中の局面からの局面数が素朴な実装と一致するか
+    """
+    agent = RandomAgent(1)
+    othello = make_position(8)
+    for _ in range(20):
+      agent.step(othello)
+      othello.change_player()
+      if len(othello.get_candidate_list()) == 0:
+        break
+    position = make_position(8, othello.board[0], othello.board[1], othello.now_turn)
+    self.assertEqual(naive_perft(to_board(position), position.now_turn, 3), perft(position, 3))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.board import OthelloBoard4x4, OthelloBoard8x8
+from othello_rl.othello.positional_evaluation import PositionalEvaluation4x4v1, PositionalEvaluation4x4v2, PositionalEvaluation8x8v1, PositionalEvaluation8x8v2, MaskPositionalEvaluation, TablePositionalEvaluation, boards_to_array
+
+def naive_eval(weight: list[list[int]], othello, count_occupied: bool = False) -> int:
+  """
+  マス毎に重みを足し合わせた評価値
+  """
+  width = len(weight)
+  retval = 0
+  idx = 1
+  for i in range(width):
+    for j in range(width):
+      if othello.board[0] & idx:
+        retval += weight[i][j]
+      elif othello.board[1] & idx:
+        retval += weight[i][j] if count_occupied else -weight[i][j]
+      idx <<= 1
+  return retval
+
+class TestWeightEvaluation(unittest.TestCase):
+  def test_same_as_naive(self):
+    """
+    マスクや行毎の表による評価値がマス毎に足し合わせた値と一致するか
+    """
+    rng = random.Random(0)
+    cases = [
+      (OthelloBoard8x8, [PositionalEvaluation8x8v1(), PositionalEvaluation8x8v2(), TablePositionalEvaluation(PositionalEvaluation8x8v1.weight), TablePositionalEvaluation(PositionalEvaluation8x8v2.weight)]),
+      (OthelloBoard4x4, [PositionalEvaluation4x4v1(), MaskPositionalEvaluation(PositionalEvaluation4x4v2.weight), TablePositionalEvaluation(PositionalEvaluation4x4v2.weight)]),
+    ]
+    for board_class, evaluations in cases:
+      othello = board_class(0)
+      n = othello.board_width**2
+      for _ in range(200):
+        board_0 = rng.getrandbits(n)
+        board_1 = rng.getrandbits(n) & ~board_0
+        othello.set_board(board_0, board_1)
+        for evaluation in evaluations:
+          expected = naive_eval(evaluation.weight, othello, evaluation.count_occupied)
+          self.assertEqual(expected, evaluation.eval(othello))
+          self.assertEqual(-expected, evaluation.eval(othello, True))
+
+class TestEvalBatch(unittest.TestCase):
+  def test_same_as_eval(self):
+    """
+    eval_batchが1局面ずつのevalと一致するか
+    """
+    cases = [
+      (OthelloBoard8x8, [PositionalEvaluation8x8v1(), PositionalEvaluation8x8v2(), TablePositionalEvaluation(PositionalEvaluation8x8v1.weight)]),
+      (OthelloBoard4x4, [PositionalEvaluation4x4v1(), PositionalEvaluation4x4v2()]),
+    ]
+    for board_class, evaluations in cases:
+      othello = board_class(0)
+      agent = RandomAgent(0)
+      positions = []
+      while True:
+        agent.step(othello)
+        position = board_class(0)
+        position.set_board(othello.board[0], othello.board[1])
+        positions.append(position)
+        next_state = othello.get_next_state()
+        if next_state == 0:
+          othello.change_player()
+        elif next_state == 2:
+          break
+
+      boards = boards_to_array(positions)
+      for evaluation in evaluations:
+        for reverse_eval in [False, True]:
+          expected = [evaluation.eval(position, reverse_eval) for position in positions]
+          self.assertEqual(expected, evaluation.eval_batch(boards, reverse_eval).tolist())
+
+if __name__ == '__main__':
+  unittest.main()
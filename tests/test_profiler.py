@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import signal
+import tempfile
+import unittest
+from unittest import mock
+from othello_rl import profiler
+
+class TestProfiler(unittest.TestCase):
+  def test_disabled(self):
+    """
+    無効な場合は関数をそのまま返すか
+    """
+    def func(x):
+      return x+1
+    with mock.patch.object(profiler, 'ENABLED', False), mock.patch.object(profiler, '_stats', {}):
+      self.assertIs(func, profiler.profile(func))
+      self.assertIs(func, profiler.profile(name='func')(func))
+      self.assertEqual({}, profiler.get_stats())
+
+  def test_enabled(self):
+    """
+    有効な場合に呼び出し回数と時間を記録し、書き出した結果をまとめられるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'prof')
+      with mock.patch.object(profiler, 'ENABLED', True), mock.patch.object(profiler, 'PROFILE_PATH', path), \
+          mock.patch.object(profiler, 'SAMPLE_INTERVAL', 2), mock.patch.object(profiler, '_stats', {}):
+        func = profiler.profile(lambda x: x+1, name='Agent.step')
+        self.assertEqual([2, 3, 4, 5, 6], [func(i) for i in range(1, 6)])
+        calls, sampled, sampled_time = profiler.get_stats()['Agent.step']
+        self.assertEqual(5, calls)
+        self.assertEqual(2, sampled)
+        self.assertGreater(sampled_time, 0)
+
+        profiler.dump()
+        # 別のプロセスの結果として同じ内容を書き出し、まとめた結果が2倍になるか
+        os.replace('{}.{}.json'.format(path, os.getpid()), path+'.0.json')
+        profiler.dump()
+        self.assertEqual([10, 4], profiler.load_stats(path)['Agent.step'][:2])
+
+  def test_fork(self):
+    """
+    forkした子プロセスが親の計測結果を引き継がないか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'prof')
+      with mock.patch.object(profiler, 'ENABLED', True), mock.patch.object(profiler, 'PROFILE_PATH', path), \
+          mock.patch.object(profiler, '_stats', {}):
+        func = profiler.profile(lambda: None, name='func')
+        for _ in range(5):
+          func()
+
+        def child():
+          func()
+          func()
+          profiler.dump()
+        process = multiprocessing.get_context('fork').Process(target=child)
+        process.start()
+        process.join()
+        self.assertEqual(0, process.exitcode)
+        profiler.dump()
+        self.assertEqual(7, profiler.load_stats(path)['func'][0])
+
+  def test_init_worker(self):
+    """
+    SIGTERMの処理はinit_workerでのみ変更するか
+    """
+    handler = signal.getsignal(signal.SIGTERM)
+    try:
+      with mock.patch.object(profiler, 'ENABLED', False):
+        profiler.init_worker()
+      self.assertIs(handler, signal.getsignal(signal.SIGTERM))
+      with mock.patch.object(profiler, 'ENABLED', True):
+        profiler.init_worker()
+      self.assertEqual(profiler._on_sigterm, signal.getsignal(signal.SIGTERM))
+    finally:
+      signal.signal(signal.SIGTERM, handler)
+
+  def test_format_report(self):
+    """
+    推定合計時間の順に並び、1手あたりの値をstepの回数から求めるか
+    """
+    stats = {'Agent.step': [10, 5, 0.5], 'OthelloBoard.reverse': [100, 10, 0.01]}
+    lines = profiler.format_report(stats).split('\n')
+    self.assertEqual(3, len(lines))
+    self.assertEqual(['name', 'calls', 'total(s)', 'call(us)', 'calls/ply', 'ply(us)'], lines[0].split())
+    self.assertEqual(['Agent.step', '10', '1.000', '100000.00', '1.00', '100000.00'], lines[1].split())
+    self.assertEqual(['OthelloBoard.reverse', '100', '0.100', '1000.00', '10.00', '10000.00'], lines[2].split())
+
+if __name__ == '__main__':
+  unittest.main()
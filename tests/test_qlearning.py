@@ -0,0 +1,165 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from othello_rl.file import parse_ql_json
+from othello_rl.othello.agent import PerfectAgent, RandomAgent
+from othello_rl.othello.board import OthelloBoard8x8
+from othello_rl.othello.features import Featuresv2, Featuresv3
+from othello_rl.othello.solver import PerfectPlayTable
+from othello_rl.qlearning import test as ql_test
+from othello_rl.qlearning.checkpoint import CheckpointLoader
+from othello_rl.qlearning.qlearning import ArrayQLearning, QLearning, get_lambda_returns
+from othello_rl.qlearning.replay_buffer import ReplayBuffer
+
+class TestArrayQLearning(unittest.TestCase):
+  def test_update_same_as_qlearning(self):
+    """
+    updateがQLearningと同じ値になるか
+    """
+    ql = QLearning(0.1, 0.9, {}, 0.5)
+    array_ql = ArrayQLearning(0.1, 0.9, None, 0.5, capacity=2)
+    for i in range(50):
+      s, a, r, q = i%7, i%3, (i%5)-2, i/10
+      self.assertAlmostEqual(ql.update(s, a, r, q), array_ql.update(s, a, r, q))
+    self.assertEqual(ql.data.keys(), array_ql.data.keys())
+    for k, v in ql.data.items():
+      self.assertAlmostEqual(v, array_ql.data[k])
+
+  def test_update_batch_duplicate(self):
+    """
+    バッチ内の重複した(状態, 行動)が更新後の値の平均になるか
+    """
+    array_ql = ArrayQLearning(0.5, 1.0, {(1, 2): 1.0})
+    q_new = array_ql.update_batch([1, 1, 3], [2, 2, 4], np.array([1.0, 3.0, 2.0]), np.zeros(3))
+    self.assertAlmostEqual(1.5, array_ql.get(1, 2))
+    self.assertAlmostEqual(1.0, array_ql.get(3, 4))
+    np.testing.assert_allclose([1.5, 1.5, 1.0], q_new)
+    np.testing.assert_allclose([1.5, 1.0, 0.0], array_ql.get_batch([1, 3, 5], [2, 4, 6]))
+
+class TestLambdaReturns(unittest.TestCase):
+  def test_recursive(self):
+    """
+    λ収益が再帰的な定義と一致するか
+    """
+    r = np.array([0.0, 0.5, -1.0, 2.0])
+    q_next = np.array([0.3, -0.2, 0.7, 0.0])
+    gamma = 0.9
+    for lam in [0.0, 0.6, 1.0]:
+      expected = [0.0]*4
+      g = 0.0
+      for t in range(3, -1, -1):
+        g = r[t] + gamma*((1-lam)*q_next[t] + lam*g) if t < 3 else r[t]
+        expected[t] = g
+      np.testing.assert_allclose(expected, get_lambda_returns(r, q_next, gamma, lam))
+
+  def test_update_trajectory(self):
+    """
+    QLearningとArrayQLearningのupdate_trajectoryが同じ値になるか
+    """
+    ql = QLearning(0.1, 0.9, {(0, 1): 0.4, (2, 3): -0.3})
+    array_ql = ArrayQLearning(0.1, 0.9, {(0, 1): 0.4, (2, 3): -0.3})
+    s, a, r = [0, 2, 4], [1, 3, 5], [0.0, 0.0, 1.0]
+    np.testing.assert_allclose(ql.update_trajectory(s, a, r, 0.8), array_ql.update_trajectory(s, a, r, 0.8))
+    for k, v in ql.data.items():
+      self.assertAlmostEqual(v, array_ql.get(*k))
+
+class TestCheckpointLoader(unittest.TestCase):
+  def test_cache(self):
+    """
+    各チェックポイントを一度だけ読み込み、上限を超えた分は破棄されるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      paths = []
+      for i in range(3):
+        paths.append(os.path.join(d, '{}.json'.format(i)))
+        with open(paths[-1], 'w') as f:
+          json.dump({str((i, j)): i+j/10 for j in range(10)}, f)
+
+      with CheckpointLoader(paths, max_bytes=1024**3) as loader:
+        for _ in range(2):
+          for i, data in enumerate(loader):
+            self.assertEqual(parse_ql_json(paths[i]), data)
+        self.assertEqual(3, loader.load_count)
+
+      # 既定では直近のテーブルのみを保持するので、2周目は読み込み直す
+      with CheckpointLoader(paths) as loader:
+        for _ in range(2):
+          for i, data in enumerate(loader):
+            self.assertEqual(parse_ql_json(paths[i]), data)
+        self.assertEqual(6, loader.load_count)
+        loader.get(2)
+        self.assertEqual(6, loader.load_count)
+
+      with CheckpointLoader(paths, max_bytes=0, prefetch=False) as loader:
+        loader.get(0)
+        loader.get(1)
+        loader.get(0)
+        self.assertEqual(3, loader.load_count)
+
+class TestReplayBuffer(unittest.TestCase):
+  def test_8x8_index(self):
+    """
+    8x8のFeaturesv2, v3の状態を保存して取り出せるか
+    """
+    othello = OthelloBoard8x8(0)
+    agent = RandomAgent(0)
+    for _ in range(20):
+      agent.step(othello)
+      othello.change_player()
+    for features in [Featuresv2(), Featuresv3()]:
+      buffer = ReplayBuffer(4)
+      s = features.get_index(othello)
+      self.assertGreater(s, 1 << 64)
+      buffer.add(s, 1, 0.5, s+1, 2, False)
+      self.assertEqual(s, buffer.s[0])
+      self.assertEqual(s+1, buffer.s_next[0])
+
+      ql = ArrayQLearning(0.1, 0.9)
+      buffer.replay(ql, 1)
+      self.assertIn((s, 1), ql.data)
+
+  def test_wraparound(self):
+    """
+    capacityを超えた場合に古い遷移から上書きされるか
+    """
+    buffer = ReplayBuffer(3)
+    for i in range(5):
+      buffer.add(i, i, float(i), 0, 0, True)
+    self.assertEqual(3, len(buffer))
+    self.assertEqual(2, buffer.position)
+    self.assertEqual([3, 4, 2], buffer.s.tolist())
+
+  def test_prioritized_sampling(self):
+    """
+    優先度の高い遷移ほど多くサンプリングされ、重要度重みが小さくなるか
+    """
+    buffer = ReplayBuffer(4, prioritized=True, alpha=1.0, beta=1.0, epsilon=0.0, seed=0)
+    for i in range(4):
+      buffer.add(i, 0, 0.0, 0, 0, True)
+    buffer.update_priorities(np.arange(4), np.array([1.0, 1.0, 1.0, 7.0]))
+    self.assertEqual(7.0, buffer.max_priority)
+
+    indices, weights = buffer.sample(10000)
+    self.assertAlmostEqual(0.7, np.mean(indices == 3), delta=0.03)
+    self.assertAlmostEqual(1.0, weights[indices != 3].max())
+    self.assertAlmostEqual(1/7, weights[indices == 3].max())
+
+class TestSprtTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.table = PerfectPlayTable()
+    cls.table.solve()
+
+  def test_sprt(self):
+    """
+    明らかに強いagentの評価が早期に打ち切られるか
+    """
+    result, status = ql_test.sprt_test(4, PerfectAgent(self.table), RandomAgent(0), 1000, batch_size=20, order_type=1)
+    self.assertEqual(1, status)
+    self.assertLess(sum(result), 1000)
+    self.assertEqual(0, result[1])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.qlearning import test as ql_test
+from othello_rl.record import GameRecorder, GameRecordReader, replay_game
+
+class TestRecord(unittest.TestCase):
+  def test_round_trip(self):
+    """
+    記録した棋譜を再生すると同じ結果になるか
+    """
+    for board_size in [4, 8]:
+      with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'games.bin')
+        recorder = GameRecorder(path, board_size)
+        result_list = [ql_test.tester(board_size, RandomAgent(i), RandomAgent(i+100), i%2 == 0, recorder) for i in range(20)]
+        recorder.close()
+
+        reader = GameRecordReader(path)
+        self.assertEqual(20, len(reader))
+        self.assertEqual(board_size, reader.board_size)
+        records = [record for chunk in reader.iter_chunks(7) for record in chunk]
+        for result, record in zip(result_list, records):
+          self.assertEqual(result, record['result'])
+          othello = None
+          for othello, x, y in replay_game(record, board_size):
+            self.assertIn([x, y], othello.get_candidate_list())
+          self.assertEqual(2, othello.get_next_state())
+          self.assertEqual(result, othello.get_result())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,129 @@
+import tempfile
+import unittest
+from othello_rl.manager.multi_precess import learn_mp
+from othello_rl.manager.othello import OthelloQLearningManager
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.board import OthelloBoard4x4
+from othello_rl.othello.features import Featuresv2
+from othello_rl.othello.reward import Rewardv1
+from othello_rl.qlearning.qlearning import QLearning
+from othello_rl.rng import RandomStream, spawn_seeds
+
+def play_random_game(agent1: RandomAgent, agent2: RandomAgent) -> list[tuple[int, int]]:
+  """
+  RandomAgent同士で1ゲーム行い、着手のリストを返す
+  """
+  othello = OthelloBoard4x4(0)
+  agent = [agent1, agent2]
+  while True:
+    agent[othello.now_turn].step(othello)
+    next_state = othello.get_next_state()
+    if next_state == 0:
+      othello.change_player()
+    elif next_state == 2:
+      return [(data['x'], data['y']) for data in othello.past_data]
+
+def make_manager(epsilon: float = 0.1) -> OthelloQLearningManager:
+  # 相手のagentはseedを指定せず、learnのseedのみで再現されるか確かめる
+  return OthelloQLearningManager(4, Featuresv2(), RandomAgent(), QLearning(0.1, 0.9, {}), Rewardv1(), 'e', [epsilon])
+
+class TestRandomStream(unittest.TestCase):
+  def test_deterministic(self):
+    """
+    同じseedから同じ乱数列が得られるか
+    """
+    # buffer_sizeを跨いでも一致するか
+    rng1 = RandomStream(0, buffer_size=8)
+    rng2 = RandomStream(0, buffer_size=8)
+    self.assertEqual([rng1.random() for _ in range(20)], [rng2.random() for _ in range(20)])
+    rng1.seed(1)
+    rng2.seed(1)
+    self.assertEqual([rng1.randrange(10) for _ in range(20)], [rng2.randrange(10) for _ in range(20)])
+
+  def test_spawn(self):
+    """
+    1つのseedから生成した子の乱数列が互いに異なるか
+    """
+    values = [tuple(RandomStream(seed).random() for _ in range(4)) for seed in spawn_seeds(0, 50)]
+    self.assertEqual(50, len(set(values)))
+    self.assertEqual([s.entropy for s in spawn_seeds(0, 3)], [s.entropy for s in spawn_seeds(0, 3)])
+    self.assertEqual([s.spawn_key for s in spawn_seeds(0, 3)], [s.spawn_key for s in spawn_seeds(0, 3)])
+
+  def test_choice_weighted(self):
+    """
+    choice_weightedが重みの比に従って選択するか
+    """
+    rng = RandomStream(0)
+    p = [1, 0, 3, 6]
+    n = 20000
+    counts = [0]*len(p)
+    for _ in range(n):
+      counts[rng.choice_weighted(p)] += 1
+    self.assertEqual(0, counts[1])
+    for count, w in zip(counts, p):
+      self.assertAlmostEqual(w/sum(p), count/n, delta=0.02)
+
+class TestRandomAgent(unittest.TestCase):
+  def test_deterministic(self):
+    """
+    同じseedのRandomAgentが同じ着手を選び、set_seedでやり直せるか
+    """
+    game = play_random_game(RandomAgent(0), RandomAgent(1))
+    self.assertEqual(game, play_random_game(RandomAgent(0), RandomAgent(1)))
+    agent1 = RandomAgent()
+    agent2 = RandomAgent()
+    agent1.set_seed(0)
+    agent2.set_seed(1)
+    self.assertEqual(game, play_random_game(agent1, agent2))
+
+  def test_spawned_games(self):
+    """
+    1つのseedから生成したseedで行ったゲームが互いに異なるか
+    """
+    games = set()
+    for seed in spawn_seeds(0, 30):
+      seed1, seed2 = seed.spawn(2)
+      games.add(tuple(play_random_game(RandomAgent(seed1), RandomAgent(seed2))))
+    # 4x4の対局の種類は少ないので、ほとんどが異なれば良い
+    self.assertGreater(len(games), 20)
+
+class TestLearnSeed(unittest.TestCase):
+  def test_learn(self):
+    """
+    同じseedで学習したQ値のテーブルが一致し、異なるseedでは異なるか
+    """
+    tables = []
+    for seed in [0, 0, 1]:
+      manager = make_manager()
+      manager.learn(200, True, seed=seed)
+      tables.append(manager.ql.data)
+    self.assertEqual(tables[0], tables[1])
+    self.assertNotEqual(tables[0], tables[2])
+
+  def test_learn_mp(self):
+    """
+    同じseedでlearn_mpを行った結果が一致するか
+
+    Notes
+    -----
+    pool_sizeが2以上の場合、Q値の更新の順序はプロセスのスケジューリングに依存するので、
+    行動をランダムに選ぶ(epsilon=1)場合に行われたゲームと更新された(状態, 行動)が一致するかを確かめる
+    """
+    with tempfile.TemporaryDirectory() as d:
+      tables = []
+      for _ in range(2):
+        manager = make_manager()
+        learn_mp(1, 100, manager, d+'/', 'ql.json', save_interval=1, seed=0)
+        tables.append(manager.ql.data)
+      self.assertEqual(tables[0], tables[1])
+
+      results = []
+      for _ in range(2):
+        manager = make_manager(1.0)
+        learn_mp(2, 100, manager, d+'/', 'ql.json', save_interval=2, seed=0)
+        results.append((set(manager.ql.data), sorted(manager.learning_results)))
+      self.assertEqual(results[0], results[1])
+      self.assertEqual(100, len(results[0][1]))
+
+if __name__ == '__main__':
+  unittest.main()
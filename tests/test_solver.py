@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from othello_rl.manager.othello import OthelloQLearningManager
+from othello_rl.othello.agent import PerfectAgent, RandomAgent
+from othello_rl.othello.board import OthelloBoard4x4
+from othello_rl.othello.features import Featuresv2
+from othello_rl.othello.reward import Rewardv1
+from othello_rl.othello.solver import PerfectPlayTable, evaluate_q_table
+from othello_rl.qlearning.qlearning import QLearning
+
+class TestSolver(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.table = PerfectPlayTable()
+    cls.table.solve()
+
+  def test_initial_position(self):
+    """
+    初期盤面の値が後手の8コマ差の勝ちとなるか
+    """
+    othello = OthelloBoard4x4(0)
+    value, _ = self.table.get(othello)
+    self.assertEqual(-8, value)
+
+  def test_save_load(self):
+    """
+    書き出した結果を読み込めるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'perfect.npz')
+      self.table.save(path)
+      table = PerfectPlayTable.load(path)
+    self.assertEqual(self.table.data, table.data)
+
+  def test_perfect_agent(self):
+    """
+    後手のPerfectAgentがRandomAgentに負けないか
+    """
+    for i in range(20):
+      othello = OthelloBoard4x4(0)
+      agent_list = [RandomAgent(i), PerfectAgent(self.table)]
+      while True:
+        agent_list[othello.now_turn].step(othello)
+        next_state = othello.get_next_state()
+        if next_state == 2:
+          break
+        elif next_state == 0:
+          othello.change_player()
+      self.assertGreaterEqual(othello.get_piece_num(1) - othello.get_piece_num(0), 8)
+
+  def test_evaluate_q_table_second_player(self):
+    """
+    後手として学習した結果の状態が完全解析の局面と一致するか
+    """
+    manager = OthelloQLearningManager(4, Featuresv2(), RandomAgent(0), QLearning(0.1, 0.9, {}), Rewardv1(), 'e', [0.1], seed=0)
+    manager.learn(500, True, seed=0)
+    _, _, hit_rate = evaluate_q_table(self.table, Featuresv2(), manager.ql.data, ql_num=1)
+    self.assertEqual(1.0, hit_rate)
+    # 先手の向きで比較するとほとんど一致しない
+    _, _, hit_rate = evaluate_q_table(self.table, Featuresv2(), manager.ql.data, ql_num=0)
+    self.assertLess(hit_rate, 0.5)
+
+if __name__ == '__main__':
+  unittest.main()
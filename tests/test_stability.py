@@ -0,0 +1,100 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from othello_rl.othello.agent import RandomAgent
+from othello_rl.othello.board import OthelloBoard8x8
+from othello_rl.othello.stability import DETERMINE_PIECE_TABLE_4X4_SHA256, count_determine_piece_4x4, get_determine_piece_table_4x4, get_edge_stable_board, get_stable_board
+
+class TestStability(unittest.TestCase):
+  def test_initial_position(self):
+    """
+    初期盤面に確定石がないか
+    """
+    othello = OthelloBoard8x8(0)
+    self.assertEqual(0, othello.get_determine_piece(0))
+    self.assertEqual(0, othello.get_determine_piece(1))
+
+  def test_full_board(self):
+    """
+    全て埋まった盤面のコマが全て確定石となるか
+    """
+    p = 0x0f0f0f0f0f0f0f0f
+    o = ~p & 0xffffffffffffffff
+    self.assertEqual(p, get_stable_board(p, o))
+    self.assertEqual(o, get_stable_board(o, p))
+
+  def test_full_edge(self):
+    """
+    埋まった縁のコマが確定石となるか
+    """
+    p = 0b01111110
+    o = 0b10000001
+    self.assertEqual(p, get_edge_stable_board(p, o))
+    self.assertEqual(o, get_edge_stable_board(o, p))
+
+  def test_edge_not_stable(self):
+    """
+    挟まれうる縁のコマが確定石とならないか
+    """
+    p = 0b00011000
+    o = 0b00000100
+    self.assertEqual(0, get_edge_stable_board(p, o))
+
+  def test_stable_discs_never_flip(self):
+    """
+    確定石がゲーム終了まで裏返らないか
+    """
+    agent = RandomAgent(0)
+    for _ in range(20):
+      othello = OthelloBoard8x8(0)
+      history = []
+      while True:
+        agent.step(othello)
+        history.append((get_stable_board(othello.board[0], othello.board[1]), get_stable_board(othello.board[1], othello.board[0])))
+        next_state = othello.get_next_state()
+        if next_state == 0:
+          othello.change_player()
+        elif next_state == 2:
+          break
+      for stable_0, stable_1 in history:
+        self.assertEqual(stable_0, othello.board[0] & stable_0)
+        self.assertEqual(stable_1, othello.board[1] & stable_1)
+
+  def test_determine_piece_table_4x4(self):
+    """
+    4x4の確定石の表が数え上げと一致するか
+    """
+    table = get_determine_piece_table_4x4()
+    self.assertEqual(1 << 16, len(table))
+    # 作成した表が読み込み時の確認に用いるSHA-256と一致するか
+    self.assertEqual(DETERMINE_PIECE_TABLE_4X4_SHA256, hashlib.sha256(bytes(count_determine_piece_4x4(board) for board in range(1 << 16))).hexdigest())
+    self.assertEqual(16, table[0xffff])
+    for board in range(0, 1 << 16, 97):
+      self.assertEqual(count_determine_piece_4x4(board), table[board])
+
+  def test_determine_piece_table_4x4_cache(self):
+    """
+    後から指定したcache_pathにも書き出され、壊れたファイルは作り直されるか
+    """
+    table = get_determine_piece_table_4x4()
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'table.bin')
+      self.assertEqual(table, get_determine_piece_table_4x4(path))
+      with open(path, 'rb') as f:
+        self.assertEqual(table, f.read())
+
+      truncated_path = os.path.join(d, 'truncated.bin')
+      with open(truncated_path, 'wb') as f:
+        f.write(table[:100])
+      self.assertEqual(table, get_determine_piece_table_4x4(truncated_path))
+      with open(truncated_path, 'rb') as f:
+        self.assertEqual(table, f.read())
+
+      # 大きさと値の範囲は正しいが内容が異なるファイルも作り直す
+      stale_path = os.path.join(d, 'stale.bin')
+      with open(stale_path, 'wb') as f:
+        f.write(bytes(reversed(table)))
+      self.assertEqual(table, get_determine_piece_table_4x4(stale_path))
+      with open(stale_path, 'rb') as f:
+        self.assertEqual(table, f.read())
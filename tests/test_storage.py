@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+import numpy as np
+from nbt import nbt
+from othello_rl.error import ArgsError
+from othello_rl.minecraft.storage import gen_ql_data_storage, write_ql_data_storage
+
+class TestStorage(unittest.TestCase):
+  def test_read_by_nbt(self):
+    """
+    書き出したStorageをnbtで読み込めるか
+    """
+    values = np.arange(-500, 500)
+    for int_array in [False, True]:
+      with tempfile.TemporaryDirectory() as d:
+        write_ql_data_storage(values, 'ns', 'name', d+'/', int_array=int_array)
+        f = nbt.NBTFile(d+'/command_storage_ns.dat')
+      data = f['data']['contents']['name']['data']
+      self.assertEqual(values.tolist(), [v.value for v in data] if not int_array else list(data.value))
+      self.assertEqual('test', f['data']['contents']['name']['ql_data'].value)
+      self.assertEqual(2724, f['DataVersion'].value)
+
+  def test_invalid_values(self):
+    """
+    write_ql_data_storageが整数型以外やint32の範囲外の値を拒否し、intのリストは受け付けるか
+    """
+    with tempfile.TemporaryDirectory() as d:
+      for values in [np.array([0.5, 1.0]), [1, 2.5], [True, False], np.array([1, 2], dtype=object), np.array([2**31]), [0, 2**70]]:
+        with self.assertRaises(ArgsError):
+          write_ql_data_storage(values, 'ns', 'name', d+'/')
+      write_ql_data_storage([1, -2, 3], 'ns', 'name', d+'/', int_array=True)
+      f = nbt.NBTFile(d+'/command_storage_ns.dat')
+    self.assertEqual([1, -2, 3], list(f['data']['contents']['name']['data'].value))
+
+  def test_gen_legacy_values(self):
+    """
+    gen_ql_data_storageが小数やdict.values(), ジェネレータをint()と同様に切り捨てて書き出すか
+    """
+    data = {(0, 1): 1.0, (1, 2): 2.7, (2, 3): -2.7, (3, 4): 5}
+    for values in [list(data.values()), data.values(), (v for v in data.values()), np.array([1.0, 2.7, -2.7, 5.0])]:
+      with tempfile.TemporaryDirectory() as d:
+        gen_ql_data_storage(values, 'ns', 'name', d+'/')
+        f = nbt.NBTFile(d+'/command_storage_ns.dat')
+      self.assertEqual([1, 2, -2, 5], [v.value for v in f['data']['contents']['name']['data']])
+    with tempfile.TemporaryDirectory() as d:
+      for values in [[float('nan')], [2.0**31]]:
+        with self.assertRaises(ArgsError):
+          gen_ql_data_storage(values, 'ns', 'name', d+'/')
+
+if __name__ == '__main__':
+  unittest.main()
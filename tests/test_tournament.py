@@ -0,0 +1,57 @@
+import unittest
+from othello_rl.manager.tournament import SPRT, Tournament, get_elo_ratings
+from othello_rl.othello.agent import RandomAgent
+
+class TestTournament(unittest.TestCase):
+  def test_ratings(self):
+    """
+    勝ち越した方のレーティングが高く、互角であれば0になるか
+    """
+    ratings = get_elo_ratings(['a', 'b', 'c'], {('a', 'b'): [75, 25, 0], ('b', 'c'): [50, 50, 0]})
+    self.assertGreater(ratings['a'][0], ratings['b'][0])
+    self.assertAlmostEqual(ratings['b'][0], ratings['c'][0], delta=1e-6)
+    self.assertAlmostEqual(0.0, sum(elo for elo, _ in ratings.values()), delta=1e-6)
+    # 勝率0.75は約191の差
+    self.assertAlmostEqual(191, ratings['a'][0]-ratings['b'][0], delta=5)
+
+  def test_sprt(self):
+    """
+    明らかな差がある場合に結論が出るか
+    """
+    sprt = SPRT(0, 50)
+    sprt.add(80, 20, 0)
+    self.assertEqual(1, sprt.get_status())
+    sprt = SPRT(0, 50)
+    sprt.add(20, 80, 0)
+    self.assertEqual(0, sprt.get_status())
+    sprt = SPRT(0, 50)
+    sprt.add(5, 5, 0)
+    self.assertEqual(-1, sprt.get_status())
+
+  def test_sprt_sweep(self):
+    """
+    全勝や全敗でも結論が出るか
+    """
+    sprt = SPRT(0, 50)
+    sprt.add(30, 0, 0)
+    self.assertGreater(sprt.get_llr(), 0)
+    self.assertEqual(1, sprt.get_status())
+    sprt = SPRT(0, 50)
+    sprt.add(0, 30, 0)
+    self.assertLess(sprt.get_llr(), 0)
+    self.assertEqual(0, sprt.get_status())
+    # 全て引き分けであればEloの差は0なのでH0に近づく
+    sprt = SPRT(0, 50)
+    sprt.add(0, 0, 200)
+    self.assertEqual(0, sprt.get_status())
+
+  def test_reproducible(self):
+    """
+    同じseedであればプロセス数によらず同じ結果になるか
+    """
+    results = []
+    for pool_size in [1, 2]:
+      tournament = Tournament(4, {'a': RandomAgent(), 'b': RandomAgent()}, pool_size=pool_size, seed=0)
+      results.append(tournament.run(tournament.get_round_robin_pairs(), 40))
+    self.assertEqual(40, sum(results[0][('a', 'b')]))
+    self.assertEqual(results[0], results[1])